@@ -13,26 +13,33 @@ sys.path.append(str(project_root))
 load_dotenv(project_root / ".env")
 
 import logging
-import os
-from typing import Any, Dict, List, Optional
+from typing import List, Optional
 
-import joblib
-import mlflow
-import mlflow.sklearn
 import numpy as np
-import pandas as pd
 import structlog
 from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sklearn.compose import ColumnTransformer
+from starlette.concurrency import run_in_threadpool
 
 from src.api.auth import verify_credentials
 from src.api.middleware.correlation import CORRELATION_ID, CorrelationIdMiddleware
 from src.api.routes.auth import router as auth_router
+from src.api.routes.decisions import (
+    get_batcher,
+    get_executor,
+    get_model_manager,
+    get_model_registry,
+    get_scorer,
+    predict_single,
+)
 from src.api.routes.decisions import router as decisions_router
 from src.api.routes.decisions import (
-    set_model_and_preprocessor,
+    run_inference,
+    save_decision,
+    save_decisions,
+    set_shadow_version,
 )
+from src.api.routes.models import router as models_router
 from src.api.schemas import (
     FEATURE_CATEGORIES,
     BatchDecisionRequest,
@@ -44,8 +51,11 @@ from src.api.schemas import (
     NetworkTrafficFeatures,
     SingleDecisionRequest,
 )
-from src.core.supabaseclient import get_supabase_client
-from src.ml.pipeline.preprocessing.preprocessor import DataPreprocessor
+from src.core.config.inferenceconfig import get_inference_settings
+from src.core.config.supabaseconfig import get_supabase_settings
+from src.core.decisionqueue import get_decision_queue
+from src.core.supabasehttp import get_async_supabase_client
+from src.core.tokenverifier import get_token_verifier
 from src.utils.cache import init_cache
 
 # Configure logging
@@ -76,15 +86,11 @@ app.add_middleware(
 # Include routers
 app.include_router(auth_router)
 app.include_router(decisions_router)
-
-# Global variables for model and preprocessor
-model = None
-preprocessor = None
+app.include_router(models_router)
 
 
 @app.on_event("startup")
 async def startup_event():
-    global model, preprocessor
     try:
         # Initialize Redis cache
         try:
@@ -94,152 +100,55 @@ async def startup_event():
             logger.warning(f"Failed to initialize Redis cache: {str(e)}")
             logger.info("Continuing without cache functionality")
 
-        # Load model with fallback strategy
-        logger.info("Attempting to load model...")
-        model_name = os.getenv("MLFLOW_MODEL_NAME", "intrusion_detector")
-        tracking_uri = os.getenv("MLFLOW_TRACKING_URI", "http://localhost:5000")
-
-        # Try MLflow first, then fallback to local model
-        model_loaded = False
+        # Load, warm up and activate the newest model
+        manager = get_model_manager()
+        version = await run_in_threadpool(manager.load)
+        logger.info(
+            f"Successfully injected model version '{version.version}' into decisions router"
+        )
 
-        # Strategy 1: Try MLflow Model Registry
-        if tracking_uri and tracking_uri != "local":
+        # Mirror sampled traffic to a candidate version
+        shadow_version = get_inference_settings().SHADOW_MODEL_VERSION
+        if shadow_version:
             try:
-                logger.info(f"Attempting to load from MLflow: {tracking_uri}")
-                mlflow.set_tracking_uri(tracking_uri)
-
-                client = mlflow.tracking.MlflowClient()
-                versions = client.search_model_versions(f'name="{model_name}"')
-                if versions:
-                    latest_version = max(versions, key=lambda v: v.version)
-                    model_uri = f"models:/{model_name}/{latest_version.version}"
-                    model = mlflow.pyfunc.load_model(model_uri)
-                    logger.info(
-                        f"Successfully loaded MLflow model '{model_name}' version '{latest_version.version}'"
-                    )
-                    model_loaded = True
-                else:
-                    logger.warning(
-                        f"No versions found for model {model_name} in MLflow"
-                    )
+                await run_in_threadpool(set_shadow_version, shadow_version)
             except Exception as e:
-                logger.warning(f"Failed to load from MLflow: {str(e)}")
+                logger.warning(f"Failed to start shadow scoring: {str(e)}")
 
-        # Strategy 2: Fallback to local model files
-        if not model_loaded:
-            try:
-                logger.info("Attempting to load local model...")
-                local_model_path = project_root / "artifacts" / "model.joblib"
-                if local_model_path.exists():
-                    model = joblib.load(local_model_path)
-                    logger.info("Successfully loaded local model")
-                    model_loaded = True
-                else:
-                    logger.warning(f"Local model not found at {local_model_path}")
-            except Exception as e:
-                logger.error(f"Failed to load local model: {str(e)}")
+        # Learn which versions exist off the request path
+        get_model_registry().start_refreshing()
 
-        # Strategy 3: Fallback to pickle model
-        if not model_loaded:
-            try:
-                logger.info("Attempting to load pickle model...")
-                pickle_model_path = project_root / "artifacts" / "model.pkl"
-                if pickle_model_path.exists():
-                    model = joblib.load(pickle_model_path)
-                    logger.info("Successfully loaded pickle model")
-                    model_loaded = True
-                else:
-                    logger.warning(f"Pickle model not found at {pickle_model_path}")
-            except Exception as e:
-                logger.error(f"Failed to load pickle model: {str(e)}")
-
-        if not model_loaded:
-            raise ValueError("No model could be loaded from any source")
-
-        # Load preprocessor with similar fallback strategy
-        logger.info("Loading preprocessor...")
-        preprocessor_loaded = False
-
-        # Try multiple preprocessor formats
-        preprocessor_paths = [
-            project_root / "artifacts" / "preprocessor.joblib",
-            project_root / "artifacts" / "preprocessor.pkl",
-            project_root / "artifacts" / "column_transformer.joblib",
-        ]
-
-        for preprocessor_path in preprocessor_paths:
-            if preprocessor_path.exists():
-                try:
-                    column_transformer = joblib.load(preprocessor_path)
-
-                    # Check if it's a ColumnTransformer and wrap it
-                    if isinstance(column_transformer, ColumnTransformer):
-                        from src.ml.pipeline.preprocessing.preprocessor import (
-                            ColumnTransformerWrapper,
-                        )
-
-                        preprocessor = ColumnTransformerWrapper(column_transformer)
-                        logger.info(
-                            f"Successfully loaded and wrapped ColumnTransformer from {preprocessor_path}"
-                        )
-                    else:
-                        # Assume it's a DataPreprocessor
-                        preprocessor = DataPreprocessor()
-                        preprocessor.preprocessor = column_transformer
-                        logger.info(
-                            f"Successfully loaded DataPreprocessor from {preprocessor_path}"
-                        )
-
-                    preprocessor_loaded = True
-                    break
-                except Exception as e:
-                    logger.warning(
-                        f"Failed to load preprocessor from {preprocessor_path}: {str(e)}"
-                    )
-                    continue
+        # Keep the JWKS used to verify access tokens fresh
+        get_token_verifier().start()
 
-        if not preprocessor_loaded:
-            raise FileNotFoundError(
-                f"Preprocessor not found in any of: {[str(p) for p in preprocessor_paths]}"
-            )
+        # Write decisions behind requests, replaying any spilled by the last run
+        if get_supabase_settings().DECISION_QUEUE_ENABLED:
+            await get_decision_queue().start()
 
-        # Set model and preprocessor in the decisions router
-        set_model_and_preprocessor(model, preprocessor)
-        logger.info(
-            "Successfully injected model and preprocessor into decisions router"
-        )
+        # Hot-reload new versions from the registry or artifact directory
+        reload_poll_s = get_inference_settings().MODEL_RELOAD_POLL_S
+        if reload_poll_s > 0:
+            manager.start_watching(reload_poll_s)
 
     except Exception as e:
         logger.error(f"Failed to initialize application: {str(e)}")
         raise
 
 
-async def save_decision(
-    user_id: str,
-    features: Dict[str, Any],
-    result: str,
-    correlation_id: str,
-    source_type: str,
-    model_version: Optional[str] = None,
-):
-    """Save decision to database."""
-    try:
-        supabase = get_supabase_client()
-
-        # Use the record_ml_decision method from SupabaseClient (now synchronous)
-        supabase.record_ml_decision(
-            user_id=user_id,
-            traffic_data=features,
-            prediction=result,
-            confidence=0.0,  # We don't have confidence scores in this implementation
-            source_type=source_type,
-            model_version=model_version,
-        )
-
-        logger.info(f"Successfully saved decision for correlation_id: {correlation_id}")
-
-    except Exception as e:
-        logger.error(f"Error saving decision: {str(e)}")
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Score any requests still waiting in the micro-batcher
+    await get_batcher().stop()
+    get_executor().shutdown()
+    await get_model_manager().stop_watching()
+    set_shadow_version(None)
+    await get_model_registry().stop_refreshing()
+    get_model_registry().clear()
+    get_model_manager().close()
+    await get_token_verifier().stop()
+    # Flush queued decisions before the connection pool closes
+    await get_decision_queue().stop()
+    await get_async_supabase_client().close()
 
 
 @app.get("/")
@@ -272,19 +181,14 @@ async def analyze_single_traffic(
 ):
     """Analyze single network traffic instance."""
     try:
-        if model is None or preprocessor is None:
+        scorer = get_scorer()
+        if scorer is None:
             raise HTTPException(
                 status_code=500, detail="Model or preprocessor not initialized"
             )
 
-        # Convert input to DataFrame
-        features_df = pd.DataFrame([request.features.dict()])
-
-        # Preprocess the traffic data
-        features = preprocessor.transform(features_df)
-
-        # Make prediction
-        prediction = model.predict(features)[0]
+        # Score the record, batched with concurrent requests
+        prediction = await predict_single(request.features)
         result = (
             ClassificationResult.MALICIOUS
             if prediction == 1
@@ -310,6 +214,8 @@ async def analyze_single_traffic(
 
         return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing traffic: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -319,19 +225,14 @@ async def analyze_single_traffic(
 async def test_single_traffic(request: SingleDecisionRequest):
     """Test endpoint for single traffic analysis without authentication."""
     try:
-        if model is None or preprocessor is None:
+        scorer = get_scorer()
+        if scorer is None:
             raise HTTPException(
                 status_code=500, detail="Model or preprocessor not initialized"
             )
 
-        # Convert input to DataFrame
-        features_df = pd.DataFrame([request.features.dict()])
-
-        # Preprocess the traffic data
-        features = preprocessor.transform(features_df)
-
-        # Make prediction
-        prediction = model.predict(features)[0]
+        # Encode the validated features straight into a row and predict
+        prediction = await run_inference(scorer.predict_one, request.features)
         result = (
             ClassificationResult.MALICIOUS
             if prediction == 1
@@ -347,6 +248,8 @@ async def test_single_traffic(request: SingleDecisionRequest):
 
         return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing traffic: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
@@ -358,45 +261,36 @@ async def analyze_batch_traffic(
 ):
     """Analyze multiple network traffic instances."""
     try:
-        if model is None or preprocessor is None:
+        scorer = get_scorer()
+        if scorer is None:
             raise HTTPException(
                 status_code=500, detail="Model or preprocessor not initialized"
             )
 
-        # Convert request to DataFrame
-        traffic_data = pd.DataFrame(
-            [traffic.dict() for traffic in request.traffic_list]
+        # Score the whole batch with a single transform and predict
+        batch_score = await run_inference(
+            scorer.score, [traffic.dict() for traffic in request.traffic_list]
         )
-
-        # Preprocess the data
-        processed_data = preprocessor.transform(traffic_data)
-
-        # Make predictions
-        predictions = model.predict(processed_data)
+        predictions = batch_score.predictions
 
         # Process results
         results = []
         errors = []
+        scored = []
         successful = 0
 
         for i, (traffic, pred) in enumerate(zip(request.traffic_list, predictions)):
             try:
+                if i in batch_score.errors:
+                    raise ValueError(batch_score.errors[i])
+
                 result = (
                     ClassificationResult.MALICIOUS
                     if pred == 1
                     else ClassificationResult.NORMAL
                 )
                 correlation_id = f"{request.correlation_id}_{i}"
-
-                # Save to database
-                await save_decision(
-                    user_id=user_id,
-                    features=traffic.dict(),
-                    result=result,
-                    correlation_id=correlation_id,
-                    source_type="batch",
-                    model_version=request.model_version,
-                )
+                scored.append((correlation_id, traffic.dict(), result))
 
                 results.append(
                     {"correlation_id": correlation_id, "classification_result": result}
@@ -410,6 +304,15 @@ async def analyze_batch_traffic(
                     )
                 )
 
+        # Save to database, one multi-row insert per chunk
+        if scored:
+            await save_decisions(
+                user_id=user_id,
+                decisions=scored,
+                source_type="batch",
+                model_version=request.model_version,
+            )
+
         return BatchDecisionResponse(
             summary={
                 "processed": len(request.traffic_list),
@@ -419,6 +322,8 @@ async def analyze_batch_traffic(
             report=results + [error.dict() for error in errors],
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing batch traffic: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -426,7 +331,6 @@ async def analyze_batch_traffic(
 
 @app.get("/decisions", response_model=List[DecisionHistory])
 async def get_decisions(
-    user_id: Optional[str] = None,
     source_type: Optional[str] = Query(None, regex="^(single|batch)$"),
     classification_result: Optional[str] = Query(None, regex="^(NORMAL|MALICIOUS)$"),
     limit: int = Query(10, ge=1, le=100),
@@ -434,32 +338,22 @@ async def get_decisions(
     sort: str = Query("timestamp desc", regex="^(timestamp|id) (asc|desc)$"),
     current_user_id: str = Depends(verify_credentials),
 ):
-    """Get decision history with filtering and pagination."""
+    """Get the authenticated user's decision history with filtering and pagination."""
     try:
-        supabase = get_supabase_client()
-
-        # Build query
-        query = supabase.table("decisions").select("*")
+        supabase = get_async_supabase_client()
 
-        # Apply filters
-        if user_id:
-            query = query.eq("user_id", user_id)
-        if source_type:
-            query = query.eq("source_type", source_type)
-        if classification_result:
-            query = query.eq("classification_result", classification_result)
-
-        # Apply pagination and sorting
-        query = query.range(offset, offset + limit - 1)
         sort_field, sort_order = sort.split()
-        query = query.order(sort_field, desc=(sort_order == "desc"))
-
-        response = query.execute()
-
-        if not response.data:
-            return []
+        decisions = await supabase.query_decisions(
+            user_id=current_user_id,
+            source_type=source_type,
+            classification_result=classification_result,
+            order_by=sort_field,
+            descending=(sort_order == "desc"),
+            offset=offset,
+            limit=limit,
+        )
 
-        return [DecisionHistory(**decision) for decision in response.data]
+        return [DecisionHistory(**decision) for decision in decisions]
 
     except Exception as e:
         logger.error(f"Error fetching decisions: {str(e)}")
@@ -469,10 +363,12 @@ async def get_decisions(
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
+    active = get_model_manager().active
     return {
         "status": "healthy",
-        "model_loaded": model is not None,
-        "preprocessor_loaded": preprocessor is not None,
+        "model_loaded": active is not None,
+        "preprocessor_loaded": active is not None,
+        "model_version": active.version if active is not None else None,
     }
 
 
@@ -1,11 +1,12 @@
 import logging
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel, EmailStr, Field
 
-from src.core.supabaseclient import get_supabase_client
+from src.api.auth import get_current_claims, verify_credentials
+from src.core.supabasehttp import get_async_supabase_client
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/auth", tags=["authentication"])
@@ -53,10 +54,10 @@ async def register_user(user_data: UserRegister):
             )
 
         # Get Supabase client
-        supabase = get_supabase_client()
+        supabase = get_async_supabase_client()
 
         # Register user with Supabase Auth
-        auth_response = supabase.sign_up(user_data.email, user_data.password)
+        auth_response = await supabase.sign_up(user_data.email, user_data.password)
 
         if not auth_response or "user" not in auth_response:
             raise HTTPException(
@@ -93,10 +94,10 @@ async def login_user(user_data: UserLogin):
     """Login user with Supabase Auth."""
     try:
         # Get Supabase client
-        supabase = get_supabase_client()
+        supabase = get_async_supabase_client()
 
         # Sign in with Supabase Auth
-        auth_response = supabase.sign_in(user_data.email, user_data.password)
+        auth_response = await supabase.sign_in(user_data.email, user_data.password)
 
         if not auth_response or "user" not in auth_response:
             raise HTTPException(
@@ -165,53 +166,14 @@ async def forgot_password(user_data: UserForgotPassword):
 
 
 @router.get("/me")
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-):
+async def get_current_user(claims: Dict[str, Any] = Depends(get_current_claims)):
     """Get current user information."""
-    try:
-        # Get Supabase client
-        supabase = get_supabase_client()
-
-        # Get user from token
-        user = supabase.get_user(credentials.credentials)
-
-        if not user or "user" not in user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
-            )
-
-        return {
-            "user_id": user["user"]["id"],
-            "email": user["user"].get("email", "unknown"),
-            "created_at": user["user"].get("created_at", "unknown"),
-        }
-
-    except Exception as e:
-        logger.error(f"Get user error: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
-        )
-
-
-# Dependency for protected routes
-async def get_current_user_id(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-) -> str:
-    """Get current user ID from JWT token."""
-    try:
-        supabase = get_supabase_client()
-        user = supabase.get_user(credentials.credentials)
-
-        if not user or "user" not in user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
-            )
+    return {
+        "user_id": claims["sub"],
+        "email": claims.get("email", "unknown"),
+        "created_at": claims.get("created_at", "unknown"),
+    }
 
-        return user["user"]["id"]
 
-    except Exception as e:
-        logger.error(f"Token validation error: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
-        )
+# Dependency for protected routes, the same as the API's own endpoints use
+get_current_user_id = verify_credentials
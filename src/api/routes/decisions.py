@@ -1,22 +1,63 @@
+import json
 import logging
+import os
+import time
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-import pandas as pd
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
 
 from src.api.routes.auth import get_current_user_id
 from src.api.schemas import (
+    TRAFFIC_FEATURES,
     BatchDecisionRequest,
     BatchDecisionResponse,
     ClassificationResult,
+    ColumnarBatchDecisionRequest,
     DecisionHistory,
     DecisionResponse,
     ErrorReport,
     SingleDecisionRequest,
+    validate_traffic_frame,
 )
+from src.core.config.inferenceconfig import get_inference_settings
+from src.core.config.supabaseconfig import get_supabase_settings
+from src.core.decisionqueue import get_decision_queue
 from src.core.redisclient import get_redis_client
-from src.core.supabaseclient import get_supabase_client
+from src.core.supabasehttp import (
+    BulkInsertResult,
+    build_decision_record,
+    get_async_supabase_client,
+)
+from src.ml.inference.arrow import (
+    ARROW_STREAM_MEDIA_TYPE,
+    is_arrow_media_type,
+    is_parquet_media_type,
+    predictions_to_arrow,
+    read_table,
+    table_to_frame,
+)
+from src.ml.inference.batch import BatchScore, BatchScorer
+from src.ml.inference.executor import (
+    InferenceExecutor,
+    InferenceOverloadedError,
+    InferenceTimeoutError,
+)
+from src.ml.inference.manager import (
+    ModelManager,
+    ModelVersion,
+    ModelVersionNotFoundError,
+)
+from src.ml.inference.microbatch import MicroBatcher
+from src.ml.inference.registry import ModelRegistry
+from src.ml.inference.shadow import ShadowScorer
+from src.ml.inference.sharded import ShardedScorer, get_worker_pool
+from src.ml.inference.stream import CsvChunkReader
 from src.utils.cache import cache_decorator
 
 logger = logging.getLogger(__name__)
@@ -25,13 +66,300 @@ router = APIRouter(prefix="/decisions", tags=["decisions"])
 # Global variables for model and preprocessor (will be injected)
 model = None
 preprocessor = None
+scorer = None
+batcher = None
+executor = None
+model_manager = None
+model_registry = None
+shadow_scorer = None
+
+project_root = Path(__file__).parent.parent.parent.parent
+
+
+def _build_scorer(ml_model, ml_preprocessor) -> BatchScorer:
+    """Compile the scoring kernel once, at load time."""
+    settings = get_inference_settings()
+    if settings.INFERENCE_SHARD_WORKERS > 0:
+        # Every version shares one set of workers, each keeping the models of
+        # the pinned versions, the shadow candidate and one being swapped in
+        pool = get_worker_pool(
+            settings.INFERENCE_SHARD_WORKERS,
+            max_models=settings.MODEL_REGISTRY_MAX_VERSIONS + 2,
+        )
+        sharded = ShardedScorer(
+            ml_model,
+            ml_preprocessor,
+            min_shard_rows=settings.INFERENCE_MIN_SHARD_ROWS,
+            pool=pool,
+        )
+        sharded.start()
+        return sharded
+    return BatchScorer(ml_model, ml_preprocessor)
+
+
+def _on_model_swap(version: Optional[ModelVersion]):
+    """Point this router at the version the model manager just activated."""
+    global model, preprocessor, scorer
+    if version is None:
+        model, preprocessor, scorer = None, None, None
+    else:
+        model, preprocessor, scorer = (
+            version.model,
+            version.preprocessor,
+            version.scorer,
+        )
+
+
+def get_model_manager() -> ModelManager:
+    """Get the manager that loads and hot-swaps the served model."""
+    global model_manager
+    if model_manager is None:
+        settings = get_inference_settings()
+        model_manager = ModelManager(
+            artifacts_dir=project_root / settings.MODEL_ARTIFACTS_DIR,
+            model_name=os.getenv("MLFLOW_MODEL_NAME", "intrusion_detector"),
+            tracking_uri=os.getenv("MLFLOW_TRACKING_URI", "http://localhost:5000"),
+            build_scorer=_build_scorer,
+            on_swap=_on_model_swap,
+            warmup_rows=settings.MODEL_WARMUP_ROWS,
+            retire_after_s=settings.INFERENCE_TIMEOUT_S,
+        )
+    return model_manager
+
+
+def get_model_registry() -> ModelRegistry:
+    """Get the registry serving pinned model versions next to the active one."""
+    global model_registry
+    if model_registry is None:
+        settings = get_inference_settings()
+        model_registry = ModelRegistry(
+            get_model_manager(),
+            max_versions=settings.MODEL_REGISTRY_MAX_VERSIONS,
+            max_bytes=settings.MODEL_REGISTRY_MAX_BYTES or None,
+            strict=settings.MODEL_REGISTRY_STRICT,
+            refresh_s=settings.MODEL_REGISTRY_REFRESH_S,
+        )
+    return model_registry
+
+
+async def resolve_model_version(requested: Optional[str] = None) -> ModelVersion:
+    """Get the model version a request asked for, loading it if it is cold."""
+    registry = get_model_registry()
+    try:
+        version = registry.get_loaded(requested)
+        if version is None and requested:
+            version = await run_in_threadpool(registry.get, requested)
+    except ModelVersionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    if version is None:
+        raise HTTPException(
+            status_code=500, detail="Model or preprocessor not initialized"
+        )
+    return version
+
+
+def get_shadow_scorer() -> Optional[ShadowScorer]:
+    """Get the shadow scorer mirroring traffic to a candidate, if any."""
+    return shadow_scorer
+
+
+def set_shadow_version(version: Optional[str]) -> Optional[ShadowScorer]:
+    """
+    Start shadow scoring with a candidate version, or stop it with None.
+
+    Loads the candidate, so call it from a worker thread when serving.
+    """
+    global shadow_scorer
+    settings = get_inference_settings()
+    candidate = get_model_manager().load_version(version) if version else None
+
+    previous, shadow_scorer = shadow_scorer, None
+    if previous is not None:
+        previous.stop()
+        if hasattr(previous.candidate.scorer, "close"):
+            previous.candidate.scorer.close()
+
+    if candidate is not None:
+        shadow_scorer = ShadowScorer(
+            candidate,
+            sample_rate=settings.SHADOW_SAMPLE_RATE,
+            max_queue_depth=settings.SHADOW_MAX_QUEUE_DEPTH,
+            flush_interval_s=settings.SHADOW_FLUSH_INTERVAL_S,
+        )
+        shadow_scorer.start()
+    return shadow_scorer
 
 
 def set_model_and_preprocessor(ml_model, ml_preprocessor):
     """Set the global model and preprocessor for this router."""
-    global model, preprocessor
-    model = ml_model
-    preprocessor = ml_preprocessor
+    get_model_manager().activate(ml_model, ml_preprocessor)
+
+
+def get_scorer() -> Optional[BatchScorer]:
+    """Get the scorer built for the active model and preprocessor."""
+    return scorer
+
+
+def get_executor() -> InferenceExecutor:
+    """Get the executor that runs transform/predict off the event loop."""
+    global executor
+    if executor is None:
+        settings = get_inference_settings()
+        executor = InferenceExecutor(
+            kind=settings.INFERENCE_EXECUTOR,
+            max_workers=settings.INFERENCE_MAX_WORKERS,
+            max_queue_depth=settings.INFERENCE_MAX_QUEUE_DEPTH,
+            timeout_s=settings.INFERENCE_TIMEOUT_S,
+        )
+    return executor
+
+
+async def run_inference(fn, *args):
+    """Run CPU-bound inference in the executor, mapping overload to HTTP errors."""
+    try:
+        return await get_executor().run(fn, *args)
+    except InferenceOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except InferenceTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+
+async def _score_records(records) -> BatchScore:
+    """Score records with whichever scorer is current when the batch flushes."""
+    if scorer is None:
+        raise ValueError("Model or preprocessor not initialized")
+    return await get_executor().run(scorer.score, records)
+
+
+def get_batcher() -> MicroBatcher:
+    """Get the micro-batcher shared by all single-record requests."""
+    global batcher
+    if batcher is None:
+        settings = get_inference_settings()
+        batcher = MicroBatcher(
+            _score_records,
+            max_batch_size=settings.MICROBATCH_MAX_BATCH_SIZE,
+            max_wait_ms=settings.MICROBATCH_MAX_WAIT_MS,
+            max_queue_depth=settings.INFERENCE_MAX_QUEUE_DEPTH,
+        )
+    return batcher
+
+
+async def predict_single(features, version: Optional[ModelVersion] = None) -> int:
+    """
+    Predict one record with the given or active model version.
+
+    Records for the active version are coalesced with concurrent requests if
+    micro-batching is enabled and offered to the shadow scorer; pinned versions
+    are scored directly.
+    """
+    settings = get_inference_settings()
+    active = get_model_manager().active
+    version = version or active
+    started = time.perf_counter()
+    try:
+        if settings.MICROBATCH_ENABLED and version is active:
+            prediction = await get_batcher().submit(
+                features, timeout=settings.INFERENCE_TIMEOUT_S
+            )
+        else:
+            prediction = await run_inference(version.scorer.predict_one, features)
+    except InferenceOverloadedError as e:
+        version.record(1, (time.perf_counter() - started) * 1000.0, errors=1)
+        raise HTTPException(status_code=503, detail=str(e))
+    except InferenceTimeoutError as e:
+        version.record(1, (time.perf_counter() - started) * 1000.0, errors=1)
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception:
+        version.record(1, (time.perf_counter() - started) * 1000.0, errors=1)
+        raise
+
+    version.record(1, (time.perf_counter() - started) * 1000.0)
+    if shadow_scorer is not None and version is active:
+        shadow_scorer.offer([features], np.array([prediction], dtype=np.int8))
+    return prediction
+
+
+async def score_batch_records(
+    records, version: Optional[ModelVersion] = None
+) -> BatchScore:
+    """Score a batch with the given or active model version in the executor."""
+    active = get_model_manager().active
+    version = version or active
+    started = time.perf_counter()
+    try:
+        batch_score = await run_inference(version.scorer.score, records)
+    except Exception:
+        version.record(
+            len(records), (time.perf_counter() - started) * 1000.0, len(records)
+        )
+        raise
+
+    version.record(
+        len(records),
+        (time.perf_counter() - started) * 1000.0,
+        len(batch_score.errors),
+    )
+    if shadow_scorer is not None and version is active:
+        shadow_scorer.offer(records, batch_score.predictions)
+    return batch_score
+
+
+async def score_batch_frame(
+    frame, version: Optional[ModelVersion] = None
+) -> BatchScore:
+    """Validate and score a frame with the given or active model version."""
+    active = get_model_manager().active
+    version = version or active
+    started = time.perf_counter()
+    try:
+        batch_score = await run_inference(
+            version.scorer.score_valid_rows, frame, validate_traffic_frame
+        )
+    except Exception:
+        version.record(len(frame), (time.perf_counter() - started) * 1000.0, len(frame))
+        raise
+
+    version.record(
+        len(frame),
+        (time.perf_counter() - started) * 1000.0,
+        len(batch_score.errors),
+    )
+    if shadow_scorer is not None and version is active:
+        shadow_scorer.offer(frame, batch_score.predictions)
+    return batch_score
+
+
+def build_batch_report(correlation_id: str, batch_score: BatchScore) -> Dict[str, Any]:
+    """Build the summary and per-row report of a BatchDecisionResponse."""
+    results = []
+    errors = []
+    for i, prediction in enumerate(batch_score.predictions.tolist()):
+        row_correlation_id = f"{correlation_id}_{i}"
+        if i in batch_score.errors:
+            errors.append(
+                ErrorReport(
+                    correlation_id=row_correlation_id, error=batch_score.errors[i]
+                ).dict()
+            )
+            continue
+        result = (
+            ClassificationResult.MALICIOUS
+            if prediction == 1
+            else ClassificationResult.NORMAL
+        )
+        results.append(
+            {"correlation_id": row_correlation_id, "classification_result": result}
+        )
+
+    return {
+        "summary": {
+            "processed": len(batch_score),
+            "errors": len(errors),
+            "successful": len(results),
+        },
+        "report": results + errors,
+    }
 
 
 async def save_decision(
@@ -43,30 +371,77 @@ async def save_decision(
     model_version: Optional[str] = None,
 ):
     """Save decision to database."""
-    try:
-        supabase = get_supabase_client()
+    await save_decisions(
+        user_id=user_id,
+        decisions=[(correlation_id, features, result)],
+        source_type=source_type,
+        model_version=model_version,
+    )
 
-        # Use the record_ml_decision method from SupabaseClient
-        supabase.record_ml_decision(
-            user_id=user_id,
-            traffic_data=features,
-            prediction=result,
-            confidence=0.0,  # We don't have confidence scores in this implementation
-            source_type=source_type,
-            model_version=model_version,
-        )
 
-        logger.info(f"Successfully saved decision for correlation_id: {correlation_id}")
+async def save_decisions(
+    user_id: str,
+    decisions: List[Tuple[str, Dict[str, Any], str]],
+    source_type: str = "batch",
+    model_version: Optional[str] = None,
+) -> Optional[BulkInsertResult]:
+    """
+    Save the decisions of a scored batch with chunked multi-row inserts.
+
+    With the decision queue enabled the rows are queued for the write-behind
+    flusher, which batches them with other requests' rows; otherwise they are
+    written before returning.
+
+    Args:
+        user_id (str): User the batch was scored for
+        decisions (list): Correlation ID, features and classification result
+            of every scored row
+        source_type (str): Source of the batch
+        model_version (str, optional): Version the batch was scored with
+
+    Returns:
+        BulkInsertResult or None: Per-chunk outcome, None if the rows were
+            queued or could not be saved at all
+    """
+    try:
+        records = [
+            build_decision_record(
+                user_id,
+                features,
+                result,
+                source_type=source_type,
+                model_version=model_version,
+            )
+            for _, features, result in decisions
+        ]
+        if get_supabase_settings().DECISION_QUEUE_ENABLED:
+            await get_decision_queue().put(records)
+            return None
+
+        outcome = await get_async_supabase_client().record_ml_decisions(records)
+
+        for failure in outcome.failures:
+            first = decisions[failure["start"]][0]
+            last = decisions[failure["stop"] - 1][0]
+            logger.error(
+                f"Error saving decisions {first} to {last} "
+                f"(chunk {failure['chunk']}): {failure['error']}"
+            )
+        logger.info(
+            f"Saved {outcome.inserted}/{len(records)} decisions "
+            f"in {len(outcome.chunks)} chunks"
+        )
+        return outcome
 
     except Exception as e:
-        logger.error(f"Error saving decision: {str(e)}")
+        logger.error(f"Error saving decisions: {str(e)}")
+        return None
 
 
 @router.post("/single", response_model=DecisionResponse)
 async def analyze_single_traffic_authenticated(
     request: SingleDecisionRequest,
     user_id: str = Depends(get_current_user_id),
-    background_tasks: BackgroundTasks = None,
 ):
     """Analyze single network traffic instance with authentication and caching."""
     try:
@@ -75,10 +450,15 @@ async def analyze_single_traffic_authenticated(
                 status_code=500, detail="Model or preprocessor not initialized"
             )
 
-        # Check cache first
+        version = await resolve_model_version(request.model_version)
+
+        # Check cache first; pinned versions get their own cache entries
+        cache_features = request.features.dict()
+        if request.model_version:
+            cache_features["model_version"] = version.version
         redis_client = get_redis_client()
-        cached_response = redis_client.get_cached_response(
-            request.features.dict(), user_id
+        cached_response = await run_in_threadpool(
+            redis_client.get_cached_response, cache_features, user_id
         )
 
         if cached_response:
@@ -91,14 +471,8 @@ async def analyze_single_traffic_authenticated(
                 correlation_id=request.correlation_id,
             )
 
-        # Convert input to DataFrame
-        features_df = pd.DataFrame([request.features.dict()])
-
-        # Preprocess the traffic data
-        features = preprocessor.transform(features_df)
-
-        # Make prediction
-        prediction = model.predict(features)[0]
+        # Score the record, batched with concurrent requests
+        prediction = await predict_single(request.features, version)
         result = (
             ClassificationResult.MALICIOUS
             if prediction == 1
@@ -114,8 +488,9 @@ async def analyze_single_traffic_authenticated(
 
         # Cache the response
         try:
-            redis_client.cache_response(
-                request.features.dict(),
+            await run_in_threadpool(
+                redis_client.cache_response,
+                cache_features,
                 user_id,
                 {
                     "classification_result": result,
@@ -127,30 +502,20 @@ async def analyze_single_traffic_authenticated(
         except Exception as e:
             logger.warning(f"Failed to cache response: {str(e)}")
 
-        # Save to database in background if background_tasks is available
-        if background_tasks:
-            background_tasks.add_task(
-                save_decision,
-                user_id=user_id,
-                features=request.features.dict(),
-                result=result,
-                correlation_id=request.correlation_id,
-                source_type="single",
-                model_version=request.model_version,
-            )
-        else:
-            # Fallback to direct save
-            await save_decision(
-                user_id=user_id,
-                features=request.features.dict(),
-                result=result,
-                correlation_id=request.correlation_id,
-                source_type="single",
-                model_version=request.model_version,
-            )
+        # Queue for the write-behind flusher
+        await save_decision(
+            user_id=user_id,
+            features=request.features.dict(),
+            result=result,
+            correlation_id=request.correlation_id,
+            source_type="single",
+            model_version=version.version,
+        )
 
         return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing single traffic: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
@@ -160,7 +525,6 @@ async def analyze_single_traffic_authenticated(
 async def analyze_batch_traffic_authenticated(
     request: BatchDecisionRequest,
     user_id: str = Depends(get_current_user_id),
-    background_tasks: BackgroundTasks = None,
 ):
     """Analyze multiple network traffic instances with authentication."""
     try:
@@ -169,77 +533,345 @@ async def analyze_batch_traffic_authenticated(
                 status_code=500, detail="Model or preprocessor not initialized"
             )
 
+        version = await resolve_model_version(request.model_version)
+        records = [traffic.dict() for traffic in request.traffic_list]
+
+        # Score the whole batch with a single transform and predict
+        batch_score = await score_batch_records(records, version)
+
         results = []
         errors = []
+        scored = []
 
-        for i, features in enumerate(request.features):
-            try:
-                # Convert input to DataFrame
-                features_df = pd.DataFrame([features.dict()])
-
-                # Preprocess the traffic data
-                processed_features = preprocessor.transform(features_df)
+        for i, (features, prediction) in enumerate(
+            zip(records, batch_score.predictions)
+        ):
+            correlation_id = f"{request.correlation_id}_{i}"
 
-                # Make prediction
-                prediction = model.predict(processed_features)[0]
-                result = (
-                    ClassificationResult.MALICIOUS
-                    if prediction == 1
-                    else ClassificationResult.NORMAL
+            if i in batch_score.errors:
+                errors.append(
+                    ErrorReport(
+                        correlation_id=correlation_id, error=batch_score.errors[i]
+                    )
                 )
-
-                # Create response
-                decision_response = DecisionResponse(
-                    classification_result=result,
-                    timestamp=datetime.utcnow(),
-                    correlation_id=f"{request.correlation_id}_{i}",
+                logger.error(
+                    f"Error processing batch item {i}: {batch_score.errors[i]}"
                 )
+                continue
 
-                results.append(decision_response)
-
-                # Save to database in background if background_tasks is available
-                if background_tasks:
-                    background_tasks.add_task(
-                        save_decision,
-                        user_id=user_id,
-                        features=features.dict(),
-                        result=result,
-                        correlation_id=f"{request.correlation_id}_{i}",
-                        source_type="batch",
-                        model_version=request.model_version,
-                    )
-                else:
-                    # Fallback to direct save
-                    await save_decision(
-                        user_id=user_id,
-                        features=features.dict(),
-                        result=result,
-                        correlation_id=f"{request.correlation_id}_{i}",
-                        source_type="batch",
-                        model_version=request.model_version,
-                    )
+            result = (
+                ClassificationResult.MALICIOUS
+                if prediction == 1
+                else ClassificationResult.NORMAL
+            )
+            results.append(
+                {"correlation_id": correlation_id, "classification_result": result}
+            )
+            scored.append((correlation_id, features, result))
 
-            except Exception as e:
-                error = ErrorReport(index=i, error=str(e), features=features.dict())
-                errors.append(error)
-                logger.error(f"Error processing batch item {i}: {str(e)}")
+        # Queue for the write-behind flusher
+        if scored:
+            await save_decisions(
+                user_id=user_id,
+                decisions=scored,
+                source_type="batch",
+                model_version=version.version,
+            )
 
         # Prepare response
         response = BatchDecisionResponse(
-            results=results,
-            total_processed=len(request.features),
-            successful_predictions=len(results),
-            errors=errors,
-            correlation_id=request.correlation_id,
+            summary={
+                "processed": len(records),
+                "errors": len(errors),
+                "successful": len(results),
+            },
+            report=results + [error.dict() for error in errors],
         )
 
         return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing batch traffic: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Batch analysis failed: {str(e)}")
 
 
+@router.post("/batch/columnar", response_model=BatchDecisionResponse)
+async def analyze_columnar_batch_authenticated(
+    request: ColumnarBatchDecisionRequest,
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    Analyze a batch sent as one array per feature.
+
+    Rows are validated with vectorized checks instead of one pydantic model
+    each; invalid rows are reported by index in the batch report.
+    """
+    try:
+        if model is None or preprocessor is None:
+            raise HTTPException(
+                status_code=500, detail="Model or preprocessor not initialized"
+            )
+
+        version = await resolve_model_version(request.model_version)
+        batch_score = await score_batch_frame(request.to_frame(), version)
+        response = build_batch_report(request.correlation_id, batch_score)
+
+        results = iter(response["report"][: batch_score.successful])
+        scored = []
+        for i in range(len(batch_score)):
+            if i in batch_score.errors:
+                continue
+            item = next(results)
+            features = {name: values[i] for name, values in request.features.items()}
+            scored.append(
+                (item["correlation_id"], features, item["classification_result"])
+            )
+
+        # Queue for the write-behind flusher
+        if scored:
+            await save_decisions(
+                user_id=user_id,
+                decisions=scored,
+                source_type="batch",
+                model_version=version.version,
+            )
+
+        return BatchDecisionResponse(**response)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error analyzing columnar batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch analysis failed: {str(e)}")
+
+
+def _score_csv_chunk(
+    reader: CsvChunkReader,
+    scorer: BatchScorer,
+    data: bytes,
+    first_row: int,
+    correlation_id: str,
+) -> Tuple[bytes, int, int]:
+    """
+    Parse, validate and score one CSV chunk with a single vectorized call.
+
+    Returns:
+        tuple: NDJSON lines of the chunk, rows processed and rows failed
+    """
+    frame, errors = reader.parse(data)
+    batch_score = scorer.score_valid_rows(frame, validate_traffic_frame, errors)
+    predictions, errors = batch_score.predictions, batch_score.errors
+
+    lines = []
+    for i, prediction in enumerate(predictions.tolist()):
+        correlation = f"{correlation_id}_{first_row + i}"
+        if i in errors:
+            lines.append(
+                json.dumps({"correlation_id": correlation, "error": errors[i]})
+            )
+        else:
+            result = (
+                ClassificationResult.MALICIOUS
+                if prediction == 1
+                else (ClassificationResult.NORMAL)
+            )
+            lines.append(
+                json.dumps(
+                    {
+                        "correlation_id": correlation,
+                        "classification_result": result.value,
+                    }
+                )
+            )
+    return ("\n".join(lines) + "\n").encode() if lines else b"", len(frame), len(errors)
+
+
+class UploadStreamingResponse(StreamingResponse):
+    """
+    Streaming response whose body is produced while the request body is read.
+
+    ``StreamingResponse`` normally listens for a client disconnect by calling
+    ``receive`` alongside the body iterator, which would swallow the upload
+    messages the iterator is waiting for. Here only the iterator reads from
+    ``receive``; a disconnect surfaces there as ``ClientDisconnect``.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+async def stream_decisions(
+    body: AsyncIterator[bytes],
+    reader: CsvChunkReader,
+    version: ModelVersion,
+    correlation_id: str,
+) -> AsyncIterator[bytes]:
+    """
+    Score a streamed CSV upload chunk by chunk, yielding NDJSON as it goes.
+
+    Each chunk is read, scored in the inference executor and written out
+    before the next one is read, so memory stays bounded by the chunk size.
+    The last line is a summary; a failure that ends the stream early is
+    reported on the line before it.
+    """
+    processed = failed = 0
+    try:
+        async for data in reader.chunks(body):
+            started = time.perf_counter()
+            lines, n_rows, n_errors = await get_executor().run(
+                _score_csv_chunk,
+                reader,
+                version.scorer,
+                data,
+                processed,
+                correlation_id,
+            )
+            version.record(n_rows, (time.perf_counter() - started) * 1000.0, n_errors)
+            processed += n_rows
+            failed += n_errors
+            yield lines
+    except ClientDisconnect:
+        logger.warning(f"Client disconnected after {processed} streamed rows")
+        return
+    except Exception as e:
+        logger.error(f"Streaming analysis stopped after {processed} rows: {str(e)}")
+        yield (
+            json.dumps({"error": f"Stream analysis failed: {str(e)}"}) + "\n"
+        ).encode()
+
+    summary = {
+        "processed": processed,
+        "errors": failed,
+        "successful": processed - failed,
+    }
+    logger.info(f"Streamed {processed} decisions for correlation_id: {correlation_id}")
+    yield (
+        json.dumps({"summary": summary, "model_version": version.version}) + "\n"
+    ).encode()
+
+
+@router.post("/stream")
+async def analyze_traffic_stream_authenticated(
+    request: Request,
+    correlation_id: str = Query(..., min_length=1),
+    model_version: Optional[str] = Query(None),
+    header: bool = Query(False),
+    chunk_rows: Optional[int] = Query(None, ge=1),
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    Analyze a CSV upload of any size, streaming NDJSON results back.
+
+    The body is CSV in the KDD layout of ``data/raw/traffic_data_test.csv``,
+    or with named columns if ``header`` is set, and may be sent with chunked
+    transfer encoding. Every row yields one line with its ``correlation_id``
+    and ``classification_result`` or ``error``, followed by a summary line.
+    Decisions are not persisted.
+    """
+    try:
+        if model is None or preprocessor is None:
+            raise HTTPException(
+                status_code=500, detail="Model or preprocessor not initialized"
+            )
+
+        settings = get_inference_settings()
+        chunk_rows = min(
+            chunk_rows or settings.STREAM_CHUNK_ROWS, settings.STREAM_MAX_CHUNK_ROWS
+        )
+        version = await resolve_model_version(model_version)
+        reader = CsvChunkReader(TRAFFIC_FEATURES, chunk_rows=chunk_rows, header=header)
+
+        logger.info(
+            f"Streaming analysis for user {user_id} in chunks of {chunk_rows} rows"
+        )
+        return UploadStreamingResponse(
+            stream_decisions(request.stream(), reader, version, correlation_id),
+            media_type="application/x-ndjson",
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error starting streaming analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Stream analysis failed: {str(e)}")
+
+
+def _decode_table_body(data: bytes, media_type: str):
+    """Decode an Arrow or Parquet body into a frame of the model features."""
+    table = read_table(data, media_type, TRAFFIC_FEATURES)
+    return table_to_frame(table, TRAFFIC_FEATURES)
+
+
+@router.post("/batch/arrow")
+async def analyze_batch_arrow_authenticated(
+    request: Request,
+    correlation_id: str = Query(..., min_length=1),
+    model_version: Optional[str] = Query(None),
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    Analyze a columnar batch sent as an Arrow IPC stream or a Parquet file.
+
+    The body's columns are mapped onto the model features without building a
+    record per row. If the request accepts
+    ``application/vnd.apache.arrow.stream``, predictions come back as an Arrow
+    stream with the summary in its schema metadata; otherwise the response is
+    a ``BatchDecisionResponse``. Decisions are not persisted.
+    """
+    try:
+        if model is None or preprocessor is None:
+            raise HTTPException(
+                status_code=500, detail="Model or preprocessor not initialized"
+            )
+
+        media_type = request.headers.get("content-type", "")
+        if not (is_arrow_media_type(media_type) or is_parquet_media_type(media_type)):
+            raise HTTPException(
+                status_code=415,
+                detail=f"Unsupported media type: {media_type or 'none'}",
+            )
+
+        version = await resolve_model_version(model_version)
+        data = await request.body()
+        try:
+            frame = await run_inference(_decode_table_body, data, media_type)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        batch_score = await score_batch_frame(frame, version)
+        logger.info(f"Scored Arrow batch of {len(batch_score)} rows for user {user_id}")
+
+        if is_arrow_media_type(request.headers.get("accept")):
+            metadata = {
+                "correlation_id": correlation_id,
+                "model_version": version.version,
+                "processed": str(len(batch_score)),
+                "errors": str(len(batch_score.errors)),
+                "successful": str(batch_score.successful),
+            }
+            return Response(
+                content=predictions_to_arrow(
+                    batch_score.predictions, batch_score.errors, metadata
+                ),
+                media_type=ARROW_STREAM_MEDIA_TYPE,
+            )
+
+        return BatchDecisionResponse(**build_batch_report(correlation_id, batch_score))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error analyzing Arrow batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch analysis failed: {str(e)}")
+
+
 @router.get("/", response_model=List[DecisionHistory])
 async def get_decisions_authenticated(
     source_type: Optional[str] = Query(None, regex="^(single|batch)$"),
@@ -251,38 +883,27 @@ async def get_decisions_authenticated(
 ):
     """Get decision history for authenticated user."""
     try:
-        supabase = get_supabase_client()
-
-        # Build query
-        query = supabase.table("decisions").select("*").eq("user_id", user_id)
+        supabase = get_async_supabase_client()
 
-        # Add filters
-        if source_type:
-            query = query.eq("source_type", source_type)
-        if classification_result:
-            query = query.eq("classification_result", classification_result)
-
-        # Add sorting
+        order_by, descending = "timestamp", True
         sort_parts = sort.split()
         if len(sort_parts) == 2:
-            column, direction = sort_parts
-            if direction.lower() == "desc":
-                query = query.order(column, desc=True)
-            else:
-                query = query.order(column, desc=False)
-
-        # Add pagination
-        query = query.range(offset, offset + limit - 1)
-
-        # Execute query
-        response = query.execute()
+            order_by, direction = sort_parts
+            descending = direction.lower() == "desc"
 
-        if response.data is None:
-            return []
+        rows = await supabase.query_decisions(
+            user_id=user_id,
+            source_type=source_type,
+            classification_result=classification_result,
+            order_by=order_by,
+            descending=descending,
+            offset=offset,
+            limit=limit,
+        )
 
         # Convert to DecisionHistory objects
         decisions = []
-        for decision in response.data:
+        for decision in rows:
             decisions.append(
                 DecisionHistory(
                     id=decision["id"],
@@ -308,7 +929,7 @@ async def get_cache_stats(user_id: str = Depends(get_current_user_id)):
     """Get Redis cache statistics."""
     try:
         redis_client = get_redis_client()
-        stats = redis_client.get_cache_stats()
+        stats = await run_in_threadpool(redis_client.get_cache_stats)
         return {
             "cache_stats": stats,
             "user_id": user_id,
@@ -326,7 +947,7 @@ async def clear_cache(user_id: str = Depends(get_current_user_id)):
     """Clear all cached items."""
     try:
         redis_client = get_redis_client()
-        success = redis_client.clear_cache()
+        success = await run_in_threadpool(redis_client.clear_cache)
         if success:
             return {"message": "Cache cleared successfully", "user_id": user_id}
         else:
@@ -334,3 +955,56 @@ async def clear_cache(user_id: str = Depends(get_current_user_id)):
     except Exception as e:
         logger.error(f"Error clearing cache: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to clear cache: {str(e)}")
+
+
+@router.get("/batcher/stats")
+async def get_batcher_stats(user_id: str = Depends(get_current_user_id)):
+    """Get micro-batcher batch-size and queue-wait histograms."""
+    try:
+        return {
+            "enabled": get_inference_settings().MICROBATCH_ENABLED,
+            "batcher_stats": get_batcher().get_stats(),
+            "user_id": user_id,
+            "timestamp": datetime.utcnow(),
+        }
+    except Exception as e:
+        logger.error(f"Error getting batcher stats: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to get batcher stats: {str(e)}"
+        )
+
+
+@router.get("/queue/stats")
+async def get_queue_stats(user_id: str = Depends(get_current_user_id)):
+    """Get decision queue depth, counters and flush-latency histograms."""
+    try:
+        return {
+            "enabled": get_supabase_settings().DECISION_QUEUE_ENABLED,
+            "queue_stats": get_decision_queue().get_stats(),
+            "user_id": user_id,
+            "timestamp": datetime.utcnow(),
+        }
+    except Exception as e:
+        logger.error(f"Error getting queue stats: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to get queue stats: {str(e)}"
+        )
+
+
+@router.get("/executor/stats")
+async def get_executor_stats(user_id: str = Depends(get_current_user_id)):
+    """Get inference executor queue depth and latency statistics."""
+    try:
+        return {
+            "executor_stats": get_executor().get_stats(),
+            "worker_stats": (
+                scorer.get_stats() if isinstance(scorer, ShardedScorer) else None
+            ),
+            "user_id": user_id,
+            "timestamp": datetime.utcnow(),
+        }
+    except Exception as e:
+        logger.error(f"Error getting executor stats: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to get executor stats: {str(e)}"
+        )
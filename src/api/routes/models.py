@@ -0,0 +1,130 @@
+import logging
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from src.api.routes.auth import get_current_user_id
+from src.api.routes.decisions import (
+    get_model_manager,
+    get_model_registry,
+    get_shadow_scorer,
+    set_shadow_version,
+)
+from src.ml.inference.manager import ModelVersionNotFoundError, ReloadInProgressError
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/models", tags=["models"])
+
+
+@router.get("/active")
+async def get_active_model(user_id: str = Depends(get_current_user_id)):
+    """Get the active model version, its warmup latency and reload history."""
+    try:
+        return {
+            "model_stats": get_model_manager().get_stats(),
+            "user_id": user_id,
+            "timestamp": datetime.utcnow(),
+        }
+    except Exception as e:
+        logger.error(f"Error getting model stats: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to get model stats: {str(e)}"
+        )
+
+
+@router.get("/versions")
+async def get_model_versions(user_id: str = Depends(get_current_user_id)):
+    """Get per-version request, error and latency counters of loaded versions."""
+    try:
+        return {
+            "registry_stats": get_model_registry().get_stats(),
+            "user_id": user_id,
+            "timestamp": datetime.utcnow(),
+        }
+    except Exception as e:
+        logger.error(f"Error getting model registry stats: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to get model registry stats: {str(e)}"
+        )
+
+
+@router.post("/reload")
+async def reload_model(user_id: str = Depends(get_current_user_id)):
+    """
+    Load, warm up and swap in the newest model without restarting the API.
+
+    Requests in flight finish on the previous version.
+    """
+    try:
+        manager = get_model_manager()
+        version = await run_in_threadpool(manager.load)
+        logger.info(f"User {user_id} reloaded model version '{version.version}'")
+        return {
+            "message": "Model reloaded successfully",
+            "model": version.to_dict(),
+            "user_id": user_id,
+            "timestamp": datetime.utcnow(),
+        }
+    except ReloadInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reloading model: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to reload model: {str(e)}")
+
+
+@router.get("/shadow")
+async def get_shadow_stats(user_id: str = Depends(get_current_user_id)):
+    """Get disagreement and latency counters of the shadow candidate."""
+    try:
+        shadow = get_shadow_scorer()
+        return {
+            "shadow_stats": shadow.get_stats() if shadow is not None else None,
+            "user_id": user_id,
+            "timestamp": datetime.utcnow(),
+        }
+    except Exception as e:
+        logger.error(f"Error getting shadow stats: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to get shadow stats: {str(e)}"
+        )
+
+
+@router.put("/shadow/{model_version}")
+async def start_shadow(model_version: str, user_id: str = Depends(get_current_user_id)):
+    """Mirror sampled traffic to a candidate version off the request path."""
+    try:
+        shadow = await run_in_threadpool(set_shadow_version, model_version)
+        logger.info(f"User {user_id} started shadow scoring of '{model_version}'")
+        return {
+            "message": "Shadow scoring started",
+            "shadow_stats": shadow.get_stats(),
+            "user_id": user_id,
+            "timestamp": datetime.utcnow(),
+        }
+    except ModelVersionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        logger.error(f"Error starting shadow scoring: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to start shadow scoring: {str(e)}"
+        )
+
+
+@router.delete("/shadow")
+async def stop_shadow(user_id: str = Depends(get_current_user_id)):
+    """Stop shadow scoring, flushing its last counters."""
+    try:
+        shadow = get_shadow_scorer()
+        await run_in_threadpool(set_shadow_version, None)
+        return {
+            "message": "Shadow scoring stopped",
+            "last_flush": shadow.last_flush if shadow is not None else None,
+            "user_id": user_id,
+            "timestamp": datetime.utcnow(),
+        }
+    except Exception as e:
+        logger.error(f"Error stopping shadow scoring: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to stop shadow scoring: {str(e)}"
+        )
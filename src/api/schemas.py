@@ -1,10 +1,13 @@
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
+import pandas as pd
 from pydantic import BaseModel, Field, validator
 
+VALID_FLAGS = ["S0", "SF"]  # Add more flags if needed
+
 
 class ClassificationResult(str, Enum):
     NORMAL = "NORMAL"
@@ -31,12 +34,90 @@ class NetworkTrafficFeatures(BaseModel):
     @validator("flag")
     def validate_flag(cls, v):
         """Validate that flag is either S0 or SF."""
-        valid_flags = ["S0", "SF"]  # Add more flags if needed
-        if v not in valid_flags:
-            raise ValueError(f"flag must be one of {valid_flags}")
+        if v not in VALID_FLAGS:
+            raise ValueError(f"flag must be one of {VALID_FLAGS}")
         return v
 
 
+TRAFFIC_FEATURES = list(NetworkTrafficFeatures.model_fields)
+_BOOL_STRINGS = {"true": 1, "false": 0, "1": 1, "0": 0}
+
+
+def validate_traffic_frame(
+    X: pd.DataFrame,
+) -> Tuple[pd.DataFrame, np.ndarray, Dict[int, str]]:
+    """
+    Validate a frame of traffic features column by column.
+
+    Applies the NetworkTrafficFeatures constraints to whole columns with NumPy
+    instead of building one model per row. Each invalid row is reported once,
+    with the first constraint it breaks.
+
+    Args:
+        X (pd.DataFrame): Raw traffic features, one row per record
+
+    Returns:
+        tuple: Frame of the features with normalized dtypes, boolean mask of
+            valid rows, and error messages keyed by row position
+    """
+    n_rows = len(X)
+    invalid = np.zeros(n_rows, dtype=bool)
+    reasons = np.empty(n_rows, dtype=object)
+
+    def reject(mask: np.ndarray, reason: str):
+        reasons[mask & ~invalid] = reason
+        invalid[:] |= mask
+
+    columns = {}
+    for name, field in NetworkTrafficFeatures.model_fields.items():
+        if name not in X.columns:
+            reject(np.ones(n_rows, dtype=bool), f"{name}: field required")
+            columns[name] = np.zeros(n_rows, dtype=field.annotation)
+            continue
+
+        column = X[name]
+        reject(column.isna().to_numpy(), f"{name}: field required")
+
+        if field.annotation is str:
+            values = column.fillna("").astype(str).to_numpy(dtype=object)
+            if name == "flag":
+                reject(
+                    ~np.isin(values, VALID_FLAGS), f"flag must be one of {VALID_FLAGS}"
+                )
+            columns[name] = values
+            continue
+
+        if column.dtype == object:
+            column = column.map(
+                lambda v: (
+                    _BOOL_STRINGS.get(v.strip().lower(), v) if isinstance(v, str) else v
+                )
+            )
+        values = pd.to_numeric(column, errors="coerce").to_numpy(dtype=np.float64)
+        reject(~np.isfinite(values), f"{name}: value is not a valid number")
+
+        if field.annotation is bool:
+            reject(~np.isin(values, (0, 1)), f"{name}: value is not a valid boolean")
+            columns[name] = values == 1
+            continue
+        if field.annotation is int:
+            with np.errstate(invalid="ignore"):
+                fractional = np.mod(values, 1) != 0
+            reject(fractional, f"{name}: value is not a valid integer")
+
+        for constraint in field.metadata:
+            ge = getattr(constraint, "ge", None)
+            if ge is not None:
+                reject(values < ge, f"{name}: must be greater than or equal to {ge}")
+            le = getattr(constraint, "le", None)
+            if le is not None:
+                reject(values > le, f"{name}: must be less than or equal to {le}")
+        columns[name] = values
+
+    errors = {int(i): reasons[i] for i in np.flatnonzero(invalid)}
+    return pd.DataFrame(columns, index=X.index), ~invalid, errors
+
+
 class SingleDecisionRequest(BaseModel):
     features: NetworkTrafficFeatures
     correlation_id: str
@@ -49,6 +130,37 @@ class BatchDecisionRequest(BaseModel):
     model_version: Optional[str] = None
 
 
+class ColumnarBatchDecisionRequest(BaseModel):
+    """
+    Batch of traffic features sent as one array per feature.
+
+    Only the shape is checked here; values are validated column by column with
+    ``validate_traffic_frame`` so that invalid rows are reported by index.
+    """
+
+    features: Dict[str, List[Any]]
+    correlation_id: str
+    model_version: Optional[str] = None
+
+    @validator("features")
+    def validate_columns(cls, v):
+        """Validate that every feature is present and all arrays have one length."""
+        missing = [name for name in TRAFFIC_FEATURES if name not in v]
+        if missing:
+            raise ValueError(f"missing feature columns: {missing}")
+        unknown = [name for name in v if name not in TRAFFIC_FEATURES]
+        if unknown:
+            raise ValueError(f"unknown feature columns: {unknown}")
+        lengths = {len(values) for values in v.values()}
+        if len(lengths) > 1:
+            raise ValueError("feature columns must all have the same length")
+        return v
+
+    def to_frame(self) -> pd.DataFrame:
+        """Get the feature columns as a DataFrame."""
+        return pd.DataFrame(self.features, columns=TRAFFIC_FEATURES)
+
+
 class DecisionResponse(BaseModel):
     classification_result: ClassificationResult
     timestamp: datetime
@@ -4,11 +4,14 @@ Core components for the intrusion detection system.
 
 from .redisclient import RedisClient, get_redis_client
 from .supabaseclient import SupabaseClient, get_current_user, get_supabase_client
+from .supabasehttp import AsyncSupabaseClient, get_async_supabase_client
 
 __all__ = [
     "SupabaseClient",
     "get_supabase_client",
     "get_current_user",
+    "AsyncSupabaseClient",
+    "get_async_supabase_client",
     "RedisClient",
     "get_redis_client",
 ]
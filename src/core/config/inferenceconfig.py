@@ -0,0 +1,68 @@
+import logging
+import os
+from functools import lru_cache
+
+from pydantic_settings import BaseSettings
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceSettings(BaseSettings):
+    # Executor running transform/predict off the event loop
+    INFERENCE_EXECUTOR: str = os.getenv("INFERENCE_EXECUTOR", "thread")
+    INFERENCE_MAX_WORKERS: int = int(
+        os.getenv("INFERENCE_MAX_WORKERS", str(os.cpu_count() or 1))
+    )
+    INFERENCE_MAX_QUEUE_DEPTH: int = int(os.getenv("INFERENCE_MAX_QUEUE_DEPTH", "256"))
+    INFERENCE_TIMEOUT_S: float = float(os.getenv("INFERENCE_TIMEOUT_S", "10"))
+
+    # Worker processes sharing the model for large batches (0 disables)
+    INFERENCE_SHARD_WORKERS: int = int(os.getenv("INFERENCE_SHARD_WORKERS", "0"))
+    INFERENCE_MIN_SHARD_ROWS: int = int(os.getenv("INFERENCE_MIN_SHARD_ROWS", "2048"))
+
+    # Model loading and hot reload
+    MODEL_ARTIFACTS_DIR: str = os.getenv("MODEL_ARTIFACTS_DIR", "artifacts")
+    MODEL_RELOAD_POLL_S: float = float(os.getenv("MODEL_RELOAD_POLL_S", "0"))
+    MODEL_WARMUP_ROWS: int = int(os.getenv("MODEL_WARMUP_ROWS", "64"))
+
+    # Versions served side by side, routed by the request's model_version
+    MODEL_REGISTRY_MAX_VERSIONS: int = int(
+        os.getenv("MODEL_REGISTRY_MAX_VERSIONS", "4")
+    )
+    MODEL_REGISTRY_MAX_BYTES: int = int(os.getenv("MODEL_REGISTRY_MAX_BYTES", "0"))
+    MODEL_REGISTRY_STRICT: bool = (
+        os.getenv("MODEL_REGISTRY_STRICT", "false").lower() == "true"
+    )
+    # Seconds between refreshes of the list of versions that exist
+    MODEL_REGISTRY_REFRESH_S: float = float(os.getenv("MODEL_REGISTRY_REFRESH_S", "60"))
+
+    # Shadow scoring of a candidate version on sampled live traffic
+    SHADOW_MODEL_VERSION: str = os.getenv("SHADOW_MODEL_VERSION", "")
+    SHADOW_SAMPLE_RATE: float = float(os.getenv("SHADOW_SAMPLE_RATE", "0.05"))
+    SHADOW_MAX_QUEUE_DEPTH: int = int(os.getenv("SHADOW_MAX_QUEUE_DEPTH", "1000"))
+    SHADOW_FLUSH_INTERVAL_S: float = float(os.getenv("SHADOW_FLUSH_INTERVAL_S", "60"))
+
+    # Chunked scoring of streamed CSV uploads
+    STREAM_CHUNK_ROWS: int = int(os.getenv("STREAM_CHUNK_ROWS", "10000"))
+    STREAM_MAX_CHUNK_ROWS: int = int(os.getenv("STREAM_MAX_CHUNK_ROWS", "100000"))
+
+    # Micro-batching of concurrent single-record requests
+    MICROBATCH_ENABLED: bool = os.getenv("MICROBATCH_ENABLED", "true").lower() == "true"
+    MICROBATCH_MAX_WAIT_MS: float = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2"))
+    MICROBATCH_MAX_BATCH_SIZE: int = int(os.getenv("MICROBATCH_MAX_BATCH_SIZE", "64"))
+
+    class Config:
+        env_file = ".env"
+        case_sensitive = True
+        extra = "ignore"
+
+
+@lru_cache()
+def get_inference_settings() -> InferenceSettings:
+    try:
+        settings = InferenceSettings()
+        logger.info("Inference configuration loaded successfully")
+        return settings
+    except Exception as e:
+        logger.error(f"Error loading inference configuration: {str(e)}")
+        raise
@@ -0,0 +1,398 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from src.core.config.supabaseconfig import get_supabase_settings
+from src.core.supabasehttp import BulkInsertResult, get_async_supabase_client
+from src.utils.metrics import LATENCY_BUCKETS_MS, Histogram
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "spill")
+
+# Flush latencies span whole bulk inserts, so extend the default buckets
+FLUSH_LATENCY_BUCKETS_MS = LATENCY_BUCKETS_MS + (2500, 5000, 10000)
+
+COUNTERS = ("enqueued", "written", "failed", "dropped", "spilled", "replayed")
+
+
+class DecisionQueueFullError(Exception):
+    """Raised when a blocking put finds no room before its timeout."""
+
+
+class DecisionQueue:
+    """
+    Write-behind queue of decision records.
+
+    Request handlers ``put`` records and return without waiting for the
+    database. A background flusher writes queued records with ``write_fn`` in
+    batches of up to ``batch_size``, as soon as that many are queued or every
+    ``flush_interval_s`` otherwise.
+
+    At most ``max_queue_depth`` records are held in memory. When full,
+    ``overflow`` decides what happens to new records:
+
+    - ``block``: ``put`` waits for room, for up to ``put_timeout_s``
+    - ``drop_oldest``: the oldest queued records are discarded
+    - ``spill``: new records are appended to ``spill_path`` as JSON lines
+
+    Spilled records, and records of failed writes when a spill file is set,
+    are read back when the queue has drained, at most every
+    ``replay_interval_s``, and on the next start, so they survive a restart;
+    a record is given up after ``max_attempts`` failed writes. ``stop``
+    flushes everything still queued.
+    """
+
+    def __init__(
+        self,
+        write_fn: Callable[[List[Dict[str, Any]]], Awaitable[BulkInsertResult]],
+        max_queue_depth: int = 10000,
+        batch_size: int = 1000,
+        flush_interval_s: float = 1.0,
+        overflow: str = "block",
+        spill_path: Optional[str] = None,
+        put_timeout_s: Optional[float] = 5.0,
+        max_attempts: int = 3,
+        replay_interval_s: float = 30.0,
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            write_fn: Writes a batch of records, e.g.
+                ``AsyncSupabaseClient.record_ml_decisions``
+            max_queue_depth (int): Most records held in memory
+            batch_size (int): Most records written per flush
+            flush_interval_s (float): Longest time a record waits to be flushed
+            overflow (str): One of ``block``, ``drop_oldest`` or ``spill``
+            spill_path (str, optional): JSON lines file of spilled records,
+                required by the ``spill`` policy
+            put_timeout_s (float, optional): Longest wait of a blocking put,
+                unbounded if None
+            max_attempts (int): Failed writes after which a record is dropped
+            replay_interval_s (float): Shortest time between reading spilled
+                records back, which paces the retries of failed writes
+
+        Raises:
+            ValueError: If the configuration is invalid
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"overflow must be one of {', '.join(OVERFLOW_POLICIES)}, got {overflow}"
+            )
+        if overflow == "spill" and not spill_path:
+            raise ValueError("The spill overflow policy needs a spill_path")
+        if max_queue_depth < 1 or batch_size < 1:
+            raise ValueError("max_queue_depth and batch_size must be at least 1")
+
+        self.write_fn = write_fn
+        self.max_queue_depth = max_queue_depth
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.overflow = overflow
+        self.spill_path = Path(spill_path) if spill_path else None
+        self.put_timeout_s = put_timeout_s
+        self.max_attempts = max_attempts
+        self.replay_interval_s = replay_interval_s
+        self._next_replay = 0.0
+
+        # Records with the number of failed writes they have been through
+        self._buffer: Deque[Tuple[Dict[str, Any], int]] = deque()
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._not_full: Optional[asyncio.Condition] = None
+        self._closing = False
+
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.max_depth_seen = 0
+        self.flush_latency_histogram = Histogram(FLUSH_LATENCY_BUCKETS_MS)
+        self.batch_size_histogram = Histogram(
+            [b for b in (1, 10, 100, 1000, 10000) if b < batch_size] + [batch_size]
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    @property
+    def depth(self) -> int:
+        return len(self._buffer)
+
+    def _ensure_started(self):
+        """Start the flusher on the running event loop if it isn't already."""
+        loop = asyncio.get_running_loop()
+        if self.running and self._loop is loop:
+            return
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._not_full = asyncio.Condition()
+        self._closing = False
+        self._worker = loop.create_task(self._run())
+        logger.info(
+            f"Started decision queue (max_queue_depth={self.max_queue_depth}, "
+            f"batch_size={self.batch_size}, overflow={self.overflow})"
+        )
+
+    async def start(self):
+        """Start the flusher, writing back records spilled by an earlier run."""
+        self._ensure_started()
+        if self._spill_pending():
+            self._wake.set()
+
+    async def put(self, records: Sequence[Dict[str, Any]]):
+        """
+        Queue records to be written.
+
+        Args:
+            records (list): Decision rows, e.g. from ``build_decision_record``
+
+        Raises:
+            DecisionQueueFullError: If the ``block`` policy times out waiting
+                for room; the records not queued yet are discarded
+        """
+        self._ensure_started()
+        records = list(records)
+        self.counters["enqueued"] += len(records)
+
+        for i, record in enumerate(records):
+            if len(self._buffer) >= self.max_queue_depth:
+                if self.overflow == "spill":
+                    self._spill([(r, 0) for r in records[i:]])
+                    break
+                if self.overflow == "drop_oldest":
+                    self._buffer.popleft()
+                    self.counters["dropped"] += 1
+                else:
+                    await self._wait_for_room(len(records) - i)
+            self._buffer.append((record, 0))
+
+        self.max_depth_seen = max(self.max_depth_seen, len(self._buffer))
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    async def _wait_for_room(self, remaining: int):
+        """Wake the flusher and wait until a record fits into the queue."""
+        self._wake.set()
+        try:
+            async with self._not_full:
+                await asyncio.wait_for(
+                    self._not_full.wait_for(
+                        lambda: len(self._buffer) < self.max_queue_depth
+                    ),
+                    self.put_timeout_s,
+                )
+        except asyncio.TimeoutError:
+            self.counters["dropped"] += remaining
+            raise DecisionQueueFullError(
+                f"Decision queue is full ({self.max_queue_depth} records waiting)"
+            )
+
+    async def stop(self, timeout: Optional[float] = 30.0):
+        """
+        Flush everything queued, then stop the flusher.
+
+        Args:
+            timeout (float, optional): Longest wait for the final flush; what
+                is left after it is spilled if a spill file is set
+        """
+        if not self.running:
+            return
+        if self._loop is not asyncio.get_running_loop():
+            # The flusher belongs to a loop that is no longer serving requests;
+            # queued records are flushed by the next loop's flusher
+            self._worker = None
+            return
+
+        self._closing = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._worker), timeout)
+        except asyncio.TimeoutError:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            if self._buffer:
+                logger.error(
+                    f"Decision queue did not flush within {timeout}s, "
+                    f"{len(self._buffer)} records left"
+                )
+                if self.spill_path is not None:
+                    self._spill(list(self._buffer))
+                    self._buffer.clear()
+        self._worker = None
+        logger.info("Stopped decision queue")
+
+    async def _run(self):
+        """Flusher loop: flush by size or interval until closed."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval_s)
+                interval_elapsed = False
+            except asyncio.TimeoutError:
+                interval_elapsed = True
+            self._wake.clear()
+
+            # Woken by size, a partial batch waits for more records or the interval
+            await self.flush(full_only=not (interval_elapsed or self._closing))
+            if self._closing:
+                return
+            if (
+                not self._buffer
+                and time.monotonic() >= self._next_replay
+                and self._spill_pending()
+            ):
+                self._next_replay = time.monotonic() + self.replay_interval_s
+                self._replay()
+                await self.flush()
+
+    async def flush(self, full_only: bool = False):
+        """
+        Write queued records in batches of up to ``batch_size``.
+
+        Args:
+            full_only (bool): Only write full batches, or everything if the
+                queue is at capacity
+        """
+        full = min(self.batch_size, self.max_queue_depth)
+        while self._buffer and (not full_only or len(self._buffer) >= full):
+            batch = [
+                self._buffer.popleft()
+                for _ in range(min(self.batch_size, len(self._buffer)))
+            ]
+            async with self._not_full:
+                self._not_full.notify_all()
+            await self._write(batch)
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], int]]):
+        """Write one batch and handle the records of failed chunks."""
+        records = [record for record, _ in batch]
+        started = time.perf_counter()
+        try:
+            outcome = await self.write_fn(records)
+            failed = [
+                i
+                for failure in outcome.failures
+                for i in range(failure["start"], failure["stop"])
+            ]
+            errors = {failure["error"] for failure in outcome.failures}
+        except Exception as e:
+            failed = list(range(len(batch)))
+            errors = {str(e)}
+        self.flush_latency_histogram.observe((time.perf_counter() - started) * 1000.0)
+        self.batch_size_histogram.observe(len(batch))
+        self.counters["written"] += len(batch) - len(failed)
+
+        if not failed:
+            return
+        logger.error(
+            f"Failed to write {len(failed)}/{len(batch)} decisions: "
+            f"{'; '.join(sorted(errors))}"
+        )
+        retry = [
+            (batch[i][0], batch[i][1] + 1)
+            for i in failed
+            if batch[i][1] + 1 < self.max_attempts
+        ]
+        self.counters["failed"] += len(failed) - len(retry)
+        if retry and self.spill_path is not None:
+            self._spill(retry)
+        else:
+            self.counters["failed"] += len(retry)
+
+    def _spill(self, items: Sequence[Tuple[Dict[str, Any], int]], count: bool = True):
+        """Append records to the spill file."""
+        try:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.spill_path, "a") as f:
+                for record, attempts in items:
+                    f.write(json.dumps({"record": record, "attempts": attempts}) + "\n")
+            if count:
+                self.counters["spilled"] += len(items)
+        except Exception as e:
+            self.counters["dropped"] += len(items)
+            logger.error(f"Failed to spill {len(items)} decisions: {str(e)}")
+
+    def _spill_pending(self) -> bool:
+        return (
+            self.spill_path is not None
+            and self.spill_path.exists()
+            and self.spill_path.stat().st_size > 0
+        )
+
+    def _replay(self):
+        """Move spilled records back into the queue, re-spilling what doesn't fit."""
+        replaying = self.spill_path.with_name(f"{self.spill_path.name}.replay")
+        try:
+            os.replace(self.spill_path, replaying)
+            with open(replaying) as f:
+                items = [json.loads(line) for line in f if line.strip()]
+        except Exception as e:
+            logger.error(f"Failed to read spilled decisions: {str(e)}")
+            return
+
+        room = max(self.max_queue_depth - len(self._buffer), 0)
+        for item in items[:room]:
+            self._buffer.append((item["record"], item["attempts"]))
+        if len(items) > room:
+            self._spill(
+                [(item["record"], item["attempts"]) for item in items[room:]],
+                count=False,
+            )
+        replaying.unlink()
+        self.counters["replayed"] += min(room, len(items))
+        logger.info(f"Replayed {min(room, len(items))} spilled decisions")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth, counters and flush-latency histograms."""
+        return {
+            "running": self.running,
+            "depth": len(self._buffer),
+            "max_depth_seen": self.max_depth_seen,
+            "max_queue_depth": self.max_queue_depth,
+            "batch_size": self.batch_size,
+            "flush_interval_s": self.flush_interval_s,
+            "overflow": self.overflow,
+            **self.counters,
+            "spill_bytes": (
+                self.spill_path.stat().st_size if self._spill_pending() else 0
+            ),
+            "flush_latency_ms": self.flush_latency_histogram.snapshot(),
+            "flush_size": self.batch_size_histogram.snapshot(),
+        }
+
+
+@lru_cache()
+def get_decision_queue() -> DecisionQueue:
+    """Get the decision queue writing to Supabase, configured from the settings."""
+    settings = get_supabase_settings()
+    return DecisionQueue(
+        get_async_supabase_client().record_ml_decisions,
+        max_queue_depth=settings.DECISION_QUEUE_MAX_DEPTH,
+        batch_size=settings.DECISION_QUEUE_BATCH_SIZE,
+        flush_interval_s=settings.DECISION_QUEUE_FLUSH_INTERVAL_S,
+        overflow=settings.DECISION_QUEUE_OVERFLOW,
+        spill_path=settings.DECISION_QUEUE_SPILL_PATH or None,
+        put_timeout_s=settings.DECISION_QUEUE_PUT_TIMEOUT_S or None,
+        max_attempts=settings.DECISION_QUEUE_MAX_ATTEMPTS,
+    )
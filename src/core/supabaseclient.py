@@ -1,13 +1,13 @@
 import logging
-import uuid
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
-import jwt
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from src.core.config.supabaseconfig import get_supabase_settings
+from src.core.supabasehttp import build_decision_record
+from src.core.tokenverifier import TokenVerificationError, get_token_verifier
 from supabase import Client, create_client
 
 # Configure logging
@@ -84,44 +84,18 @@ class SupabaseClient:
     def get_user(self, token: str) -> Dict[str, Any]:
         """
         Get the current user's information from their JWT token.
+
+        The token is verified locally, and served from the shared cache of
+        verified tokens when it was seen before.
         """
         try:
-            # Instead of using set_session, we'll decode the JWT token directly
-            # and validate it using the JWT secret
-            settings = get_supabase_settings()
-
-            # Decode the JWT token to get user information
-            # We'll use the JWT secret from Supabase settings
-            from datetime import datetime
-
-            import jwt
-
-            try:
-                # Decode the token without verification first to get the payload
-                decoded = jwt.decode(token, options={"verify_signature": False})
-
-                # Extract user information from the token
-                user_id = decoded.get("sub")  # 'sub' is the user ID in JWT
-                email = decoded.get("email")
-
-                if not user_id:
-                    logger.error("User ID not found in JWT token")
-                    raise HTTPException(
-                        status_code=401, detail="Invalid token - no user ID"
-                    )
-
-                logger.info(f"Successfully decoded JWT token for user: {email}")
-
-                return {"user": {"id": user_id, "email": email}}
-
-            except jwt.InvalidTokenError as e:
-                logger.error(f"Invalid JWT token: {str(e)}")
-                raise HTTPException(status_code=401, detail="Invalid token format")
-
-        except Exception as e:
-            logger.error(f"Error getting user: {str(e)}")
+            claims = get_token_verifier().verify(token)
+        except TokenVerificationError as e:
+            logger.error(f"Invalid JWT token: {str(e)}")
             raise HTTPException(status_code=401, detail="Invalid token")
 
+        return {"user": {"id": claims["sub"], "email": claims.get("email")}}
+
     def record_ml_decision(
         self,
         user_id: str,
@@ -138,35 +112,15 @@ class SupabaseClient:
         by the system after a model prediction.
         """
         try:
-            # Generate a unique correlation ID for this decision
-            correlation_id = str(uuid.uuid4())
-
-            # Prepare the decision record
-            decision_data = {
-                "user_id": user_id,
-                "correlation_id": correlation_id,
-                "source_type": source_type,
-                "classification_result": prediction.upper(),
-                "model_version": model_version,
-                "logged_in": bool(traffic_data["logged_in"]),
-                "count": int(traffic_data["count"]),
-                "serror_rate": float(traffic_data["serror_rate"]),
-                "srv_serror_rate": float(traffic_data["srv_serror_rate"]),
-                "same_srv_rate": float(traffic_data["same_srv_rate"]),
-                "dst_host_srv_count": int(traffic_data["dst_host_srv_count"]),
-                "dst_host_same_srv_rate": float(traffic_data["dst_host_same_srv_rate"]),
-                "dst_host_serror_rate": float(traffic_data["dst_host_serror_rate"]),
-                "dst_host_srv_serror_rate": float(
-                    traffic_data["dst_host_srv_serror_rate"]
-                ),
-                "flag": str(traffic_data["flag"]),
-            }
-
-            # Add batch-related fields if present
-            if batch_filename:
-                decision_data["batch_filename"] = batch_filename
-            if batch_contents:
-                decision_data["batch_file_contents"] = batch_contents
+            decision_data = build_decision_record(
+                user_id,
+                traffic_data,
+                prediction,
+                source_type=source_type,
+                batch_filename=batch_filename,
+                batch_contents=batch_contents,
+                model_version=model_version,
+            )
 
             # Use service client to ensure we have the necessary permissions
             response = (
@@ -237,21 +191,19 @@ class SupabaseClient:
             raise HTTPException(status_code=400, detail=str(e))
 
 
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ) -> Dict[str, Any]:
     """
     FastAPI dependency to get the current authenticated user.
     """
     try:
-        token = credentials.credentials
-        client = SupabaseClient()
-        user = client.get_user(token)
-        return user
-    except Exception as e:
+        claims = await get_token_verifier().authenticate(credentials.credentials)
+    except TokenVerificationError:
         raise HTTPException(
             status_code=401, detail="Invalid authentication credentials"
         )
+    return {"user": {"id": claims["sub"], "email": claims.get("email")}}
 
 
 # Create a singleton instance
@@ -0,0 +1,520 @@
+import asyncio
+import importlib.util
+import logging
+import uuid
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+from fastapi import HTTPException
+
+from src.core.config.supabaseconfig import get_supabase_settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional h2 package, e.g. pip install "httpx[http2]"
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def build_decision_record(
+    user_id: str,
+    traffic_data: Dict[str, Any],
+    prediction: str,
+    source_type: str = "single",
+    batch_filename: Optional[str] = None,
+    batch_contents: Optional[str] = None,
+    model_version: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Build the row of the decisions table recording one model decision.
+    """
+    # Generate a unique correlation ID for this decision
+    correlation_id = str(uuid.uuid4())
+
+    # Prepare the decision record
+    decision_data = {
+        "user_id": user_id,
+        "correlation_id": correlation_id,
+        "source_type": source_type,
+        "classification_result": prediction.upper(),
+        "model_version": model_version,
+        "logged_in": bool(traffic_data["logged_in"]),
+        "count": int(traffic_data["count"]),
+        "serror_rate": float(traffic_data["serror_rate"]),
+        "srv_serror_rate": float(traffic_data["srv_serror_rate"]),
+        "same_srv_rate": float(traffic_data["same_srv_rate"]),
+        "dst_host_srv_count": int(traffic_data["dst_host_srv_count"]),
+        "dst_host_same_srv_rate": float(traffic_data["dst_host_same_srv_rate"]),
+        "dst_host_serror_rate": float(traffic_data["dst_host_serror_rate"]),
+        "dst_host_srv_serror_rate": float(traffic_data["dst_host_srv_serror_rate"]),
+        "flag": str(traffic_data["flag"]),
+    }
+
+    # Add batch-related fields if present
+    if batch_filename:
+        decision_data["batch_filename"] = batch_filename
+    if batch_contents:
+        decision_data["batch_file_contents"] = batch_contents
+    return decision_data
+
+
+def _error_message(response: httpx.Response) -> str:
+    """Extract the error message of a GoTrue or PostgREST response."""
+    try:
+        body = response.json()
+    except ValueError:
+        return response.text
+    if isinstance(body, dict):
+        for field in ("message", "msg", "error_description", "error"):
+            if body.get(field):
+                return str(body[field])
+    return response.text
+
+
+class BulkInsertResult:
+    """
+    Outcome of inserting rows in chunks.
+
+    Every chunk is one multi-row insert that succeeds or fails as a whole;
+    ``chunks`` holds one report per chunk with its row range and error.
+    """
+
+    def __init__(self, chunks: List[Dict[str, Any]]):
+        self.chunks = chunks
+
+    @property
+    def inserted(self) -> int:
+        return sum(c["rows"] for c in self.chunks if c["error"] is None)
+
+    @property
+    def failed(self) -> int:
+        return sum(c["rows"] for c in self.chunks if c["error"] is not None)
+
+    @property
+    def failures(self) -> List[Dict[str, Any]]:
+        return [c for c in self.chunks if c["error"] is not None]
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "chunks": len(self.chunks),
+            "failed_chunks": len(self.failures),
+        }
+
+
+class AsyncSupabaseClient:
+    """
+    Async access to Supabase Auth (GoTrue) and the REST API (PostgREST).
+
+    All requests share one keep-alive connection pool, negotiating HTTP/2
+    with servers that support it, so requests reuse open connections instead
+    of opening a TCP/TLS connection each and never block the event loop.
+
+    Errors are raised as HTTPException, like SupabaseClient.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        anon_key: str,
+        service_key: str,
+        http2: bool = True,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry_s: float = 30.0,
+        connect_timeout_s: float = 5.0,
+        timeout_s: float = 10.0,
+        insert_chunk_rows: int = 1000,
+        insert_concurrency: int = 4,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Args:
+            url (str): Supabase URL
+            anon_key (str): Anonymous key, used for auth requests
+            service_key (str): Service role key, used for table access
+            http2 (bool): Negotiate HTTP/2 where the server supports it
+            max_connections (int): Most open connections
+            max_keepalive_connections (int): Most idle connections kept open
+            keepalive_expiry_s (float): Seconds an idle connection is kept
+            connect_timeout_s (float): Timeout of establishing a connection
+            timeout_s (float): Timeout of reads, writes and pool waits
+            insert_chunk_rows (int): Rows per request of bulk inserts
+            insert_concurrency (int): Chunks of a bulk insert sent at once
+            transport (optional): Transport to send requests with, e.g. an
+                ``httpx.ASGITransport`` over a stub server in tests
+        """
+        self.url = url.rstrip("/")
+        self.anon_key = anon_key
+        self.service_key = service_key
+        if http2 and not HTTP2_AVAILABLE and transport is None:
+            logger.warning("h2 is not installed, using HTTP/1.1 for Supabase")
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry_s,
+        )
+        self.timeout = httpx.Timeout(timeout_s, connect=connect_timeout_s)
+        self.transport = transport
+        self.insert_chunk_rows = insert_chunk_rows
+        self.insert_concurrency = insert_concurrency
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.requests = 0
+        self.errors = 0
+
+    def _http(self) -> httpx.AsyncClient:
+        """Get the pooled client, opening it on the running event loop."""
+        loop = asyncio.get_running_loop()
+        # Pooled connections belong to the loop that opened them
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.url,
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout,
+                transport=self.transport,
+            )
+            self._loop = loop
+        return self._client
+
+    async def close(self):
+        """Close the pooled connections; the pool reopens on the next request."""
+        if self._client is not None:
+            if self._loop is asyncio.get_running_loop():
+                await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        key: str,
+        token: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Send a request over the pool.
+
+        Args:
+            method (str): HTTP method
+            path (str): Path below the Supabase URL
+            key (str): API key of the request
+            token (str, optional): Bearer token, the API key if None
+            headers (dict, optional): Additional headers
+            **kwargs: Passed to ``httpx.AsyncClient.request``
+
+        Returns:
+            httpx.Response: The response, of any status
+
+        Raises:
+            HTTPException: If Supabase cannot be reached
+        """
+        request_headers = {"apikey": key, "Authorization": f"Bearer {token or key}"}
+        request_headers.update(headers or {})
+        self.requests += 1
+        try:
+            return await self._http().request(
+                method, path, headers=request_headers, **kwargs
+            )
+        except httpx.HTTPError as e:
+            self.errors += 1
+            logger.error(f"Supabase request {method} {path} failed: {str(e)}")
+            raise HTTPException(
+                status_code=503, detail=f"Supabase unavailable: {str(e)}"
+            )
+
+    def _check(self, response: httpx.Response, status_code: int = 400):
+        """Raise an HTTPException with the server's message for error responses."""
+        if response.is_error:
+            self.errors += 1
+            raise HTTPException(
+                status_code=status_code, detail=_error_message(response)
+            )
+
+    async def sign_up(self, email: str, password: str) -> Dict[str, Any]:
+        """
+        Register a new user. All users are created as admin by default.
+        """
+        response = await self._request(
+            "POST",
+            "/auth/v1/signup",
+            self.anon_key,
+            json={"email": email, "password": password},
+        )
+        self._check(response)
+
+        # A session when sign-ups are confirmed automatically, else the user
+        data = response.json()
+        user = data.get("user") or data
+        if not user.get("id"):
+            raise HTTPException(
+                status_code=400, detail="Registration failed - no user created"
+            )
+        return {
+            "user": {"id": user["id"], "email": user.get("email")},
+            "session": {"access_token": data.get("access_token")},
+        }
+
+    async def sign_in(self, email: str, password: str) -> Dict[str, Any]:
+        """
+        Authenticate a user and return their session.
+        """
+        response = await self._request(
+            "POST",
+            "/auth/v1/token",
+            self.anon_key,
+            params={"grant_type": "password"},
+            json={"email": email, "password": password},
+        )
+        if response.is_error:
+            self.errors += 1
+            logger.error(f"Sign in error: {_error_message(response)}")
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+
+        data = response.json()
+        user = data.get("user") or {}
+        if not user.get("id"):
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+        return {
+            "user": {"id": user["id"], "email": user.get("email")},
+            "session": {"access_token": data.get("access_token")},
+        }
+
+    async def get_user(self, token: str) -> Dict[str, Any]:
+        """
+        Get the user a token belongs to from Supabase Auth.
+        """
+        response = await self._request(
+            "GET", "/auth/v1/user", self.anon_key, token=token
+        )
+        self._check(response, status_code=401)
+
+        user = response.json()
+        if not user.get("id"):
+            raise HTTPException(status_code=401, detail="Invalid token - no user ID")
+        return {
+            "user": {
+                "id": user["id"],
+                "email": user.get("email"),
+                "created_at": user.get("created_at"),
+            }
+        }
+
+    async def record_ml_decision(
+        self,
+        user_id: str,
+        traffic_data: Dict[str, Any],
+        prediction: str,
+        confidence: float = 0.0,
+        source_type: str = "single",
+        batch_filename: Optional[str] = None,
+        batch_contents: Optional[str] = None,
+        model_version: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Record a decision made by the ML model. This is an internal method that should only be called
+        by the system after a model prediction.
+        """
+        decision_data = build_decision_record(
+            user_id,
+            traffic_data,
+            prediction,
+            source_type=source_type,
+            batch_filename=batch_filename,
+            batch_contents=batch_contents,
+            model_version=model_version,
+        )
+        response = await self._request(
+            "POST",
+            "/rest/v1/decisions",
+            self.service_key,
+            headers={"Prefer": "return=representation"},
+            json=decision_data,
+        )
+        self._check(response)
+        return response.json()[0]
+
+    async def record_ml_decisions(
+        self,
+        records: Sequence[Dict[str, Any]],
+        chunk_rows: Optional[int] = None,
+    ) -> BulkInsertResult:
+        """
+        Insert decision rows, one multi-row insert per chunk.
+
+        Chunks are sent concurrently over the pool, up to
+        ``insert_concurrency`` at a time, so a batch costs a request per chunk
+        rather than per row. A failed chunk does not stop the others.
+
+        Args:
+            records (list): Rows from ``build_decision_record``
+            chunk_rows (int, optional): Rows per insert, ``insert_chunk_rows``
+                if None
+
+        Returns:
+            BulkInsertResult: Per-chunk outcome of the insert
+        """
+        chunk_rows = max(1, chunk_rows or self.insert_chunk_rows)
+        semaphore = asyncio.Semaphore(max(1, self.insert_concurrency))
+
+        async def insert_chunk(start: int) -> Dict[str, Any]:
+            rows = records[start : start + chunk_rows]
+            # PostgREST needs the same keys in every row of a bulk insert
+            columns = sorted({column for row in rows for column in row})
+            error = None
+            async with semaphore:
+                try:
+                    response = await self._request(
+                        "POST",
+                        "/rest/v1/decisions",
+                        self.service_key,
+                        headers={"Prefer": "return=minimal,missing=default"},
+                        params={"columns": ",".join(columns)},
+                        json=list(rows),
+                    )
+                    self._check(response)
+                except HTTPException as e:
+                    error = str(e.detail)
+            return {
+                "chunk": start // chunk_rows,
+                "start": start,
+                "stop": start + len(rows),
+                "rows": len(rows),
+                "error": error,
+            }
+
+        chunks = await asyncio.gather(
+            *(insert_chunk(start) for start in range(0, len(records), chunk_rows))
+        )
+        return BulkInsertResult(list(chunks))
+
+    async def query_decisions(
+        self,
+        user_id: Optional[str] = None,
+        source_type: Optional[str] = None,
+        classification_result: Optional[str] = None,
+        order_by: str = "timestamp",
+        descending: bool = True,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Query the decision history.
+
+        Args:
+            user_id (str, optional): Only decisions of this user
+            source_type (str, optional): Only single or batch decisions
+            classification_result (str, optional): Only NORMAL or MALICIOUS ones
+            order_by (str): Column to sort by
+            descending (bool): Sort in descending order
+            offset (int): Decisions to skip
+            limit (int, optional): Most decisions returned, all if None
+
+        Returns:
+            list: Decision rows
+        """
+        params = {
+            "select": "*",
+            "order": f"{order_by}.{'desc' if descending else 'asc'}",
+            "offset": str(offset),
+        }
+        filters = {
+            "user_id": user_id,
+            "source_type": source_type,
+            "classification_result": classification_result,
+        }
+        params.update({k: f"eq.{v}" for k, v in filters.items() if v is not None})
+        if limit is not None:
+            params["limit"] = str(limit)
+
+        response = await self._request(
+            "GET", "/rest/v1/decisions", self.service_key, params=params
+        )
+        self._check(response)
+        return response.json()
+
+    async def get_user_decisions(self, user_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the history of decisions for a specific user.
+        """
+        return await self.query_decisions(user_id=user_id)
+
+    async def get_user_profile(self, user_id: str, token: str) -> Dict[str, Any]:
+        """
+        Get a user's profile information.
+
+        Runs with the caller's access token, so row-level security decides
+        which profiles the caller may read.
+        """
+        response = await self._request(
+            "GET",
+            "/rest/v1/profiles",
+            self.anon_key,
+            token=token,
+            headers={"Accept": "application/vnd.pgrst.object+json"},
+            params={"select": "*", "id": f"eq.{user_id}"},
+        )
+        self._check(response)
+        return response.json()
+
+    async def update_user_profile(
+        self, user_id: str, data: Dict[str, Any], token: str
+    ) -> Dict[str, Any]:
+        """
+        Update a user's profile.
+
+        Runs with the caller's access token, so row-level security decides
+        whether the caller may update the profile.
+        """
+        response = await self._request(
+            "PATCH",
+            "/rest/v1/profiles",
+            self.anon_key,
+            token=token,
+            headers={"Prefer": "return=representation"},
+            params={"id": f"eq.{user_id}"},
+            json=data,
+        )
+        self._check(response)
+        rows = response.json()
+        if not rows:
+            raise HTTPException(status_code=400, detail="Profile not found")
+        return rows[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Request counters and pool configuration for monitoring."""
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+        }
+
+
+@lru_cache()
+def get_async_supabase_client() -> AsyncSupabaseClient:
+    """Get the shared async Supabase client configured from the settings."""
+    settings = get_supabase_settings()
+    return AsyncSupabaseClient(
+        url=settings.SUPABASE_URL,
+        anon_key=settings.SUPABASE_KEY,
+        service_key=settings.SUPABASE_SERVICE_KEY,
+        http2=settings.SUPABASE_HTTP2,
+        max_connections=settings.SUPABASE_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.SUPABASE_POOL_MAX_KEEPALIVE,
+        keepalive_expiry_s=settings.SUPABASE_POOL_KEEPALIVE_EXPIRY_S,
+        connect_timeout_s=settings.SUPABASE_CONNECT_TIMEOUT_S,
+        timeout_s=settings.SUPABASE_TIMEOUT_S,
+        insert_chunk_rows=settings.SUPABASE_INSERT_CHUNK_ROWS,
+        insert_concurrency=settings.SUPABASE_INSERT_CONCURRENCY,
+    )
@@ -0,0 +1,410 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import jwt
+from fastapi import HTTPException
+
+from src.core.config.supabaseconfig import get_supabase_settings
+from src.core.supabasehttp import AsyncSupabaseClient, get_async_supabase_client
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HMAC_ALGORITHMS = ("HS256", "HS384", "HS512")
+ASYMMETRIC_ALGORITHMS = ("RS256", "RS384", "RS512", "ES256", "ES384", "EdDSA")
+
+# Shortest interval between refreshes triggered by unknown key IDs
+MIN_REFRESH_INTERVAL_S = 30.0
+
+
+class TokenVerificationError(Exception):
+    """Raised when an access token is malformed, expired or wrongly signed."""
+
+
+class SigningKeyUnavailableError(TokenVerificationError):
+    """Raised when no local key can verify an access token."""
+
+
+class VerifiedTokenCache:
+    """
+    LRU cache of the claims of verified tokens.
+
+    Entries are keyed by the token's SHA-256 digest, so raw tokens are not
+    kept, and expire at the token's ``exp`` claim. The least recently used
+    entry is evicted once ``max_entries`` is reached.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        """
+        Args:
+            max_entries (int): Most tokens kept, 0 disables the cache
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the claims of a token verified earlier.
+
+        Args:
+            token (str): Encoded JWT
+
+        Returns:
+            dict or None: The claims, or None if the token is not cached or
+                has expired
+        """
+        if not self.max_entries:
+            return None
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, claims = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return claims
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    def put(self, token: str, claims: Dict[str, Any], expires_at: Optional[float]):
+        """
+        Cache the claims of a verified token until it expires.
+
+        Args:
+            token (str): Encoded JWT
+            claims (dict): Its verified claims
+            expires_at (float, optional): Unix time the token expires at,
+                tokens without one are not cached
+        """
+        if not self.max_entries or expires_at is None or expires_at <= time.time():
+            return
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (float(expires_at), claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class TokenVerifier:
+    """
+    Verify Supabase access tokens locally.
+
+    HMAC-signed tokens are checked against the project's JWT secret and
+    asymmetrically signed ones against a JWKS that is fetched once and then
+    refreshed in the background, so verifying a token costs one signature
+    check instead of a request to Supabase Auth. Signature, expiry and
+    audience are checked, and ``sub`` is required.
+
+    Tokens no local key can verify are rejected, or passed to Supabase Auth's
+    ``/auth/v1/user`` endpoint when ``remote_fallback`` is enabled.
+
+    Verified tokens are cached until they expire, so a client repeating its
+    token is authenticated with one digest and dictionary lookup.
+    """
+
+    def __init__(
+        self,
+        jwt_secret: Optional[str] = None,
+        audience: Optional[str] = "authenticated",
+        jwks_url: Optional[str] = None,
+        jwks_refresh_s: float = 300.0,
+        leeway_s: float = 0.0,
+        remote_fallback: bool = False,
+        supabase: Optional[AsyncSupabaseClient] = None,
+        cache_size: int = 10000,
+    ):
+        """
+        Args:
+            jwt_secret (str, optional): Secret of HMAC-signed tokens
+            audience (str, optional): Required ``aud`` claim, None skips the check
+            jwks_url (str, optional): JWKS of asymmetrically signed tokens
+            jwks_refresh_s (float): Seconds between JWKS refreshes
+            leeway_s (float): Clock skew tolerated on ``exp``
+            remote_fallback (bool): Ask Supabase Auth about tokens no local
+                key can verify
+            supabase (AsyncSupabaseClient, optional): Client of the fallback
+            cache_size (int): Most verified tokens cached, 0 disables caching
+        """
+        self.jwt_secret = jwt_secret or None
+        self.audience = audience or None
+        self.jwks_url = jwks_url or None
+        self.jwks_refresh_s = jwks_refresh_s
+        self.leeway_s = leeway_s
+        self.remote_fallback = remote_fallback
+        self.supabase = supabase
+
+        self.cache = VerifiedTokenCache(cache_size)
+        self._keys: Dict[str, Any] = {}
+        self._refresher: Optional[asyncio.Task] = None
+        self._refresh_requested: Optional[asyncio.Event] = None
+        self.last_refresh: Optional[float] = None
+
+        self.verified = 0
+        self.rejected = 0
+        self.introspected = 0
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verify a token with the local keys.
+
+        Args:
+            token (str): Encoded JWT
+
+        Returns:
+            dict: The token's claims
+
+        Raises:
+            SigningKeyUnavailableError: If no local key matches the token
+            TokenVerificationError: If the token is invalid
+        """
+        cached = self.cache.get(token)
+        if cached is not None:
+            return cached
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.InvalidTokenError as e:
+            self.rejected += 1
+            raise TokenVerificationError(f"Malformed token: {str(e)}")
+
+        algorithm = header.get("alg")
+        if algorithm in HMAC_ALGORITHMS:
+            key = self.jwt_secret
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            key = self._keys.get(header.get("kid"))
+            if key is None:
+                self.request_refresh()
+        else:
+            self.rejected += 1
+            raise TokenVerificationError(f"Unsupported algorithm: {algorithm}")
+
+        if key is None:
+            raise SigningKeyUnavailableError(
+                f"No signing key for algorithm {algorithm}, key ID {header.get('kid')}"
+            )
+
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm],
+                audience=self.audience,
+                leeway=self.leeway_s,
+                options={
+                    "require": ["exp", "sub"],
+                    "verify_aud": self.audience is not None,
+                },
+            )
+        except jwt.InvalidTokenError as e:
+            self.rejected += 1
+            raise TokenVerificationError(str(e))
+
+        self.verified += 1
+        self.cache.put(token, claims, claims["exp"])
+        return claims
+
+    async def authenticate(self, token: str) -> Dict[str, Any]:
+        """
+        Verify a token locally, falling back to Supabase Auth if enabled.
+
+        Only tokens no local key can verify are sent to Supabase Auth; invalid
+        or expired ones are rejected locally either way.
+
+        Args:
+            token (str): Encoded JWT
+
+        Returns:
+            dict: The token's claims, with at least ``sub``
+
+        Raises:
+            TokenVerificationError: If the token cannot be verified
+        """
+        try:
+            return self.verify(token)
+        except SigningKeyUnavailableError:
+            if not self.remote_fallback:
+                self.rejected += 1
+                raise
+        claims = await self.introspect(token)
+        # Supabase Auth vouched for the token, so its unverified expiry holds
+        expires_at = jwt.decode(token, options={"verify_signature": False}).get("exp")
+        self.cache.put(token, claims, expires_at)
+        return claims
+
+    async def introspect(self, token: str) -> Dict[str, Any]:
+        """
+        Ask Supabase Auth for the user a token belongs to.
+
+        Args:
+            token (str): Encoded JWT
+
+        Returns:
+            dict: Claims built from the user, ``sub`` and ``email``
+
+        Raises:
+            TokenVerificationError: If Supabase Auth rejects the token
+        """
+        if self.supabase is None:
+            self.rejected += 1
+            raise TokenVerificationError("No Supabase client to verify the token with")
+
+        self.introspected += 1
+        try:
+            user = (await self.supabase.get_user(token))["user"]
+        except HTTPException as e:
+            self.rejected += 1
+            raise TokenVerificationError(f"Token validation failed: {e.detail}")
+        return {"sub": user["id"], "email": user.get("email")}
+
+    def load_jwks(self, jwks: Dict[str, Any]) -> int:
+        """
+        Replace the asymmetric keys with those of a JWKS document.
+
+        Args:
+            jwks (dict): Parsed JWKS, with a ``keys`` list
+
+        Returns:
+            int: Number of usable keys loaded
+        """
+        key_set = jwt.PyJWKSet.from_dict(jwks)
+        self._keys = {key.key_id: key for key in key_set.keys}
+        self.last_refresh = time.monotonic()
+        return len(self._keys)
+
+    async def refresh_keys(self) -> int:
+        """
+        Fetch the JWKS and swap in its keys.
+
+        Returns:
+            int: Number of usable keys loaded
+        """
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.get(self.jwks_url)
+            response.raise_for_status()
+        count = self.load_jwks(response.json())
+        logger.info(f"Loaded {count} signing keys from {self.jwks_url}")
+        return count
+
+    def request_refresh(self):
+        """Wake the refresher early, e.g. for a key ID not seen yet."""
+        if self._refresh_requested is not None:
+            self._refresh_requested.set()
+
+    async def _refresh_loop(self):
+        """Refresh the JWKS periodically and when an unknown key is requested."""
+        while True:
+            try:
+                await self.refresh_keys()
+            except Exception as e:
+                logger.error(f"Failed to refresh signing keys: {str(e)}")
+
+            self._refresh_requested.clear()
+            try:
+                await asyncio.wait_for(
+                    self._refresh_requested.wait(), timeout=self.jwks_refresh_s
+                )
+                # Rotations are rare: bound refreshes caused by forged key IDs
+                await asyncio.sleep(MIN_REFRESH_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start refreshing the JWKS on the running event loop, if configured."""
+        if not self.jwt_secret and not self.jwks_url:
+            logger.error(
+                "Neither SUPABASE_JWT_SECRET nor SUPABASE_JWKS_URL is set: "
+                + (
+                    "every access token will be verified by Supabase Auth"
+                    if self.remote_fallback
+                    else "every access token will be rejected"
+                )
+            )
+        if self.jwks_url and (self._refresher is None or self._refresher.done()):
+            self._refresh_requested = asyncio.Event()
+            self._refresher = asyncio.get_running_loop().create_task(
+                self._refresh_loop()
+            )
+            logger.info(
+                f"Refreshing signing keys from {self.jwks_url} "
+                f"every {self.jwks_refresh_s:g}s"
+            )
+
+    async def stop(self):
+        """Stop the JWKS refresher if it is running."""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+            self._refresh_requested = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and key state for monitoring."""
+        return {
+            "verified": self.verified,
+            "rejected": self.rejected,
+            "introspected": self.introspected,
+            "jwks_keys": len(self._keys),
+            "jwks_age_s": (
+                time.monotonic() - self.last_refresh
+                if self.last_refresh is not None
+                else None
+            ),
+            "remote_fallback": self.remote_fallback,
+            "cache": self.cache.stats(),
+        }
+
+
+@lru_cache()
+def get_token_verifier() -> TokenVerifier:
+    """Get the token verifier configured from the Supabase settings."""
+    settings = get_supabase_settings()
+    return TokenVerifier(
+        jwt_secret=settings.SUPABASE_JWT_SECRET,
+        audience=settings.SUPABASE_JWT_AUDIENCE,
+        jwks_url=settings.SUPABASE_JWKS_URL,
+        jwks_refresh_s=settings.SUPABASE_JWKS_REFRESH_S,
+        leeway_s=settings.SUPABASE_JWT_LEEWAY_S,
+        remote_fallback=settings.AUTH_REMOTE_FALLBACK,
+        supabase=get_async_supabase_client(),
+        cache_size=settings.AUTH_TOKEN_CACHE_SIZE,
+    )
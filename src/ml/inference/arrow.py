@@ -0,0 +1,140 @@
+import logging
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPES = ("application/vnd.apache.parquet", "application/x-parquet")
+
+CLASSIFICATION_LABELS = ["NORMAL", "MALICIOUS"]
+
+
+def is_arrow_media_type(media_type: Optional[str]) -> bool:
+    """Whether a Content-Type or Accept value names an Arrow stream."""
+    return ARROW_STREAM_MEDIA_TYPE in (media_type or "")
+
+
+def is_parquet_media_type(media_type: Optional[str]) -> bool:
+    """Whether a Content-Type value names a Parquet file."""
+    return any(name in (media_type or "") for name in PARQUET_MEDIA_TYPES)
+
+
+def read_table(
+    data: bytes, media_type: str, columns: Optional[Sequence[str]] = None
+) -> pa.Table:
+    """
+    Read an Arrow IPC stream or a Parquet file from a request body.
+
+    The Arrow stream is read straight from the body buffer without copying.
+    Parquet files only decode the requested columns.
+
+    Args:
+        data (bytes): Request body
+        media_type (str): Content-Type of the body
+        columns (optional): Columns to keep, defaults to all
+
+    Returns:
+        pa.Table: The decoded table
+
+    Raises:
+        ValueError: If the media type is not supported or the body is invalid
+    """
+    try:
+        if is_arrow_media_type(media_type):
+            with pa.ipc.open_stream(pa.py_buffer(data)) as reader:
+                table = reader.read_all()
+        elif is_parquet_media_type(media_type):
+            schema = pq.read_schema(pa.BufferReader(data))
+            if columns is not None:
+                columns = [name for name in columns if name in schema.names]
+            return pq.read_table(pa.BufferReader(data), columns=columns)
+        else:
+            raise ValueError(f"Unsupported media type: {media_type}")
+    except pa.ArrowException as e:
+        raise ValueError(f"Invalid Arrow body: {str(e)}")
+
+    if columns is not None:
+        table = table.select([name for name in columns if name in table.column_names])
+    return table
+
+
+def table_to_frame(table: pa.Table, features: Sequence[str]) -> pd.DataFrame:
+    """
+    Map the columns of a table onto a DataFrame of ``features``.
+
+    Numeric columns without nulls held in a single chunk are wrapped without
+    copying; other columns are converted once. Features missing from the table
+    are left out so that validation reports them.
+
+    Args:
+        table (pa.Table): Decoded request body
+        features: Feature names the preprocessor expects
+
+    Returns:
+        pd.DataFrame: One column per feature present in the table
+    """
+    columns = {}
+    for name in features:
+        if name not in table.column_names:
+            continue
+        column = table.column(name)
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+        columns[name] = column.to_numpy()
+    return pd.DataFrame(columns, index=pd.RangeIndex(table.num_rows), copy=False)
+
+
+def predictions_to_arrow(
+    predictions: np.ndarray,
+    errors: Dict[int, str],
+    metadata: Optional[Dict[str, str]] = None,
+) -> bytes:
+    """
+    Write predictions as an Arrow IPC stream.
+
+    The stream has one row per input row: ``prediction`` (-1 for failed rows),
+    a dictionary-encoded ``classification_result`` and a nullable ``error``.
+
+    Args:
+        predictions (np.ndarray): Labels aligned with the input, -1 on error
+        errors (dict): Error messages keyed by row position
+        metadata (dict, optional): Key-value pairs stored in the schema
+
+    Returns:
+        bytes: Serialized Arrow stream
+    """
+    predictions = np.asarray(predictions, dtype=np.int8)
+    failed = predictions < 0
+    result = pa.DictionaryArray.from_arrays(
+        pa.array(np.where(failed, 0, predictions), type=pa.int8(), mask=failed),
+        pa.array(CLASSIFICATION_LABELS),
+    )
+    if errors:
+        messages = np.full(len(predictions), None, dtype=object)
+        for i, error in errors.items():
+            messages[i] = error
+        error_column = pa.array(messages, type=pa.string())
+    else:
+        error_column = pa.nulls(len(predictions), type=pa.string())
+
+    table = pa.table(
+        {
+            "prediction": pa.array(predictions, type=pa.int8()),
+            "classification_result": result,
+            "error": error_column,
+        }
+    )
+    if metadata:
+        table = table.replace_schema_metadata(metadata)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,323 @@
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.ml.inference.compiled import compile_model
+from src.ml.inference.encoder import FeatureVectorEncoder, fitted_inputs
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Validates a frame into (normalized frame, valid row mask, errors by row)
+FrameValidator = Callable[
+    [pd.DataFrame], Tuple[pd.DataFrame, np.ndarray, Dict[int, str]]
+]
+
+
+class BatchScore:
+    """
+    Outcome of scoring a batch of traffic records.
+
+    Predictions are aligned with the input records; rows that could not be
+    scored hold -1 and have an entry in ``errors`` keyed by their index.
+    """
+
+    def __init__(self, predictions: np.ndarray, errors: Dict[int, str]):
+        self.predictions = predictions
+        self.errors = errors
+
+    def __len__(self) -> int:
+        return len(self.predictions)
+
+    @property
+    def successful(self) -> int:
+        return len(self.predictions) - len(self.errors)
+
+
+class BatchScorer:
+    """
+    Score a whole batch of traffic records with one transform and one predict.
+
+    Records are encoded straight into one NumPy matrix by a
+    FeatureVectorEncoder and predicted in a single call. Linear models are
+    compiled into a fused ``X @ w + b`` kernel; other models get the encoder's
+    replay of the fitted preprocessor. If a preprocessor cannot be replayed,
+    records go through the reference DataFrame path instead.
+
+    If the vectorized call fails, the batch is re-scored row by row so that
+    only the offending records are reported as errors.
+    """
+
+    def __init__(self, model: Any, preprocessor: Any, use_compiled: bool = True):
+        """
+        Initialize the scorer.
+
+        Args:
+            model: Fitted model exposing ``predict``
+            preprocessor: Fitted preprocessor exposing ``transform``
+            use_compiled (bool): Whether to generate the NumPy encoder and fused
+                kernel, or always use the reference DataFrame path
+        """
+        self.model = model
+        self.preprocessor = preprocessor
+        self.encoder = None
+        self.compiled = None
+        if use_compiled:
+            self.encoder = FeatureVectorEncoder.from_preprocessor(preprocessor)
+        if self.encoder is not None:
+            self.compiled = compile_model(model, preprocessor, encoder=self.encoder)
+        self.inputs = fitted_inputs(preprocessor)
+
+    def predict_frame(self, X: pd.DataFrame) -> np.ndarray:
+        """
+        Transform and predict a DataFrame of raw features with sklearn.
+
+        This is the reference implementation the NumPy paths must agree with.
+
+        Args:
+            X (pd.DataFrame): Raw traffic features
+
+        Returns:
+            np.ndarray: Predicted labels (0 for normal, 1 for malicious)
+        """
+        predictions = self.model.predict(self.preprocessor.transform(X))
+        return np.asarray(predictions).astype(np.int8, copy=False)
+
+    def predict_encoded(self, X_encoded: np.ndarray) -> np.ndarray:
+        """
+        Predict rows already encoded by ``self.encoder``.
+
+        Args:
+            X_encoded (np.ndarray): Encoded features
+
+        Returns:
+            np.ndarray: Predicted labels (0 for normal, 1 for malicious)
+        """
+        if self.compiled is not None:
+            predictions = self.compiled.predict_encoded(X_encoded)
+        else:
+            predictions = self.model.predict(self.encoder.transform_encoded(X_encoded))
+        return np.asarray(predictions).astype(np.int8, copy=False)
+
+    def predict_records(self, records: Sequence[Any]) -> np.ndarray:
+        """
+        Predict a sequence of records in one vectorized call.
+
+        Args:
+            records: NetworkTrafficFeatures objects or raw feature dictionaries
+
+        Returns:
+            np.ndarray: Predicted labels (0 for normal, 1 for malicious)
+        """
+        if self.encoder is None:
+            records = [r if isinstance(r, dict) else dict(r) for r in records]
+            return self.predict_frame(pd.DataFrame.from_records(records))
+        return self.predict_encoded(self.encoder.encode_records(records))
+
+    def predict_columns(self, X: pd.DataFrame) -> np.ndarray:
+        """
+        Predict a DataFrame of raw features in one vectorized call.
+
+        Args:
+            X (pd.DataFrame): Raw traffic features
+
+        Returns:
+            np.ndarray: Predicted labels (0 for normal, 1 for malicious)
+        """
+        if self.encoder is None:
+            return self.predict_frame(X)
+        return self.predict_encoded(self.encoder.encode_frame(X))
+
+    def predict_one(self, features: Any) -> int:
+        """
+        Predict a single record.
+
+        Args:
+            features: NetworkTrafficFeatures or a raw feature dictionary
+
+        Returns:
+            int: Predicted label (0 for normal, 1 for malicious)
+        """
+        return int(self.predict_records([features])[0])
+
+    def score(self, records: Sequence[Any]) -> BatchScore:
+        """
+        Score a batch of traffic records.
+
+        Args:
+            records: NetworkTrafficFeatures objects or raw feature dictionaries
+
+        Returns:
+            BatchScore: Predictions aligned with ``records`` and per-item errors
+        """
+        n_rows = len(records)
+        predictions = np.full(n_rows, -1, dtype=np.int8)
+        if n_rows == 0:
+            return BatchScore(predictions, {})
+
+        try:
+            predictions[:] = self.predict_records(records)
+            return BatchScore(predictions, {})
+        except Exception as e:
+            logger.warning(
+                f"Vectorized scoring of {n_rows} rows failed, isolating errors: {str(e)}"
+            )
+
+        return self._isolate_errors(records, predictions)
+
+    def score_frame(self, X: pd.DataFrame) -> BatchScore:
+        """
+        Score a DataFrame of raw features column by column.
+
+        Skips building per-record dictionaries when the input is already
+        columnar, e.g. a parsed CSV chunk.
+
+        Args:
+            X (pd.DataFrame): Raw traffic features
+
+        Returns:
+            BatchScore: Predictions aligned with the rows of ``X`` and per-row errors
+        """
+        n_rows = len(X)
+        predictions = np.full(n_rows, -1, dtype=np.int8)
+        if n_rows == 0:
+            return BatchScore(predictions, {})
+
+        try:
+            predictions[:] = self.predict_columns(X)
+            return BatchScore(predictions, {})
+        except Exception as e:
+            logger.warning(
+                f"Vectorized scoring of {n_rows} rows failed, isolating errors: {str(e)}"
+            )
+
+        return self._isolate_errors(X.to_dict("records"), predictions)
+
+    def validate_frame(
+        self, X: pd.DataFrame
+    ) -> Tuple[pd.DataFrame, np.ndarray, Dict[int, str]]:
+        """
+        Validate a frame against the inputs the preprocessor was fitted on.
+
+        Numerical features must be finite numbers and categorical features one
+        of the fitted categories. If the fitted inputs cannot be determined,
+        every row is left to the scorer's own error isolation.
+
+        Args:
+            X (pd.DataFrame): Raw traffic features
+
+        Returns:
+            tuple: Frame of the features, boolean mask of valid rows, and
+                error messages keyed by row position
+        """
+        if self.inputs is None:
+            return X, np.ones(len(X), dtype=bool), {}
+        return validate_fitted_frame(X, *self.inputs)
+
+    def score_valid_rows(
+        self,
+        X: pd.DataFrame,
+        validate: Optional[FrameValidator] = None,
+        errors: Optional[Dict[int, str]] = None,
+    ) -> BatchScore:
+        """
+        Validate a frame and score its valid rows with a single vectorized call.
+
+        Args:
+            X (pd.DataFrame): Raw traffic features
+            validate (callable, optional): Frame validator, defaults to
+                ``validate_frame``; the API passes its request schema's
+            errors (dict, optional): Rows already known to be invalid, e.g.
+                lines that could not be parsed
+
+        Returns:
+            BatchScore: Predictions aligned with the rows of ``X`` and per-row errors
+        """
+        errors = dict(errors or {})
+        frame, valid, invalid = (validate or self.validate_frame)(X)
+        for i, error in invalid.items():
+            errors.setdefault(i, error)
+        valid[list(errors)] = False
+
+        predictions = np.full(len(frame), -1, dtype=np.int8)
+        batch_score = self.score_frame(frame[valid])
+        predictions[valid] = batch_score.predictions
+        valid_rows = np.flatnonzero(valid)
+        for i, error in batch_score.errors.items():
+            errors[int(valid_rows[i])] = error
+        return BatchScore(predictions, errors)
+
+    def _isolate_errors(
+        self, records: Sequence[Any], predictions: np.ndarray
+    ) -> BatchScore:
+        """Re-score row by row so only the offending records are reported."""
+        errors: Dict[int, str] = {}
+        for i, record in enumerate(records):
+            try:
+                predictions[i] = self.predict_records([record])[0]
+            except Exception as e:
+                errors[i] = str(e)
+
+        return BatchScore(predictions, errors)
+
+
+def validate_fitted_frame(
+    X: pd.DataFrame,
+    numerical_features: List[str],
+    categories: Dict[str, np.ndarray],
+) -> Tuple[pd.DataFrame, np.ndarray, Dict[int, str]]:
+    """
+    Validate a frame against a preprocessor's fitted inputs, column by column.
+
+    Each invalid row is reported once, with the first check it fails.
+
+    Args:
+        X (pd.DataFrame): Raw traffic features
+        numerical_features: Features that must be finite numbers
+        categories: Fitted categories per categorical feature
+
+    Returns:
+        tuple: Frame of the features, boolean mask of valid rows, and error
+            messages keyed by row position
+    """
+    n_rows = len(X)
+    invalid = np.zeros(n_rows, dtype=bool)
+    reasons = np.empty(n_rows, dtype=object)
+
+    def reject(mask: np.ndarray, reason: str):
+        reasons[mask & ~invalid] = reason
+        invalid[:] |= mask
+
+    columns = {}
+    for name in numerical_features:
+        if name not in X.columns:
+            reject(np.ones(n_rows, dtype=bool), f"{name}: field required")
+            columns[name] = np.zeros(n_rows)
+            continue
+        values = pd.to_numeric(X[name], errors="coerce").to_numpy(dtype=np.float64)
+        reject(~np.isfinite(values), f"{name}: value is not a valid number")
+        columns[name] = values
+
+    for name, fitted in categories.items():
+        if name not in X.columns:
+            reject(np.ones(n_rows, dtype=bool), f"{name}: field required")
+            columns[name] = np.full(n_rows, None, dtype=object)
+            continue
+        column = X[name]
+        reject(column.isna().to_numpy(), f"{name}: field required")
+        reject(
+            ~column.isin(fitted).to_numpy(),
+            f"{name} must be one of {fitted.tolist()}",
+        )
+        columns[name] = column.to_numpy(dtype=object)
+
+    errors = {int(i): reasons[i] for i in np.flatnonzero(invalid)}
+    return pd.DataFrame(columns, index=X.index), ~invalid, errors
+
+
+def score_batch(model: Any, preprocessor: Any, records: Sequence[Any]) -> BatchScore:
+    """Convenience wrapper around ``BatchScorer.score``."""
+    return BatchScorer(model, preprocessor).score(records)
@@ -0,0 +1,135 @@
+import logging
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model._base import LinearClassifierMixin
+
+from src.ml.inference.encoder import FeatureVectorEncoder
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CompiledLinearModel:
+    """
+    Preprocessor and linear classifier folded into one weight vector and bias.
+
+    The model consumes rows produced by a FeatureVectorEncoder. Scaling,
+    one-hot encoding, output column selection and the classifier coefficients
+    are all folded into ``weights`` and ``bias``, so scoring is a single
+    ``X @ w + b``.
+    """
+
+    def __init__(
+        self,
+        encoder: FeatureVectorEncoder,
+        weights: np.ndarray,
+        bias: float,
+        classes: np.ndarray,
+    ):
+        """
+        Initialize the compiled model.
+
+        Args:
+            encoder: Encoder defining the input layout
+            weights: Folded weight per encoded column
+            bias: Folded bias
+            classes: Class labels of the original model
+        """
+        self.encoder = encoder
+        self.weights = weights
+        self.bias = bias
+        self.classes = classes
+
+    def decision_function(self, X_encoded: np.ndarray) -> np.ndarray:
+        """
+        Compute raw decision scores for encoded features.
+
+        Args:
+            X_encoded (np.ndarray): Rows produced by the encoder
+
+        Returns:
+            np.ndarray: Decision scores (positive means ``classes[1]``)
+        """
+        return X_encoded @ self.weights.astype(X_encoded.dtype, copy=False) + self.bias
+
+    def predict_encoded(self, X_encoded: np.ndarray) -> np.ndarray:
+        """
+        Predict labels for already encoded features.
+
+        Args:
+            X_encoded (np.ndarray): Rows produced by the encoder
+
+        Returns:
+            np.ndarray: Predicted labels
+        """
+        return self.classes[(self.decision_function(X_encoded) > 0).astype(np.intp)]
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        """
+        Encode and predict raw features.
+
+        Args:
+            X (pd.DataFrame): Raw traffic features
+
+        Returns:
+            np.ndarray: Predicted labels
+        """
+        return self.predict_encoded(self.encoder.encode_frame(X))
+
+
+def compile_model(
+    model: Any, preprocessor: Any, encoder: Optional[FeatureVectorEncoder] = None
+) -> Optional[CompiledLinearModel]:
+    """
+    Fold a fitted preprocessor and binary linear classifier into one kernel.
+
+    Args:
+        model: Fitted model
+        preprocessor: DataPreprocessor or ColumnTransformerWrapper
+        encoder (FeatureVectorEncoder, optional): Encoder already generated
+            from ``preprocessor``
+
+    Returns:
+        CompiledLinearModel or None: The compiled model, or None if the model
+            or preprocessor cannot be folded and the sklearn path must be used
+    """
+    try:
+        if not isinstance(model, LinearClassifierMixin):
+            raise ValueError(f"Unsupported model type {type(model).__name__}")
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        if coef.shape[0] != 1:
+            raise ValueError("Only binary classifiers can be folded")
+
+        if encoder is None:
+            encoder = FeatureVectorEncoder.from_preprocessor(preprocessor)
+        if encoder is None:
+            raise ValueError("Preprocessor cannot be folded")
+        if len(encoder.outputs) != coef.shape[1]:
+            raise ValueError(
+                f"Model expects {coef.shape[1]} features, "
+                f"preprocessor yields {len(encoder.outputs)}"
+            )
+
+        # coef * (x - mean) / scale == (coef / scale) * x - coef * mean / scale
+        folded = coef[0] / encoder.output_scale
+        weights = np.zeros(encoder.n_columns, dtype=np.float64)
+        np.add.at(weights, encoder.output_slots, folded)
+        bias = float(np.asarray(model.intercept_).ravel()[0])
+        bias -= float(folded @ encoder.output_mean)
+
+    except Exception as e:
+        logger.info(f"Model not compiled, using sklearn path: {str(e)}")
+        return None
+
+    logger.info(
+        f"Compiled {type(model).__name__} into a {len(weights)}-weight linear kernel"
+    )
+    return CompiledLinearModel(
+        encoder=encoder,
+        weights=weights,
+        bias=bias,
+        classes=np.asarray(model.classes_),
+    )
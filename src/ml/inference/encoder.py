@@ -0,0 +1,364 @@
+import logging
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class FeatureVectorEncoder:
+    """
+    Encode validated traffic features into contiguous float rows without pandas.
+
+    The encoded layout is fixed at construction: the raw numerical features,
+    followed by one indicator column per fitted category of each categorical
+    feature. ``transform_encoded`` then replays the fitted ColumnTransformer
+    (scaling, one-hot column selection and the DataPreprocessor output
+    selection) as a single gather over that layout.
+    """
+
+    def __init__(
+        self,
+        numerical_features: List[str],
+        categories: Dict[str, np.ndarray],
+        ignore_unknown: Dict[str, bool],
+        outputs: List[Tuple[Any, float, float]],
+        dtype: Any = np.float64,
+    ):
+        """
+        Initialize the encoder.
+
+        Args:
+            numerical_features: Raw numerical columns, in encoded order
+            categories: Fitted categories per categorical column, in encoded order
+            ignore_unknown: Whether unknown categories are encoded as all zeros
+                (True) or rejected (False), per categorical column
+            outputs: For each model input column, ``(slot, mean, scale)`` where
+                ``slot`` is a numerical feature name or a ``(feature, category)``
+                pair and the column equals ``(encoded[slot] - mean) / scale``
+            dtype: Floating point type of encoded rows
+        """
+        self.numerical_features = numerical_features
+        self.categories = categories
+        self.ignore_unknown = ignore_unknown
+        self.dtype = np.dtype(dtype)
+
+        # Column of every encoded slot
+        self.slots: Dict[Any, int] = {f: i for i, f in enumerate(numerical_features)}
+        for feature, feature_categories in categories.items():
+            for category in feature_categories.tolist():
+                self.slots[(feature, category)] = len(self.slots)
+        self.n_columns = len(self.slots)
+
+        # Category -> encoded column lookup, per categorical feature
+        self._category_columns = {
+            feature: {
+                category: self.slots[(feature, category)]
+                for category in feature_categories.tolist()
+            }
+            for feature, feature_categories in categories.items()
+        }
+
+        # Output plan as index arrays
+        self.outputs = outputs
+        self.output_slots = np.array(
+            [self.slots[s] for s, _, _ in outputs], dtype=np.intp
+        )
+        self.output_mean = np.array([m for _, m, _ in outputs], dtype=np.float64)
+        self.output_scale = np.array([s for _, _, s in outputs], dtype=np.float64)
+
+    @classmethod
+    def from_preprocessor(
+        cls, preprocessor: Any, dtype: Any = np.float64
+    ) -> Optional["FeatureVectorEncoder"]:
+        """
+        Generate an encoder from a fitted DataPreprocessor or ColumnTransformerWrapper.
+
+        Args:
+            preprocessor: Fitted preprocessor wrapping a ColumnTransformer
+            dtype: Floating point type of encoded rows
+
+        Returns:
+            FeatureVectorEncoder or None: The encoder, or None if the
+                preprocessor cannot be replayed and the DataFrame path must be used
+        """
+        try:
+            column_transformer = getattr(preprocessor, "preprocessor", None)
+            if not isinstance(column_transformer, ColumnTransformer):
+                raise ValueError(
+                    "Preprocessor does not wrap a fitted ColumnTransformer"
+                )
+
+            numerical_features, categories, ignore_unknown, outputs = (
+                _fold_column_transformer(column_transformer)
+            )
+
+            # Keep numerical features in the order the preprocessor declares them
+            selected = list(getattr(preprocessor, "selected_features", []))
+            numerical_features.sort(
+                key=lambda f: selected.index(f) if f in selected else len(selected)
+            )
+
+            output_indices = None
+            if hasattr(preprocessor, "get_output_indices"):
+                output_indices = preprocessor.get_output_indices()
+            if output_indices is not None:
+                outputs = [outputs[i] for i in output_indices]
+
+        except Exception as e:
+            logger.info(
+                f"Feature encoder not generated, using DataFrame path: {str(e)}"
+            )
+            return None
+
+        return cls(numerical_features, categories, ignore_unknown, outputs, dtype)
+
+    @property
+    def columns(self) -> List[str]:
+        """Names of the encoded columns."""
+        names = list(self.numerical_features)
+        for feature, feature_categories in self.categories.items():
+            names.extend(f"{feature}={c}" for c in feature_categories.tolist())
+        return names
+
+    def encode(self, features: Any) -> np.ndarray:
+        """
+        Encode one record into a contiguous (1, n_columns) row.
+
+        Args:
+            features: NetworkTrafficFeatures or a mapping of raw features
+
+        Returns:
+            np.ndarray: Encoded row
+        """
+        return self.encode_records([features])
+
+    def encode_records(
+        self, records: Sequence[Any], out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Encode a sequence of records into an (n_rows, n_columns) array.
+
+        Args:
+            records: NetworkTrafficFeatures objects or mappings of raw features
+            out (np.ndarray, optional): Preallocated array to fill
+
+        Returns:
+            np.ndarray: Encoded features
+
+        Raises:
+            KeyError: If a record lacks a feature
+            ValueError: If a numerical value is not finite, or a categorical
+                value is unknown and not ignored
+        """
+        records = [r if isinstance(r, Mapping) else dict(r) for r in records]
+        n_rows = len(records)
+        if out is None:
+            out = np.zeros((n_rows, self.n_columns), dtype=self.dtype)
+        else:
+            out[:] = 0
+
+        for i, feature in enumerate(self.numerical_features):
+            out[:, i] = [r[feature] for r in records]
+
+        for feature, category_columns in self._category_columns.items():
+            for row, record in enumerate(records):
+                col = category_columns.get(record[feature])
+                if col is not None:
+                    out[row, col] = 1
+                elif not self.ignore_unknown[feature]:
+                    raise ValueError(
+                        f"Found unknown category {record[feature]!r} in '{feature}'"
+                    )
+
+        self._check_finite(out)
+        return out
+
+    def encode_frame(
+        self, X: pd.DataFrame, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Encode a DataFrame of raw features column by column.
+
+        Args:
+            X (pd.DataFrame): Raw traffic features
+            out (np.ndarray, optional): Preallocated (n_rows, n_columns) array
+
+        Returns:
+            np.ndarray: Encoded features
+
+        Raises:
+            ValueError: If a numerical value is not finite, or a categorical
+                value is unknown and not ignored
+        """
+        if out is None:
+            out = np.empty((len(X), self.n_columns), dtype=self.dtype)
+
+        for i, feature in enumerate(self.numerical_features):
+            out[:, i] = X[feature].to_numpy()
+
+        for feature, category_columns in self._category_columns.items():
+            values = X[feature].to_numpy()
+            known = np.zeros(len(values), dtype=bool)
+            for category, col in category_columns.items():
+                matches = values == category
+                out[:, col] = matches
+                known |= matches
+            if not self.ignore_unknown[feature] and not known.all():
+                unknown = sorted(set(values[~known].tolist()), key=str)
+                raise ValueError(f"Found unknown categories {unknown} in '{feature}'")
+
+        self._check_finite(out)
+        return out
+
+    def transform_encoded(self, X_encoded: np.ndarray) -> np.ndarray:
+        """
+        Replay the fitted preprocessor on encoded rows.
+
+        Args:
+            X_encoded (np.ndarray): Output of ``encode_records`` or ``encode_frame``
+
+        Returns:
+            np.ndarray: Model input features, as ``preprocessor.transform`` yields
+        """
+        X = X_encoded[:, self.output_slots].astype(np.float64, copy=False)
+        X -= self.output_mean
+        X /= self.output_scale
+        return X
+
+    def _check_finite(self, X_encoded: np.ndarray):
+        """The sklearn estimators reject NaN and infinity, so must we."""
+        if not np.isfinite(X_encoded[:, : len(self.numerical_features)]).all():
+            raise ValueError("Input contains NaN or infinity")
+
+
+def _unwrap_step(transformer: Any) -> Any:
+    """Return the single estimator of a one-step Pipeline, else the input."""
+    if isinstance(transformer, Pipeline):
+        steps = [
+            step
+            for _, step in transformer.steps
+            if step is not None and step != "passthrough"
+        ]
+        if len(steps) != 1:
+            raise ValueError(f"Cannot fold pipeline with {len(steps)} steps")
+        return steps[0]
+    return transformer
+
+
+def _fold_column_transformer(
+    column_transformer: ColumnTransformer,
+) -> Tuple[List[str], Dict[str, np.ndarray], Dict[str, bool], List[Tuple]]:
+    """
+    Describe every ColumnTransformer output column in terms of encoded slots.
+
+    Returns:
+        tuple: Numerical features, categories, unknown handling and, for each
+            output column, ``(slot, mean, scale)`` meaning
+            ``output = (encoded[slot] - mean) / scale`` where ``slot`` is a
+            numerical feature name or a ``(feature, category)`` pair
+    """
+    numerical_features: List[str] = []
+    categories: Dict[str, np.ndarray] = {}
+    ignore_unknown: Dict[str, bool] = {}
+    outputs: List[Tuple] = []
+
+    for name, transformer, features in column_transformer.transformers_:
+        if transformer == "drop" or len(features) == 0:
+            continue
+        if not all(isinstance(f, str) for f in features):
+            raise ValueError(f"Transformer '{name}' selects columns by position")
+
+        transformer = _unwrap_step(transformer)
+
+        if transformer == "passthrough" or isinstance(transformer, StandardScaler):
+            for j, feature in enumerate(features):
+                mean, scale = 0.0, 1.0
+                if transformer != "passthrough":
+                    if transformer.with_mean:
+                        mean = float(transformer.mean_[j])
+                    if transformer.with_std:
+                        scale = float(transformer.scale_[j])
+                if feature not in numerical_features:
+                    numerical_features.append(feature)
+                outputs.append((feature, mean, scale))
+
+        elif isinstance(transformer, OneHotEncoder):
+            if (
+                transformer.min_frequency is not None
+                or transformer.max_categories is not None
+            ):
+                raise ValueError("Cannot fold OneHotEncoder with infrequent categories")
+            drop_idx = getattr(transformer, "drop_idx_", None)
+            for j, feature in enumerate(features):
+                if feature in categories:
+                    raise ValueError(f"Feature '{feature}' is encoded more than once")
+                categories[feature] = transformer.categories_[j]
+                ignore_unknown[feature] = transformer.handle_unknown != "error"
+                for k, category in enumerate(transformer.categories_[j].tolist()):
+                    if drop_idx is not None and drop_idx[j] == k:
+                        continue
+                    outputs.append(((feature, category), 0.0, 1.0))
+
+        else:
+            raise ValueError(f"Cannot fold transformer {type(transformer).__name__}")
+
+    return numerical_features, categories, ignore_unknown, outputs
+
+
+def fitted_inputs(
+    preprocessor: Any,
+) -> Optional[Tuple[List[str], Dict[str, np.ndarray]]]:
+    """
+    Describe the raw inputs a fitted preprocessor was trained on.
+
+    Unlike ``FeatureVectorEncoder.from_preprocessor`` this only needs to know
+    which columns are one-hot encoded, so it also covers transformers the
+    encoder cannot replay.
+
+    Args:
+        preprocessor: Fitted ColumnTransformer, or a preprocessor wrapping one
+
+    Returns:
+        tuple or None: Numerical features and fitted categories per
+            categorical feature, or None if the inputs cannot be determined
+    """
+    column_transformer = (
+        preprocessor
+        if isinstance(preprocessor, ColumnTransformer)
+        else getattr(preprocessor, "preprocessor", None)
+    )
+    if not isinstance(column_transformer, ColumnTransformer) or not hasattr(
+        column_transformer, "transformers_"
+    ):
+        return None
+
+    numerical_features: List[str] = []
+    categories: Dict[str, np.ndarray] = {}
+    for name, transformer, features in column_transformer.transformers_:
+        if transformer == "drop" or len(features) == 0:
+            continue
+        if not all(isinstance(f, str) for f in features):
+            return None
+
+        steps = (
+            [step for _, step in transformer.steps]
+            if isinstance(transformer, Pipeline)
+            else [transformer]
+        )
+        encoders = [step for step in steps if isinstance(step, OneHotEncoder)]
+        if encoders:
+            for j, feature in enumerate(features):
+                categories[feature] = encoders[0].categories_[j]
+        else:
+            numerical_features.extend(
+                f for f in features if f not in numerical_features
+            )
+
+    return numerical_features, categories
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from src.utils.metrics import LATENCY_BUCKETS_MS, Histogram
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class InferenceOverloadedError(RuntimeError):
+    """Raised when the executor queue is full and a call is rejected."""
+
+
+class InferenceTimeoutError(TimeoutError):
+    """Raised when a call does not finish before its deadline."""
+
+
+class InferenceExecutor:
+    """
+    Run CPU-bound transform/predict work off the event loop.
+
+    Calls are submitted to a bounded thread or process pool. At most
+    ``max_queue_depth`` calls may be queued or running at once; further calls
+    are rejected immediately instead of piling up behind a large batch. Each
+    call has a deadline after which the awaiting handler gets
+    ``InferenceTimeoutError`` (the worker itself cannot be interrupted and
+    finishes in the background).
+
+    With ``kind="process"`` the callable and its arguments are pickled for
+    every call, so it only pays off for batches large enough to amortize that.
+    """
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: Optional[int] = None,
+        max_queue_depth: int = 256,
+        timeout_s: Optional[float] = 10.0,
+    ):
+        """
+        Initialize the executor.
+
+        Args:
+            kind (str): "thread" or "process"
+            max_workers (int, optional): Pool size, defaults to the CPU count
+            max_queue_depth (int): Maximum calls queued or running at once
+            timeout_s (float, optional): Default per-call deadline in seconds
+        """
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue_depth = max_queue_depth
+        self.timeout_s = timeout_s
+
+        self._pool: Optional[Executor] = None
+        self._pool_lock = threading.Lock()
+        self._depth = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.latency_histogram = Histogram(LATENCY_BUCKETS_MS)
+
+    @property
+    def pool(self) -> Executor:
+        """The underlying pool, created on first use."""
+        with self._pool_lock:
+            if self._pool is None:
+                if self.kind == "process":
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="inference"
+                    )
+                logger.info(
+                    f"Started {self.kind} inference pool with {self.max_workers} workers"
+                )
+            return self._pool
+
+    @property
+    def depth(self) -> int:
+        """Calls currently queued or running."""
+        return self._depth
+
+    async def run(
+        self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None
+    ) -> Any:
+        """
+        Run ``fn(*args)`` in the pool and await its result.
+
+        Args:
+            fn: Callable to run
+            *args: Positional arguments for ``fn``
+            timeout (float, optional): Deadline in seconds, defaults to ``timeout_s``
+
+        Returns:
+            Any: The return value of ``fn``
+
+        Raises:
+            InferenceOverloadedError: If ``max_queue_depth`` calls are in flight
+            InferenceTimeoutError: If the deadline passes first
+        """
+        if self._depth >= self.max_queue_depth:
+            self.rejected += 1
+            raise InferenceOverloadedError(
+                f"Inference queue is full ({self.max_queue_depth} calls in flight)"
+            )
+
+        timeout = self.timeout_s if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        self._depth += 1
+        try:
+            future = loop.run_in_executor(self.pool, partial(fn, *args))
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise InferenceTimeoutError(f"Inference did not finish within {timeout}s")
+        finally:
+            self._depth -= 1
+            self.latency_histogram.observe((time.perf_counter() - started) * 1000.0)
+
+    def shutdown(self, wait: bool = True):
+        """Shut the pool down; it is recreated on next use."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
+                logger.info(f"Stopped {self.kind} inference pool")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth, rejection and latency statistics."""
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue_depth": self.max_queue_depth,
+            "timeout_s": self.timeout_s,
+            "depth": self._depth,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "latency_ms": self.latency_histogram.snapshot(),
+        }
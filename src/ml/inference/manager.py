@@ -0,0 +1,567 @@
+import asyncio
+import hashlib
+import logging
+import pickle
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import joblib
+import mlflow
+from sklearn.compose import ColumnTransformer
+
+from src.ml.inference.batch import BatchScorer
+from src.ml.pipeline.preprocessing.preprocessor import (
+    ColumnTransformerWrapper,
+    DataPreprocessor,
+)
+from src.utils.metrics import LATENCY_BUCKETS_MS, Histogram
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VERSION_PATTERN = re.compile(r"^[\w.-]+$")
+MODEL_FILES = ("model.joblib", "model.pkl")
+PREPROCESSOR_FILES = (
+    "preprocessor.joblib",
+    "preprocessor.pkl",
+    "column_transformer.joblib",
+)
+
+
+class ReloadInProgressError(RuntimeError):
+    """Raised when a reload is requested while another one is running."""
+
+
+class ModelVersionNotFoundError(KeyError):
+    """Raised when a requested model version exists in no source."""
+
+
+class ModelVersion:
+    """
+    A loaded model with its preprocessor and ready-to-use scorer.
+
+    Instances are never mutated after activation; swapping versions replaces
+    the whole object, so a request holding a reference keeps a consistent
+    model, preprocessor and scorer until it finishes.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        preprocessor: Any,
+        scorer: BatchScorer,
+        version: str,
+        source: str,
+        fingerprint: Optional[str] = None,
+    ):
+        self.model = model
+        self.preprocessor = preprocessor
+        self.scorer = scorer
+        self.version = version
+        self.source = source
+        self.fingerprint = fingerprint
+        self.loaded_at = datetime.utcnow()
+        self.load_ms = 0.0
+        self.warmup_ms = 0.0
+        self.nbytes = 0
+
+        # Serving counters
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rows = 0
+        self.errors = 0
+        self.latency_histogram = Histogram(LATENCY_BUCKETS_MS)
+
+    def record(self, rows: int, latency_ms: float, errors: int = 0):
+        """
+        Count one request served by this version.
+
+        Args:
+            rows (int): Records scored
+            latency_ms (float): Scoring latency in milliseconds
+            errors (int): Records that could not be scored
+        """
+        with self._lock:
+            self.requests += 1
+            self.rows += rows
+            self.errors += errors
+        self.latency_histogram.observe(latency_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "source": self.source,
+            "model_type": type(self.model).__name__,
+            "compiled": getattr(self.scorer, "compiled", None) is not None,
+            "loaded_at": self.loaded_at.isoformat(),
+            "load_ms": self.load_ms,
+            "warmup_ms": self.warmup_ms,
+            "nbytes": self.nbytes,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get load details plus request, row, error and latency counters."""
+        return {
+            **self.to_dict(),
+            "requests": self.requests,
+            "rows": self.rows,
+            "errors": self.errors,
+            "latency_ms": self.latency_histogram.snapshot(),
+        }
+
+
+def estimate_nbytes(*objects: Any) -> int:
+    """Approximate the memory held by fitted objects by their pickled size."""
+    try:
+        return len(pickle.dumps(objects, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+def load_preprocessor(artifacts_dir: Path) -> Any:
+    """
+    Load the first preprocessor artifact found in ``artifacts_dir``.
+
+    Bare ColumnTransformers are wrapped in a ColumnTransformerWrapper.
+
+    Args:
+        artifacts_dir (Path): Directory holding the artifacts
+
+    Returns:
+        Preprocessor exposing ``transform``
+
+    Raises:
+        FileNotFoundError: If no preprocessor could be loaded
+    """
+    for name in PREPROCESSOR_FILES:
+        path = artifacts_dir / name
+        if not path.exists():
+            continue
+        try:
+            column_transformer = joblib.load(path)
+            if isinstance(column_transformer, ColumnTransformer):
+                preprocessor = ColumnTransformerWrapper(column_transformer)
+                logger.info(
+                    f"Successfully loaded and wrapped ColumnTransformer from {path}"
+                )
+            else:
+                # Assume it's a DataPreprocessor
+                preprocessor = DataPreprocessor()
+                preprocessor.preprocessor = column_transformer
+                logger.info(f"Successfully loaded DataPreprocessor from {path}")
+            return preprocessor
+        except Exception as e:
+            logger.warning(f"Failed to load preprocessor from {path}: {str(e)}")
+
+    raise FileNotFoundError(
+        f"Preprocessor not found in any of: "
+        f"{[str(artifacts_dir / name) for name in PREPROCESSOR_FILES]}"
+    )
+
+
+class ModelManager:
+    """
+    Load, warm up and hot-swap the model served by the API.
+
+    ``load`` resolves the newest model (MLflow registry first, then local
+    artifacts), builds its scorer, scores a warmup batch and only then makes it
+    the active version with a single reference assignment. Requests already
+    holding the previous scorer finish on it; scorers owning worker processes
+    are closed once ``retire_after_s`` has passed.
+
+    ``watch`` polls the registry or artifact directory and reloads when the
+    newest version changes.
+    """
+
+    def __init__(
+        self,
+        artifacts_dir: Path,
+        model_name: str = "intrusion_detector",
+        tracking_uri: Optional[str] = None,
+        build_scorer: Callable[[Any, Any], BatchScorer] = BatchScorer,
+        on_swap: Optional[Callable[[Optional[ModelVersion]], None]] = None,
+        warmup_rows: int = 64,
+        retire_after_s: float = 10.0,
+    ):
+        """
+        Initialize the manager.
+
+        Args:
+            artifacts_dir (Path): Directory holding local model artifacts
+            model_name (str): Registered MLflow model name
+            tracking_uri (str, optional): MLflow tracking URI, or None/"local"
+                to use local artifacts only
+            build_scorer: Builds a scorer from a model and preprocessor
+            on_swap: Called with the new active version after every swap
+            warmup_rows (int): Rows scored before a version is activated
+            retire_after_s (float): Grace period before a replaced scorer is closed
+        """
+        self.artifacts_dir = Path(artifacts_dir)
+        self.model_name = model_name
+        self.tracking_uri = tracking_uri
+        self.build_scorer = build_scorer
+        self.on_swap = on_swap
+        self.warmup_rows = warmup_rows
+        self.retire_after_s = retire_after_s
+
+        self._active: Optional[ModelVersion] = None
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[asyncio.Task] = None
+
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error: Optional[str] = None
+        self.history: List[Dict[str, Any]] = []
+
+    @property
+    def active(self) -> Optional[ModelVersion]:
+        return self._active
+
+    @property
+    def use_mlflow(self) -> bool:
+        return bool(self.tracking_uri) and self.tracking_uri != "local"
+
+    def _latest_registry_version(self) -> Optional[Any]:
+        """Get the newest registered version of the model, if any."""
+        mlflow.set_tracking_uri(self.tracking_uri)
+        client = mlflow.tracking.MlflowClient()
+        versions = client.search_model_versions(f'name="{self.model_name}"')
+        if not versions:
+            return None
+        return max(versions, key=lambda v: int(v.version))
+
+    def _local_fingerprint(self) -> Optional[str]:
+        """Digest of the size and mtime of every local artifact, if any exist."""
+        parts = []
+        for name in MODEL_FILES + PREPROCESSOR_FILES:
+            path = self.artifacts_dir / name
+            if path.exists():
+                stat = path.stat()
+                parts.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+        if not parts:
+            return None
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()[:12]
+
+    def current_fingerprint(self) -> Optional[str]:
+        """
+        Identify the newest available model without loading it.
+
+        Returns:
+            str or None: ``mlflow:<version>`` or ``local:<digest>``
+        """
+        if self.use_mlflow:
+            try:
+                latest = self._latest_registry_version()
+                if latest is not None:
+                    return f"mlflow:{latest.version}"
+            except Exception as e:
+                logger.warning(f"Failed to query MLflow: {str(e)}")
+        fingerprint = self._local_fingerprint()
+        return f"local:{fingerprint}" if fingerprint else None
+
+    def _load_model(self) -> Tuple[Any, str, str, str]:
+        """Load the newest model: MLflow registry first, then local artifacts."""
+        if self.use_mlflow:
+            try:
+                logger.info(f"Attempting to load from MLflow: {self.tracking_uri}")
+                latest = self._latest_registry_version()
+                if latest is not None:
+                    model_uri = f"models:/{self.model_name}/{latest.version}"
+                    model = mlflow.pyfunc.load_model(model_uri)
+                    logger.info(
+                        f"Successfully loaded MLflow model '{self.model_name}' "
+                        f"version '{latest.version}'"
+                    )
+                    fingerprint = f"mlflow:{latest.version}"
+                    return model, str(latest.version), "mlflow", fingerprint
+                logger.warning(
+                    f"No versions found for model {self.model_name} in MLflow"
+                )
+            except Exception as e:
+                logger.warning(f"Failed to load from MLflow: {str(e)}")
+
+        fingerprint = self._local_fingerprint()
+        for name in MODEL_FILES:
+            path = self.artifacts_dir / name
+            if not path.exists():
+                logger.warning(f"Local model not found at {path}")
+                continue
+            try:
+                model = joblib.load(path)
+                logger.info(f"Successfully loaded local model from {path}")
+                return model, f"local-{fingerprint}", "local", f"local:{fingerprint}"
+            except Exception as e:
+                logger.error(f"Failed to load local model from {path}: {str(e)}")
+
+        raise ValueError("No model could be loaded from any source")
+
+    def list_versions(self) -> Set[str]:
+        """
+        List the versions ``load_version`` can load, without loading any.
+
+        Returns:
+            set: Registered MLflow versions and local version directories
+
+        Raises:
+            Exception: If the MLflow registry cannot be queried
+        """
+        versions = set()
+        if self.use_mlflow:
+            mlflow.set_tracking_uri(self.tracking_uri)
+            client = mlflow.tracking.MlflowClient()
+            versions.update(
+                str(v.version)
+                for v in client.search_model_versions(f'name="{self.model_name}"')
+            )
+
+        versions_dir = self.artifacts_dir / "versions"
+        if versions_dir.is_dir():
+            versions.update(
+                path.name
+                for path in versions_dir.iterdir()
+                if any((path / name).exists() for name in MODEL_FILES)
+            )
+        return versions
+
+    def load_version(self, version: str) -> ModelVersion:
+        """
+        Load and warm up a specific version without activating it.
+
+        The version is looked up in the MLflow registry, then in
+        ``<artifacts_dir>/versions/<version>/``. Its preprocessor is taken from
+        the same local directory if present, else from ``artifacts_dir``.
+
+        Args:
+            version (str): Registered MLflow version or local version directory
+
+        Returns:
+            ModelVersion: The loaded version
+
+        Raises:
+            ModelVersionNotFoundError: If no source has the version
+        """
+        if not VERSION_PATTERN.match(version) or version in (".", ".."):
+            raise ModelVersionNotFoundError(f"Invalid model version '{version}'")
+
+        started = time.perf_counter()
+        model, source = None, None
+
+        if self.use_mlflow:
+            try:
+                mlflow.set_tracking_uri(self.tracking_uri)
+                model = mlflow.pyfunc.load_model(f"models:/{self.model_name}/{version}")
+                source = "mlflow"
+            except Exception as e:
+                logger.warning(
+                    f"Failed to load version '{version}' from MLflow: {str(e)}"
+                )
+
+        version_dir = self.artifacts_dir / "versions" / version
+        if model is None:
+            for name in MODEL_FILES:
+                path = version_dir / name
+                if path.exists():
+                    model = joblib.load(path)
+                    source = "local"
+                    break
+
+        if model is None:
+            raise ModelVersionNotFoundError(f"Model version '{version}' not found")
+
+        try:
+            preprocessor = load_preprocessor(version_dir)
+        except FileNotFoundError:
+            preprocessor = load_preprocessor(self.artifacts_dir)
+        load_ms = (time.perf_counter() - started) * 1000.0
+
+        loaded = self._prepare(model, preprocessor, version, source, load_ms=load_ms)
+        logger.info(
+            f"Loaded model version '{version}' from {source} "
+            f"(load {loaded.load_ms:.1f} ms, warmup {loaded.warmup_ms:.1f} ms)"
+        )
+        return loaded
+
+    def load(self) -> ModelVersion:
+        """
+        Load the newest model and preprocessor, warm them up and activate them.
+
+        Blocks while loading; call it from a worker thread when serving.
+
+        Returns:
+            ModelVersion: The newly active version
+
+        Raises:
+            ReloadInProgressError: If another load is running
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgressError("A model reload is already in progress")
+        try:
+            started = time.perf_counter()
+            model, version, source, fingerprint = self._load_model()
+            preprocessor = load_preprocessor(self.artifacts_dir)
+            load_ms = (time.perf_counter() - started) * 1000.0
+            return self._activate(
+                model, preprocessor, version, source, fingerprint, load_ms
+            )
+        except Exception as e:
+            self.failed_reloads += 1
+            self.last_error = str(e)
+            logger.error(f"Model reload failed, keeping active version: {str(e)}")
+            raise
+        finally:
+            self._reload_lock.release()
+
+    def activate(
+        self, model: Any, preprocessor: Any, version: str = "injected"
+    ) -> Optional[ModelVersion]:
+        """
+        Warm up and activate an already loaded model and preprocessor.
+
+        Passing None for either deactivates the current version.
+
+        Args:
+            model: Fitted model
+            preprocessor: Fitted preprocessor
+            version (str): Version label to report
+
+        Returns:
+            ModelVersion or None: The newly active version
+        """
+        with self._reload_lock:
+            if model is None or preprocessor is None:
+                self._swap(None)
+                return None
+            return self._activate(model, preprocessor, version, "injected")
+
+    def _prepare(
+        self,
+        model: Any,
+        preprocessor: Any,
+        version: str,
+        source: str,
+        fingerprint: Optional[str] = None,
+        load_ms: float = 0.0,
+    ) -> ModelVersion:
+        """Build and warm the scorer of a loaded model."""
+        started = time.perf_counter()
+        scorer = self.build_scorer(model, preprocessor)
+        candidate = ModelVersion(
+            model, preprocessor, scorer, version, source, fingerprint
+        )
+        candidate.load_ms = load_ms
+        candidate.nbytes = estimate_nbytes(model, preprocessor)
+        self._warm_up(scorer)
+        candidate.warmup_ms = (time.perf_counter() - started) * 1000.0
+        return candidate
+
+    def _activate(
+        self,
+        model: Any,
+        preprocessor: Any,
+        version: str,
+        source: str,
+        fingerprint: Optional[str] = None,
+        load_ms: float = 0.0,
+    ) -> ModelVersion:
+        """Build and warm the scorer, then swap the version in."""
+        candidate = self._prepare(
+            model, preprocessor, version, source, fingerprint, load_ms
+        )
+        self._swap(candidate)
+        self.reloads += 1
+        self.last_error = None
+        logger.info(
+            f"Activated model version '{version}' from {source} "
+            f"(load {candidate.load_ms:.1f} ms, warmup {candidate.warmup_ms:.1f} ms)"
+        )
+        return candidate
+
+    def _warm_up(self, scorer: BatchScorer):
+        """Score a synthetic batch so the first real request pays no setup."""
+        encoder = getattr(scorer, "encoder", None)
+        if encoder is None or self.warmup_rows <= 0:
+            return
+        record = {feature: 0.0 for feature in encoder.numerical_features}
+        for feature, categories in encoder.categories.items():
+            record[feature] = categories.tolist()[0]
+        scorer.score([record] * self.warmup_rows)
+        scorer.predict_one(record)
+
+    def _swap(self, candidate: Optional[ModelVersion]):
+        """Make ``candidate`` active and retire the previous version."""
+        previous, self._active = self._active, candidate
+        if candidate is not None:
+            self.history.append(candidate.to_dict())
+            del self.history[:-10]
+        if self.on_swap is not None:
+            self.on_swap(candidate)
+        if previous is not None and hasattr(previous.scorer, "close"):
+            # Let requests already scoring on the old version finish first
+            timer = threading.Timer(self.retire_after_s, previous.scorer.close)
+            timer.daemon = True
+            timer.start()
+
+    def check_for_update(self) -> bool:
+        """Whether a different model than the active one is available."""
+        fingerprint = self.current_fingerprint()
+        if fingerprint is None:
+            return False
+        active = self._active
+        return active is None or fingerprint != active.fingerprint
+
+    async def watch(self, poll_s: float):
+        """
+        Poll for new model versions and reload when one appears.
+
+        Args:
+            poll_s (float): Seconds between checks
+        """
+        while True:
+            await asyncio.sleep(poll_s)
+            try:
+                if await asyncio.to_thread(self.check_for_update):
+                    logger.info("New model version detected, reloading")
+                    await asyncio.to_thread(self.load)
+            except ReloadInProgressError:
+                pass
+            except Exception as e:
+                logger.error(f"Model watcher failed to reload: {str(e)}")
+
+    def start_watching(self, poll_s: float):
+        """Start ``watch`` on the running event loop."""
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.get_running_loop().create_task(self.watch(poll_s))
+            logger.info(f"Watching for new model versions every {poll_s:g}s")
+
+    async def stop_watching(self):
+        """Stop the watcher task if it is running."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    def close(self):
+        """Close the active scorer's resources."""
+        active = self._active
+        if active is not None and hasattr(active.scorer, "close"):
+            active.scorer.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the active version, reload counters and recent versions."""
+        active = self._active
+        return {
+            "active": active.to_dict() if active is not None else None,
+            "watching": self._watcher is not None and not self._watcher.done(),
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "last_error": self.last_error,
+            "history": list(self.history),
+        }
@@ -0,0 +1,208 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from src.ml.inference.batch import BatchScore
+from src.ml.inference.executor import InferenceOverloadedError, InferenceTimeoutError
+from src.utils.metrics import LATENCY_BUCKETS_MS, Histogram
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-record requests into one scored matrix.
+
+    Callers ``submit`` a record and await its label. A background task takes
+    the first queued record, collects more for up to ``max_wait_ms`` or until
+    ``max_batch_size`` records are queued, scores them with one call to
+    ``score_fn`` and resolves each caller's future separately.
+
+    The wait window is adaptive: when the previous batch held a single record
+    and nothing else is queued, the record is scored immediately, so a lightly
+    loaded server pays no batching latency.
+    """
+
+    def __init__(
+        self,
+        score_fn: Callable[[Sequence[Any]], Union[BatchScore, Awaitable[BatchScore]]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+        max_queue_depth: Optional[int] = None,
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            score_fn: Scores a list of records, e.g. ``BatchScorer.score``, or a
+                coroutine function that scores them in an InferenceExecutor
+            max_batch_size (int): Maximum records scored together
+            max_wait_ms (float): Maximum time the first record of a batch waits
+            max_queue_depth (int, optional): Maximum records waiting to be batched
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_depth = max_queue_depth
+
+        self.batch_size_histogram = Histogram(
+            [b for b in (1, 2, 4, 8, 16, 32, 64, 128, 256, 512) if b < max_batch_size]
+            + [max_batch_size]
+        )
+        self.queue_wait_histogram = Histogram(LATENCY_BUCKETS_MS)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_batch_size = 0
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def _ensure_started(self):
+        """Start the worker on the running event loop if it isn't already."""
+        loop = asyncio.get_running_loop()
+        if self.running and self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._worker = loop.create_task(self._run())
+        logger.info(
+            f"Started micro-batcher (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:g})"
+        )
+
+    async def submit(self, record: Any, timeout: Optional[float] = None) -> int:
+        """
+        Queue a record for scoring and wait for its label.
+
+        Args:
+            record: NetworkTrafficFeatures or a raw feature dictionary
+            timeout (float, optional): Deadline in seconds for this request
+
+        Returns:
+            int: Predicted label (0 for normal, 1 for malicious)
+
+        Raises:
+            ValueError: If the record could not be scored
+            InferenceOverloadedError: If ``max_queue_depth`` records are waiting
+            InferenceTimeoutError: If the deadline passes first
+        """
+        self._ensure_started()
+        if self.max_queue_depth is not None and (
+            self._queue.qsize() >= self.max_queue_depth
+        ):
+            raise InferenceOverloadedError(
+                f"Micro-batch queue is full ({self.max_queue_depth} records waiting)"
+            )
+
+        future = self._loop.create_future()
+        self._queue.put_nowait((record, future, time.perf_counter()))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise InferenceTimeoutError(f"Request was not scored within {timeout}s")
+
+    async def stop(self):
+        """Score everything still queued, then stop the worker."""
+        if not self.running:
+            return
+        if self._loop is not asyncio.get_running_loop():
+            # The worker belongs to a loop that is no longer serving requests
+            self._worker = None
+            return
+        await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        logger.info("Stopped micro-batcher")
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future, float]]:
+        """Wait for the first record, then gather a batch behind it."""
+        batch = [await self._queue.get()]
+
+        if self._queue.empty() and self._last_batch_size <= 1:
+            return batch
+
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        """Worker loop: collect, score and resolve batches until cancelled."""
+        while True:
+            batch = await self._collect()
+            try:
+                await self._score(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _score(self, batch: List[Tuple[Any, asyncio.Future, float]]):
+        """Score one batch and resolve every caller's future."""
+        started = time.perf_counter()
+        self._last_batch_size = len(batch)
+        self.batch_size_histogram.observe(len(batch))
+        for _, _, enqueued in batch:
+            self.queue_wait_histogram.observe((started - enqueued) * 1000.0)
+
+        records = [record for record, _, _ in batch]
+        try:
+            batch_score = self.score_fn(records)
+            if inspect.isawaitable(batch_score):
+                batch_score = await batch_score
+        except Exception as e:
+            logger.error(f"Micro-batch of {len(batch)} records failed: {str(e)}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for i, (_, future, _) in enumerate(batch):
+            if future.done():
+                continue
+            if i in batch_score.errors:
+                future.set_exception(ValueError(batch_score.errors[i]))
+            else:
+                future.set_result(int(batch_score.predictions[i]))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batch-size and queue-wait histograms."""
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_wait_ms": self.queue_wait_histogram.snapshot(),
+        }
@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+from src.ml.inference.manager import (
+    ModelManager,
+    ModelVersion,
+    ModelVersionNotFoundError,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Shortest interval between refreshes triggered by unknown versions
+MIN_REFRESH_INTERVAL_S = 10.0
+
+
+class ModelRegistry:
+    """
+    Keep several model versions loaded in-process and route requests to them.
+
+    Requests without a version, or asking for the version the ModelManager
+    has active, are served by the active version. Any other version is loaded
+    lazily through ``ModelManager.load_version`` on first use and kept in an
+    LRU cache bounded by ``max_versions`` and ``max_bytes``; the least recently
+    used version is evicted first.
+
+    Which versions exist is learned from ``ModelManager.list_versions``, which
+    a background task refreshes every ``refresh_s`` and soon after a request
+    names a version it does not know. Requests for versions missing from that
+    list are answered without querying MLflow, so a client repeating a bad
+    version never blocks on the registry.
+
+    With ``strict=False``, requests for unknown versions fall back to the
+    active version instead of failing.
+    """
+
+    def __init__(
+        self,
+        manager: ModelManager,
+        max_versions: int = 4,
+        max_bytes: Optional[int] = None,
+        strict: bool = False,
+        refresh_s: float = 60.0,
+    ):
+        """
+        Initialize the registry.
+
+        Args:
+            manager (ModelManager): Manager providing the active version and loads
+            max_versions (int): Maximum pinned versions kept besides the active one
+            max_bytes (int, optional): Memory budget for pinned versions
+            strict (bool): Whether unknown versions fail instead of falling back
+            refresh_s (float): Seconds between refreshes of the version list
+        """
+        self.manager = manager
+        self.max_versions = max_versions
+        self.max_bytes = max_bytes
+        self.strict = strict
+        self.refresh_s = refresh_s
+
+        self._versions: "OrderedDict[str, ModelVersion]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._available: Optional[Set[str]] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self._refresh_requested: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.last_refresh: Optional[float] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fallbacks = 0
+
+    @property
+    def loaded_bytes(self) -> int:
+        return sum(v.nbytes for v in self._versions.values())
+
+    def get_loaded(self, version: Optional[str] = None) -> Optional[ModelVersion]:
+        """
+        Get a version without loading it.
+
+        Args:
+            version (str, optional): Requested version, None for the active one
+
+        Returns:
+            ModelVersion or None: The version, or None if it is not loaded
+        """
+        active = self.manager.active
+        if not version or (active is not None and version == active.version):
+            return active
+
+        with self._lock:
+            loaded = self._versions.get(version)
+            if loaded is not None:
+                self._versions.move_to_end(version)
+                self.hits += 1
+                return loaded
+
+            available = self._available
+            if available is not None and version not in available:
+                self.request_refresh()
+                return self._fallback(version)
+        return None
+
+    def get(self, version: Optional[str] = None) -> ModelVersion:
+        """
+        Get a version, loading it if it is cold.
+
+        Blocks while loading; call it from a worker thread when serving.
+
+        Args:
+            version (str, optional): Requested version, None for the active one
+
+        Returns:
+            ModelVersion: The version to score with
+
+        Raises:
+            ModelVersionNotFoundError: If the version exists in no source and
+                the registry is strict, or nothing is active to fall back to
+        """
+        if self._available is None:
+            try:
+                self.refresh_versions()
+            except Exception as e:
+                logger.warning(f"Failed to list model versions: {str(e)}")
+        loaded = self.get_loaded(version)
+        if loaded is not None:
+            return loaded
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(version, threading.Lock())
+
+        # One load per version; concurrent requests for it wait and reuse it
+        with load_lock:
+            loaded = self.get_loaded(version)
+            if loaded is not None:
+                return loaded
+
+            self.misses += 1
+            try:
+                loaded = self.manager.load_version(version)
+            except ModelVersionNotFoundError:
+                # Listed but gone, e.g. deleted since the last refresh
+                with self._lock:
+                    if self._available is not None:
+                        self._available.discard(version)
+                    return self._fallback(version)
+            finally:
+                with self._lock:
+                    self._load_locks.pop(version, None)
+
+            with self._lock:
+                self._versions[version] = loaded
+                self._evict()
+        return loaded
+
+    def refresh_versions(self) -> int:
+        """
+        Refresh the list of versions that exist.
+
+        Blocks on the MLflow registry; the background refresher calls it from
+        a worker thread.
+
+        Returns:
+            int: Number of versions available
+        """
+        available = self.manager.list_versions()
+        with self._lock:
+            self._available = available
+        self.last_refresh = time.monotonic()
+        return len(available)
+
+    def request_refresh(self):
+        """Wake the refresher early, e.g. for a version not seen yet."""
+        if self._refresh_requested is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._refresh_requested.set)
+
+    async def _refresh_loop(self):
+        """Refresh the version list periodically and when asked to."""
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh_versions)
+            except Exception as e:
+                logger.error(f"Failed to list model versions: {str(e)}")
+
+            self._refresh_requested.clear()
+            try:
+                await asyncio.wait_for(
+                    self._refresh_requested.wait(), timeout=self.refresh_s
+                )
+                # Bound the lookups a client repeating a bad version can cause
+                await asyncio.sleep(MIN_REFRESH_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+
+    def start_refreshing(self):
+        """Start refreshing the version list on the running event loop."""
+        if self._refresher is None or self._refresher.done():
+            self._loop = asyncio.get_running_loop()
+            self._refresh_requested = asyncio.Event()
+            self._refresher = self._loop.create_task(self._refresh_loop())
+            logger.info(f"Refreshing model versions every {self.refresh_s:g}s")
+
+    async def stop_refreshing(self):
+        """Stop the version list refresher if it is running."""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+            self._refresh_requested = None
+            self._loop = None
+
+    def _fallback(self, version: str) -> ModelVersion:
+        """Serve the active version in place of a missing one, unless strict."""
+        active = self.manager.active
+        if self.strict or active is None:
+            raise ModelVersionNotFoundError(f"Model version '{version}' not found")
+        self.fallbacks += 1
+        logger.warning(
+            f"Model version '{version}' not found, serving '{active.version}'"
+        )
+        return active
+
+    def _evict(self):
+        """Drop least recently used versions until within budget."""
+        while len(self._versions) > 1 and (
+            len(self._versions) > self.max_versions
+            or (self.max_bytes is not None and self.loaded_bytes > self.max_bytes)
+        ):
+            version, evicted = self._versions.popitem(last=False)
+            self.evictions += 1
+            logger.info(f"Evicted model version '{version}' ({evicted.nbytes} bytes)")
+            if hasattr(evicted.scorer, "close"):
+                # Let requests already scoring on it finish first
+                timer = threading.Timer(
+                    self.manager.retire_after_s, evicted.scorer.close
+                )
+                timer.daemon = True
+                timer.start()
+
+    def clear(self):
+        """Drop every pinned version."""
+        with self._lock:
+            versions = list(self._versions.values())
+            self._versions.clear()
+        for loaded in versions:
+            if hasattr(loaded.scorer, "close"):
+                loaded.scorer.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-version counters and cache statistics."""
+        active = self.manager.active
+        with self._lock:
+            versions = list(self._versions.values())
+        return {
+            "active": active.get_stats() if active is not None else None,
+            "versions": {v.version: v.get_stats() for v in versions},
+            "max_versions": self.max_versions,
+            "max_bytes": self.max_bytes,
+            "loaded_bytes": sum(v.nbytes for v in versions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "fallbacks": self.fallbacks,
+            "available_versions": (
+                len(self._available) if self._available is not None else None
+            ),
+            "versions_age_s": (
+                time.monotonic() - self.last_refresh
+                if self.last_refresh is not None
+                else None
+            ),
+        }
@@ -0,0 +1,241 @@
+import logging
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.ml.inference.manager import ModelVersion
+from src.utils.metrics import LATENCY_BUCKETS_MS, Histogram
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COUNTERS = (
+    "offered",
+    "mirrored",
+    "dropped",
+    "rows",
+    "compared",
+    "disagreements",
+    "primary_only_malicious",
+    "candidate_only_malicious",
+    "candidate_errors",
+)
+
+
+class ShadowScorer:
+    """
+    Score a sampled fraction of live traffic with a candidate model.
+
+    ``offer`` is called on the request path after the primary prediction is
+    known. It only draws a random number and, for sampled requests, puts a
+    reference to the records and primary labels on a bounded queue; if the
+    queue is full the sample is dropped. A background thread scores queued
+    samples with the candidate, compares labels and updates in-memory
+    counters. Every ``flush_interval_s`` the counters of the elapsed window are
+    logged, handed to ``sink`` and reset; cumulative totals are kept.
+    """
+
+    def __init__(
+        self,
+        candidate: ModelVersion,
+        sample_rate: float = 0.05,
+        max_queue_depth: int = 1000,
+        flush_interval_s: float = 60.0,
+        sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize the shadow scorer.
+
+        Args:
+            candidate (ModelVersion): Loaded candidate version
+            sample_rate (float): Fraction of requests mirrored, 0 to 1
+            max_queue_depth (int): Maximum samples waiting for the candidate
+            flush_interval_s (float): Seconds between counter flushes
+            sink: Called with every flushed window, e.g. to log to MLflow
+            seed (int, optional): Seed for the sampling decisions
+        """
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self.candidate = candidate
+        self.sample_rate = sample_rate
+        self.flush_interval_s = flush_interval_s
+        self.sink = sink
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_depth)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+        self.totals = dict.fromkeys(COUNTERS, 0)
+        self.window = dict.fromkeys(COUNTERS, 0)
+        self.window_started = time.time()
+        self.latency_histogram = Histogram(LATENCY_BUCKETS_MS)
+        self.last_flush: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _bump(self, **counts: int):
+        with self._lock:
+            for name, count in counts.items():
+                self.totals[name] += count
+                self.window[name] += count
+
+    def start(self):
+        """Start the background worker if it isn't running."""
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="shadow-scorer", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"Shadow scoring {self.sample_rate:.1%} of traffic with model version "
+            f"'{self.candidate.version}'"
+        )
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Score what is queued, flush the counters and stop the worker."""
+        if not self.running:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self.flush()
+        logger.info(f"Stopped shadow scoring of '{self.candidate.version}'")
+
+    def offer(self, records: Sequence[Any], primary: np.ndarray) -> bool:
+        """
+        Mirror a scored request to the candidate if it is sampled.
+
+        Never blocks: unsampled requests cost one random draw and sampled ones
+        one non-blocking queue put.
+
+        Args:
+            records: Records the primary model scored, or a DataFrame of them
+            primary (np.ndarray): Primary labels, -1 for rows that failed
+
+        Returns:
+            bool: Whether the request was queued for the candidate
+        """
+        self._bump(offered=1)
+        if self._random.random() >= self.sample_rate:
+            return False
+        try:
+            self._queue.put_nowait((records, primary))
+        except queue.Full:
+            self._bump(dropped=1)
+            return False
+        return True
+
+    def _run(self):
+        """Worker loop: score queued samples and flush on schedule."""
+        next_flush = time.monotonic() + self.flush_interval_s
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                wait = max(0.0, min(next_flush - time.monotonic(), 0.5))
+                records, primary = self._queue.get(timeout=wait)
+                self._score(records, primary)
+            except queue.Empty:
+                pass
+            if time.monotonic() >= next_flush:
+                self.flush()
+                next_flush = time.monotonic() + self.flush_interval_s
+
+    def _score(self, records: Sequence[Any], primary: np.ndarray):
+        """Score one sample with the candidate and compare labels."""
+        started = time.perf_counter()
+        try:
+            if isinstance(records, pd.DataFrame):
+                candidate = self.candidate.scorer.score_frame(records).predictions
+            else:
+                candidate = self.candidate.scorer.score(records).predictions
+        except Exception as e:
+            logger.warning(f"Shadow model failed to score sample: {str(e)}")
+            self._bump(mirrored=1, rows=len(records), candidate_errors=len(records))
+            return
+        latency_ms = (time.perf_counter() - started) * 1000.0
+        self.latency_histogram.observe(latency_ms)
+
+        primary = np.asarray(primary)
+        valid = (primary >= 0) & (candidate >= 0)
+        p, c = primary[valid], candidate[valid]
+        self._bump(
+            mirrored=1,
+            rows=len(records),
+            compared=int(valid.sum()),
+            disagreements=int((p != c).sum()),
+            primary_only_malicious=int(((p == 1) & (c == 0)).sum()),
+            candidate_only_malicious=int(((p == 0) & (c == 1)).sum()),
+            candidate_errors=int((candidate < 0).sum()),
+        )
+        self.candidate.record(len(records), latency_ms, int((candidate < 0).sum()))
+
+    @staticmethod
+    def _summarize(counts: Dict[str, int]) -> Dict[str, Any]:
+        compared = counts["compared"]
+        return {
+            **counts,
+            "disagreement_rate": (
+                counts["disagreements"] / compared if compared else 0.0
+            ),
+        }
+
+    def flush(self) -> Dict[str, Any]:
+        """
+        Close the current counter window and report it.
+
+        Returns:
+            dict: Counters and disagreement rate of the closed window
+        """
+        with self._lock:
+            window, self.window = self.window, dict.fromkeys(COUNTERS, 0)
+            started, self.window_started = self.window_started, time.time()
+
+        report = {
+            "candidate_version": self.candidate.version,
+            "window_start": started,
+            "window_end": self.window_started,
+            **self._summarize(window),
+            "latency_ms": self.latency_histogram.snapshot(),
+        }
+        self.latency_histogram.reset()
+        self.last_flush = report
+
+        if window["mirrored"]:
+            logger.info(
+                f"Shadow '{self.candidate.version}': {window['compared']} rows "
+                f"compared, disagreement rate {report['disagreement_rate']:.4f}, "
+                f"p99 {report['latency_ms']['p99']:g} ms, "
+                f"{window['dropped']} samples dropped"
+            )
+        if self.sink is not None:
+            try:
+                self.sink(report)
+            except Exception as e:
+                logger.warning(f"Failed to flush shadow counters: {str(e)}")
+        return report
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cumulative counters, the open window and the last flushed window."""
+        with self._lock:
+            totals, window = dict(self.totals), dict(self.window)
+        return {
+            "candidate": self.candidate.to_dict(),
+            "running": self.running,
+            "sample_rate": self.sample_rate,
+            "queued": self._queue.qsize(),
+            "totals": self._summarize(totals),
+            "window": self._summarize(window),
+            "last_flush": self.last_flush,
+        }
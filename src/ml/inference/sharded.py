@@ -0,0 +1,490 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.ml.inference.batch import BatchScore, BatchScorer
+from src.ml.inference.compiled import CompiledLinearModel
+from src.utils.metrics import LATENCY_BUCKETS_MS, Histogram
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Per-process state of a scoring worker: the models of recent scorers by ID,
+# each with the shared memory block it maps, if any
+_worker_models: "OrderedDict[str, Tuple[Callable, Optional[SharedMemory]]]" = (
+    OrderedDict()
+)
+_worker_max_models = 4
+
+
+class ScorerClosedError(RuntimeError):
+    """Raised when a closed ShardedScorer is asked to score."""
+
+
+class ScoringWorkerPool:
+    """
+    Worker processes shared by every ShardedScorer of the API process.
+
+    Each scorer publishes its model once and names it in every shard it
+    submits; a worker loads the model on first use and keeps those of the
+    ``max_models`` scorers it worked for most recently, reloading evicted ones
+    when they come back. Serving the active, pinned and shadow versions side
+    by side therefore costs one set of ``n_workers`` processes. The processes
+    are started with the first scorer and stopped when the last one closes.
+    """
+
+    def __init__(
+        self,
+        n_workers: Optional[int] = None,
+        start_method: str = "spawn",
+        max_models: int = 4,
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            n_workers (int, optional): Worker processes, defaults to the CPU count
+            start_method (str): multiprocessing start method for the workers
+            max_models (int): Models each worker keeps loaded
+        """
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.start_method = start_method
+        self.max_models = max(1, max_models)
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._scorers = 0
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def acquire(self):
+        """Register a scorer, starting the workers for the first one."""
+        with self._lock:
+            self._scorers += 1
+            if self._executor is not None:
+                return
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_init_worker,
+                initargs=(self.max_models,),
+            )
+            # Spawn every worker now, not on the first large batch
+            wait([self._executor.submit(_ping) for _ in range(self.n_workers)])
+            logger.info(f"Started {self.n_workers} scoring workers")
+
+    def release(self):
+        """Unregister a scorer, stopping the workers after the last one."""
+        with self._lock:
+            self._scorers = max(0, self._scorers - 1)
+            if self._scorers == 0 and self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+                logger.info("Stopped scoring workers")
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """Submit a task to the workers, which must be running."""
+        executor = self._executor
+        if executor is None:
+            raise RuntimeError("Scoring workers are not running")
+        return executor.submit(fn, *args)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the worker count and the number of scorers sharing them."""
+        return {
+            "running": self.running,
+            "n_workers": self.n_workers,
+            "scorers": self._scorers,
+            "max_models": self.max_models,
+        }
+
+
+_worker_pools: Dict[Tuple[int, str], ScoringWorkerPool] = {}
+_worker_pools_lock = threading.Lock()
+
+
+def get_worker_pool(
+    n_workers: Optional[int] = None,
+    start_method: str = "spawn",
+    max_models: int = 4,
+) -> ScoringWorkerPool:
+    """
+    Get the pool shared by scorers with the same worker count and start method.
+
+    ``max_models`` only applies when the pool is created.
+    """
+    key = (n_workers or os.cpu_count() or 1, start_method)
+    with _worker_pools_lock:
+        pool = _worker_pools.get(key)
+        if pool is None:
+            pool = _worker_pools[key] = ScoringWorkerPool(*key, max_models=max_models)
+        return pool
+
+
+class ShardedScorer(BatchScorer):
+    """
+    BatchScorer that spreads large batches across worker processes.
+
+    The model is loaded once, in the API process. Compiled linear kernels are
+    published to the workers as one ``multiprocessing.shared_memory`` block;
+    other models are dumped once, uncompressed, and loaded by every worker with
+    ``joblib.load(mmap_mode="r")`` so their NumPy parameters are memory-mapped
+    from the same pages. Estimators that copy their parameters into native
+    structures on load (XGBoost boosters, sklearn trees) still end up with one
+    private copy per worker.
+
+    Records and frames are encoded straight into a shared input block; each
+    worker predicts a contiguous shard of it and writes labels into a shared
+    output block, so no feature data is pickled. Batches smaller than
+    ``min_shard_rows``, and preprocessors the encoder cannot replay, are scored
+    in-process as in BatchScorer.
+
+    The workers belong to a ScoringWorkerPool shared with the scorers of other
+    model versions. ``close`` is final: a closed scorer raises
+    ``ScorerClosedError`` rather than registering with the pool again. Pickled
+    copies, e.g. those sent to a process executor, score in-process.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        preprocessor: Any,
+        n_workers: Optional[int] = None,
+        min_shard_rows: int = 2048,
+        start_method: str = "spawn",
+        pool: Optional[ScoringWorkerPool] = None,
+    ):
+        """
+        Initialize the scorer.
+
+        Args:
+            model: Fitted model exposing ``predict``
+            preprocessor: Fitted preprocessor exposing ``transform``
+            n_workers (int, optional): Worker processes, defaults to the CPU count
+            min_shard_rows (int): Smallest shard sent to a worker
+            start_method (str): multiprocessing start method for the workers
+            pool (ScoringWorkerPool, optional): Workers to use, defaults to the
+                pool shared by scorers with the same ``n_workers`` and
+                ``start_method``
+        """
+        super().__init__(model, preprocessor)
+        self.pool = pool or get_worker_pool(n_workers, start_method)
+        self.n_workers = self.pool.n_workers
+        self.min_shard_rows = max(1, min_shard_rows)
+
+        self._lock = threading.Lock()
+        self._spec: Optional[Dict[str, Any]] = None
+        self._weights_block: Optional[SharedMemory] = None
+        self._artifact_dir: Optional[str] = None
+        self._closed = False
+        self._detached = False
+
+        self.sharded_batches = 0
+        self.shards = 0
+        self.latency_histogram = Histogram(LATENCY_BUCKETS_MS)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Pickle as a detached copy that scores every batch in-process."""
+        state = self.__dict__.copy()
+        state.update(
+            pool=None,
+            _lock=None,
+            _spec=None,
+            _weights_block=None,
+            _artifact_dir=None,
+            _detached=True,
+            latency_histogram=None,
+        )
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self.latency_histogram = Histogram(LATENCY_BUCKETS_MS)
+
+    @property
+    def running(self) -> bool:
+        """Whether the model is published to the worker pool."""
+        return self._spec is not None
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def start(self):
+        """
+        Publish the model to the worker pool if not done yet.
+
+        Raises:
+            ScorerClosedError: If the scorer has been closed
+        """
+        with self._lock:
+            if self._closed:
+                raise ScorerClosedError("Scorer has been closed")
+            if self._spec is not None or self.encoder is None or self._detached:
+                return
+            spec = self._publish()
+            self.pool.acquire()
+            self._spec = spec
+
+        # Load the model into the workers now, not on the first large batch
+        wait([self.pool.submit(_warm_worker, spec) for _ in range(self.n_workers)])
+        logger.info(
+            f"Published a {spec['kind']} model to {self.n_workers} scoring workers"
+        )
+
+    def _publish(self) -> Dict[str, Any]:
+        """Place the model where workers can map it, and describe how to load it."""
+        model_id = uuid.uuid4().hex
+        if self.compiled is not None:
+            params = np.append(self.compiled.weights, self.compiled.bias)
+            self._weights_block = SharedMemory(create=True, size=params.nbytes)
+            np.ndarray(params.shape, params.dtype, buffer=self._weights_block.buf)[
+                :
+            ] = params
+            return {
+                "id": model_id,
+                "kind": "compiled",
+                "block": self._weights_block.name,
+                "n_columns": len(self.compiled.weights),
+                "classes": self.compiled.classes,
+            }
+
+        self._artifact_dir = tempfile.mkdtemp(prefix="inference-")
+        joblib.dump(self.model, os.path.join(self._artifact_dir, "model.joblib"))
+        joblib.dump(
+            self.preprocessor, os.path.join(self._artifact_dir, "preprocessor.joblib")
+        )
+        return {
+            "id": model_id,
+            "kind": "memory-mapped",
+            "artifact_dir": self._artifact_dir,
+        }
+
+    def close(self):
+        """Withdraw the model from the worker pool and release it for good."""
+        with self._lock:
+            self._closed = True
+            if self._spec is not None:
+                self._spec = None
+                self.pool.release()
+            if self._weights_block is not None:
+                self._weights_block.close()
+                self._weights_block.unlink()
+                self._weights_block = None
+            if self._artifact_dir is not None:
+                shutil.rmtree(self._artifact_dir, ignore_errors=True)
+                self._artifact_dir = None
+
+    def _check_open(self):
+        if self._closed:
+            raise ScorerClosedError("Scorer has been closed")
+
+    def score(self, records: Sequence[Any]) -> BatchScore:
+        self._check_open()
+        return super().score(records)
+
+    def score_frame(self, X: pd.DataFrame) -> BatchScore:
+        self._check_open()
+        return super().score_frame(X)
+
+    def predict_records(self, records: Sequence[Any]) -> np.ndarray:
+        """
+        Predict a sequence of records, sharding it across workers if large.
+
+        Args:
+            records: NetworkTrafficFeatures objects or raw feature dictionaries
+
+        Returns:
+            np.ndarray: Predicted labels (0 for normal, 1 for malicious)
+
+        Raises:
+            ScorerClosedError: If the scorer has been closed
+        """
+        self._check_open()
+        if not self._shards(len(records)):
+            return super().predict_records(records)
+        return self._predict_sharded(
+            len(records), lambda out: self.encoder.encode_records(records, out=out)
+        )
+
+    def predict_columns(self, X: pd.DataFrame) -> np.ndarray:
+        """
+        Predict a DataFrame of raw features, sharding it across workers if large.
+
+        Args:
+            X (pd.DataFrame): Raw traffic features
+
+        Returns:
+            np.ndarray: Predicted labels (0 for normal, 1 for malicious)
+
+        Raises:
+            ScorerClosedError: If the scorer has been closed
+        """
+        self._check_open()
+        if not self._shards(len(X)):
+            return super().predict_columns(X)
+        return self._predict_sharded(
+            len(X), lambda out: self.encoder.encode_frame(X, out=out)
+        )
+
+    def _shards(self, n_rows: int) -> bool:
+        """Whether a batch of ``n_rows`` is worth sending to the workers."""
+        return (
+            self.encoder is not None
+            and not self._detached
+            and n_rows >= 2 * self.min_shard_rows
+        )
+
+    def _predict_sharded(
+        self, n_rows: int, encode: Callable[[np.ndarray], Any]
+    ) -> np.ndarray:
+        """Encode a batch into shared memory and predict it in shards."""
+        self.start()
+        spec = self._spec
+        started = time.perf_counter()
+        shape = (n_rows, self.encoder.n_columns)
+        inputs = SharedMemory(
+            create=True, size=n_rows * shape[1] * self.encoder.dtype.itemsize
+        )
+        outputs = SharedMemory(create=True, size=n_rows)
+        try:
+            X_encoded = np.ndarray(shape, self.encoder.dtype, buffer=inputs.buf)
+            encode(X_encoded)
+            del X_encoded
+
+            n_shards = min(self.n_workers, n_rows // self.min_shard_rows)
+            bounds = np.linspace(0, n_rows, n_shards + 1, dtype=np.intp)
+            futures = [
+                self.pool.submit(
+                    _score_shard,
+                    spec,
+                    inputs.name,
+                    outputs.name,
+                    shape,
+                    self.encoder.dtype.str,
+                    int(start),
+                    int(stop),
+                )
+                for start, stop in zip(bounds[:-1], bounds[1:])
+            ]
+            wait(futures)
+            for future in futures:
+                future.result()
+
+            predictions = np.ndarray((n_rows,), np.int8, buffer=outputs.buf).copy()
+        finally:
+            for block in (inputs, outputs):
+                block.close()
+                block.unlink()
+
+        self.sharded_batches += 1
+        self.shards += len(futures)
+        self.latency_histogram.observe((time.perf_counter() - started) * 1000.0)
+        return predictions
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get worker and sharding statistics."""
+        return {
+            "running": self.running,
+            "closed": self._closed,
+            "n_workers": self.n_workers,
+            "min_shard_rows": self.min_shard_rows,
+            "sharded_batches": self.sharded_batches,
+            "shards": self.shards,
+            "latency_ms": self.latency_histogram.snapshot(),
+            "pool": self.pool.get_stats() if self.pool is not None else None,
+        }
+
+
+def _init_worker(max_models: int):
+    """Set up a freshly started worker process."""
+    global _worker_max_models
+    _worker_max_models = max_models
+
+
+def _load_model(spec: Dict[str, Any]) -> Callable[[np.ndarray], np.ndarray]:
+    """Get the predict function of a published model, mapping it on first use."""
+    entry = _worker_models.get(spec["id"])
+    if entry is not None:
+        _worker_models.move_to_end(spec["id"])
+        return entry[0]
+
+    block = None
+    if spec["kind"] == "compiled":
+        block = SharedMemory(name=spec["block"])
+        params = np.ndarray((spec["n_columns"] + 1,), np.float64, buffer=block.buf)
+        compiled = CompiledLinearModel(
+            encoder=None,
+            weights=params[:-1],
+            bias=float(params[-1]),
+            classes=spec["classes"],
+        )
+        predict = compiled.predict_encoded
+    else:
+        artifact_dir = spec["artifact_dir"]
+        model = joblib.load(os.path.join(artifact_dir, "model.joblib"), mmap_mode="r")
+        preprocessor = joblib.load(
+            os.path.join(artifact_dir, "preprocessor.joblib"), mmap_mode="r"
+        )
+        predict = BatchScorer(model, preprocessor).predict_encoded
+
+    _worker_models[spec["id"]] = (predict, block)
+    while len(_worker_models) > _worker_max_models:
+        _, (evicted, evicted_block) = _worker_models.popitem(last=False)
+        # The predict function views the block, so drop it before unmapping
+        del evicted
+        if evicted_block is not None:
+            try:
+                evicted_block.close()
+            except BufferError:
+                pass
+    return predict
+
+
+def _ping():
+    """No-op used to bring workers up."""
+
+
+def _warm_worker(spec: Dict[str, Any]):
+    """Load a published model ahead of its first shard."""
+    _load_model(spec)
+
+
+def _score_shard(
+    spec: Dict[str, Any],
+    inputs_name: str,
+    outputs_name: str,
+    shape: tuple,
+    dtype: str,
+    start: int,
+    stop: int,
+):
+    """Predict rows ``start:stop`` of the shared input block into the output block."""
+    predict = _load_model(spec)
+    inputs = SharedMemory(name=inputs_name)
+    outputs = SharedMemory(name=outputs_name)
+    try:
+        X_encoded = np.ndarray(shape, np.dtype(dtype), buffer=inputs.buf)
+        predictions = np.ndarray((shape[0],), np.int8, buffer=outputs.buf)
+        predictions[start:stop] = predict(X_encoded[start:stop])
+        del X_encoded, predictions
+    finally:
+        inputs.close()
+        outputs.close()
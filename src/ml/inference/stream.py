@@ -0,0 +1,155 @@
+import csv
+import io
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from src.ml.pipeline.preprocessing.loader import KDD_COLUMNS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CsvChunkReader:
+    """
+    Cut a CSV byte stream into chunks of whole rows and parse them.
+
+    ``chunks`` consumes the stream as it arrives and yields the raw bytes of at
+    most ``chunk_rows`` complete lines at a time, so only one chunk (plus the
+    partial line after it) is held in memory regardless of the input size.
+    ``parse`` turns a chunk into a DataFrame of the wanted features with one
+    ``pd.read_csv`` call.
+
+    Rows follow the KDD layout without a header unless ``header`` is set, in
+    which case the first line names the columns.
+    """
+
+    def __init__(
+        self,
+        features: Sequence[str],
+        chunk_rows: int = 10000,
+        columns: Optional[Sequence[str]] = None,
+        header: bool = False,
+    ):
+        """
+        Initialize the reader.
+
+        Args:
+            features: Columns to keep
+            chunk_rows (int): Maximum rows per chunk
+            columns (optional): Names of all columns, defaults to the KDD layout
+            header (bool): Whether the first line holds the column names
+        """
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows must be at least 1")
+        self.features = list(features)
+        self.chunk_rows = chunk_rows
+        self.columns = list(columns or KDD_COLUMNS)
+        self.header = header
+
+    async def chunks(self, stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        Yield the stream in chunks of at most ``chunk_rows`` complete lines.
+
+        Args:
+            stream: Body of the upload, in arbitrary pieces
+
+        Yields:
+            bytes: Complete CSV lines
+        """
+        buffer = bytearray()
+        newlines = 0
+        needs_header = self.header
+
+        async for data in stream:
+            if not data:
+                continue
+            buffer += data
+            newlines += data.count(b"\n")
+
+            if needs_header and newlines:
+                end = buffer.index(b"\n") + 1
+                self.read_header(bytes(buffer[:end]))
+                del buffer[:end]
+                newlines -= 1
+                needs_header = False
+
+            while newlines >= self.chunk_rows:
+                end = -1
+                for _ in range(self.chunk_rows):
+                    end = buffer.index(b"\n", end + 1)
+                chunk = bytes(buffer[: end + 1])
+                del buffer[: end + 1]
+                newlines -= self.chunk_rows
+                yield chunk
+
+        if needs_header and buffer.strip():
+            self.read_header(bytes(buffer))
+            return
+        if buffer.strip():
+            yield bytes(buffer)
+
+    def read_header(self, line: bytes):
+        """Take the column names from a CSV header line."""
+        names = next(csv.reader([line.decode("utf-8-sig").strip()]))
+        self.columns = [name.strip() for name in names]
+
+    def parse(self, data: bytes) -> Tuple[pd.DataFrame, Dict[int, str]]:
+        """
+        Parse a chunk into a DataFrame of ``features``.
+
+        Lines that cannot be parsed keep their position as all-missing rows and
+        are reported in the returned errors.
+
+        Args:
+            data (bytes): Complete CSV lines
+
+        Returns:
+            tuple: Parsed features and error messages keyed by row position
+        """
+        usecols = [name for name in self.features if name in self.columns]
+        try:
+            return self._read(data, usecols), {}
+        except (pd.errors.ParserError, ValueError) as e:
+            logger.warning(f"Failed to parse CSV chunk, isolating bad lines: {str(e)}")
+
+        lines: List[bytes] = []
+        positions: List[int] = []
+        errors: Dict[int, str] = {}
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                fields = next(csv.reader([line.decode("utf-8")]))
+            except (csv.Error, UnicodeDecodeError) as e:
+                errors[len(positions) + len(errors)] = f"Malformed CSV row: {str(e)}"
+                continue
+            if len(fields) > len(self.columns):
+                errors[len(positions) + len(errors)] = (
+                    f"Malformed CSV row: expected {len(self.columns)} fields, "
+                    f"saw {len(fields)}"
+                )
+                continue
+            positions.append(len(positions) + len(errors))
+            lines.append(line)
+
+        if lines:
+            frame = self._read(b"\n".join(lines) + b"\n", usecols)
+        else:
+            frame = pd.DataFrame(columns=usecols)
+        frame.index = positions
+        return frame.reindex(range(len(positions) + len(errors))), errors
+
+    def _read(self, data: bytes, usecols: List[str]) -> pd.DataFrame:
+        # Read every column so lines with extra fields raise instead of being
+        # silently truncated, as they would be with ``usecols``
+        frame = pd.read_csv(
+            io.BytesIO(data),
+            header=None,
+            names=self.columns,
+            index_col=False,
+            skipinitialspace=True,
+        )
+        return frame[usecols]
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import joblib
+import numpy as np
+
+from .loader import file_digest
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of cached entries changes, to invalidate them
+STAGE_CACHE_VERSION = "1"
+
+
+class StageCache:
+    """
+    Content-addressed cache of pipeline stage results.
+
+    Every stage result is stored under a key derived from the content of its
+    input files and its configuration, so an unchanged stage is loaded instead
+    of recomputed and any change to its inputs misses. NumPy arrays are saved
+    as ``.npy`` and loaded memory-mapped; other objects are saved with joblib.
+
+    Each ``run`` is recorded with whether it hit, how long it took and how much
+    time a hit saved against the recorded compute time.
+    """
+
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = None):
+        """
+        Args:
+            cache_dir (optional): Directory of the cache, None disables it and
+                every stage is computed
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.stats: List[Dict[str, Any]] = []
+        self._memo: Dict[str, Any] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache_dir is not None
+
+    def key(
+        self,
+        stage: str,
+        *parts: Any,
+        files: Sequence[Union[str, Path]] = (),
+    ) -> str:
+        """
+        Build the key of a stage result.
+
+        Args:
+            stage (str): Stage name
+            *parts: Configuration the result depends on, including the keys of
+                upstream stages; converted with ``str``
+            files: Files whose content the result depends on; only hashed
+                when the cache is enabled, otherwise identified by path
+
+        Returns:
+            str: Hex digest identifying the result
+        """
+        if self.enabled:
+            digests = [file_digest(path) for path in files]
+        else:
+            digests = [str(path) for path in files]
+        payload = "\n".join([STAGE_CACHE_VERSION, stage, *map(str, parts), *digests])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def run(
+        self,
+        stage: str,
+        key: str,
+        compute: Callable[[], Any],
+        label: Optional[str] = None,
+    ) -> Any:
+        """
+        Return a stage result from the cache or compute and store it.
+
+        Results already returned by this cache are reused without being
+        recorded again, also when it is disabled. A result may be a single
+        object or a tuple of them. The recorded time of a stage includes any
+        upstream stages its ``compute`` ran, which a hit skips as well.
+
+        Args:
+            stage (str): Stage name
+            key (str): Key from ``key``
+            compute: Computes the result on a miss
+            label (str, optional): Name of the stage run in the report
+
+        Returns:
+            The stage result
+        """
+        if key in self._memo:
+            return self._memo[key]
+
+        label = label or stage
+        entry = self.cache_dir / stage / key[:32] if self.enabled else None
+        started = time.perf_counter()
+
+        if entry is not None and entry.exists():
+            try:
+                result, meta = self._load(entry)
+                seconds = time.perf_counter() - started
+                self._record(label, True, seconds, max(meta["seconds"] - seconds, 0.0))
+                self._memo[key] = result
+                return result
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable cache entry {entry}: {str(e)}")
+
+        result = compute()
+        seconds = time.perf_counter() - started
+        self._record(label, False, seconds, 0.0)
+        if entry is not None:
+            self._store(entry, result, seconds)
+        self._memo[key] = result
+        return result
+
+    def report(self) -> str:
+        """
+        Summarize the recorded stage runs and log the summary.
+
+        Returns:
+            str: One line per stage run and a total
+        """
+        lines = [
+            f"{stat['stage']}: {'hit' if stat['hit'] else 'miss'} "
+            f"in {stat['seconds']:.2f}s"
+            + (f", saved {stat['saved_s']:.2f}s" if stat["hit"] else "")
+            for stat in self.stats
+        ]
+        hits = sum(stat["hit"] for stat in self.stats)
+        saved = sum(stat["saved_s"] for stat in self.stats)
+        lines.append(f"Stage cache: {hits}/{len(self.stats)} hits, saved {saved:.2f}s")
+        summary = "\n".join(lines)
+        logger.info(summary)
+        return summary
+
+    def _record(self, label: str, hit: bool, seconds: float, saved: float):
+        self.stats.append(
+            {"stage": label, "hit": hit, "seconds": seconds, "saved_s": saved}
+        )
+
+    def _store(self, entry: Path, result: Any, seconds: float):
+        """Write a result atomically, by renaming a complete temporary entry."""
+        items = result if isinstance(result, tuple) else (result,)
+        tmp_entry = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+        try:
+            tmp_entry.mkdir(parents=True, exist_ok=True)
+            names = []
+            for i, item in enumerate(items):
+                if isinstance(item, np.ndarray) and item.dtype != object:
+                    names.append(f"{i}.npy")
+                    np.save(tmp_entry / names[-1], item, allow_pickle=False)
+                else:
+                    names.append(f"{i}.joblib")
+                    joblib.dump(item, tmp_entry / names[-1], protocol=4)
+            meta = {
+                "seconds": seconds,
+                "items": names,
+                "tuple": isinstance(result, tuple),
+            }
+            (tmp_entry / "meta.json").write_text(json.dumps(meta))
+            # Replace an unreadable entry left by an earlier run
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp_entry, entry)
+            logger.info(f"Cached stage result to {entry}")
+        except Exception as e:
+            logger.warning(f"Failed to write cache entry {entry}: {str(e)}")
+        finally:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+    def _load(self, entry: Path):
+        meta = json.loads((entry / "meta.json").read_text())
+        items = tuple(
+            (
+                np.load(entry / name, mmap_mode="r")
+                if name.endswith(".npy")
+                else joblib.load(entry / name, mmap_mode="r")
+            )
+            for name in meta["items"]
+        )
+        return (items if meta["tuple"] else items[0]), meta
@@ -0,0 +1,299 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pragma: no cover - pyarrow is optional for loading
+    pa = None
+    pa_csv = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bump when the parsed layout or dtypes change, to invalidate cached files
+CACHE_VERSION = "1"
+
+# Column layout of the KDD traffic captures, e.g. data/raw/traffic_data_test.csv
+KDD_COLUMNS = [
+    "duration",
+    "protocol_type",
+    "service",
+    "flag",
+    "src_bytes",
+    "dst_bytes",
+    "land",
+    "wrong_fragment",
+    "urgent",
+    "hot",
+    "num_failed_logins",
+    "logged_in",
+    "num_compromised",
+    "root_shell",
+    "su_attempted",
+    "num_root",
+    "num_file_creations",
+    "num_shells",
+    "num_access_files",
+    "num_outbound_cmds",
+    "is_host_login",
+    "is_guest_login",
+    "count",
+    "srv_count",
+    "serror_rate",
+    "srv_serror_rate",
+    "rerror_rate",
+    "srv_rerror_rate",
+    "same_srv_rate",
+    "diff_srv_rate",
+    "srv_diff_host_rate",
+    "dst_host_count",
+    "dst_host_srv_count",
+    "dst_host_same_srv_rate",
+    "dst_host_diff_srv_rate",
+    "dst_host_same_src_port_rate",
+    "dst_host_srv_diff_host_rate",
+    "dst_host_serror_rate",
+    "dst_host_srv_serror_rate",
+    "dst_host_rerror_rate",
+    "dst_host_srv_rerror_rate",
+    "kind_of_activity",
+    "level",
+]
+
+# Features the model uses (matching DataPreprocessor) and the label column
+SELECTED_FEATURES = [
+    "logged_in",
+    "count",
+    "serror_rate",
+    "srv_serror_rate",
+    "same_srv_rate",
+    "dst_host_srv_count",
+    "dst_host_same_srv_rate",
+    "dst_host_serror_rate",
+    "dst_host_srv_serror_rate",
+    "flag",
+]
+TARGET_COLUMN = "kind_of_activity"
+
+CATEGORICAL_COLUMNS = ["protocol_type", "service", "flag", "kind_of_activity"]
+BINARY_COLUMNS = [
+    "land",
+    "logged_in",
+    "root_shell",
+    "su_attempted",
+    "is_host_login",
+    "is_guest_login",
+]
+
+
+def kdd_dtypes() -> Dict[str, str]:
+    """
+    Compact pandas dtypes for every KDD column.
+
+    Strings are categories, binary indicators int8, rates float32, byte
+    counters int64 and other counters int32.
+    """
+    dtypes = {}
+    for name in KDD_COLUMNS:
+        if name in CATEGORICAL_COLUMNS:
+            dtypes[name] = "category"
+        elif name in BINARY_COLUMNS:
+            dtypes[name] = "int8"
+        elif name.endswith("_rate"):
+            dtypes[name] = "float32"
+        elif name.endswith("_bytes"):
+            dtypes[name] = "int64"
+        else:
+            dtypes[name] = "int32"
+    return dtypes
+
+
+def _arrow_type(dtype: str):
+    if dtype == "category":
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+def file_digest(path: Union[str, Path], block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_kdd_csv(path: Union[str, Path], columns: Sequence[str]) -> pd.DataFrame:
+    """
+    Parse the given columns of a header-less KDD CSV with compact dtypes.
+
+    Uses pyarrow's multi-threaded CSV reader when it is installed and the
+    pandas C parser otherwise; both skip the columns that are not requested.
+
+    Args:
+        path: CSV file in the KDD layout
+        columns: Columns to read, in output order
+
+    Returns:
+        pd.DataFrame: The requested columns
+    """
+    columns = list(columns)
+    unknown = [name for name in columns if name not in KDD_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown KDD columns: {unknown}")
+    dtypes = {name: kdd_dtypes()[name] for name in columns}
+
+    if pa_csv is not None:
+        table = pa_csv.read_csv(
+            path,
+            read_options=pa_csv.ReadOptions(column_names=KDD_COLUMNS),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=columns,
+                column_types={
+                    name: _arrow_type(dtype) for name, dtype in dtypes.items()
+                },
+            ),
+        )
+        return table.to_pandas()
+
+    df = pd.read_csv(
+        path,
+        header=None,
+        names=KDD_COLUMNS,
+        usecols=columns,
+        dtype=dtypes,
+        engine="c",
+    )
+    return df[columns]
+
+
+def read_kdd(
+    path: Union[str, Path],
+    columns: Optional[Sequence[str]] = None,
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> pd.DataFrame:
+    """
+    Load a KDD capture, reusing a Parquet cache of earlier parses.
+
+    The cache file is keyed by the SHA-256 of the CSV content, the requested
+    columns and CACHE_VERSION, so an edited file or a different column set is
+    parsed again instead of served stale.
+
+    Args:
+        path: CSV file in the KDD layout
+        columns (optional): Columns to read, defaults to the selected features
+            and the label
+        cache_dir (optional): Directory for the Parquet cache, None disables it
+
+    Returns:
+        pd.DataFrame: The requested columns with compact dtypes
+    """
+    columns = list(columns or SELECTED_FEATURES + [TARGET_COLUMN])
+    if cache_dir is None or pa is None:
+        return parse_kdd_csv(path, columns)
+
+    key = hashlib.sha256(
+        "\n".join([file_digest(path), CACHE_VERSION, *columns]).encode()
+    ).hexdigest()
+    cache_dir = Path(cache_dir)
+    cache_path = cache_dir / f"{Path(path).stem}-{key[:16]}.parquet"
+    if cache_path.exists():
+        try:
+            df = pd.read_parquet(cache_path)
+            logger.info(f"Loaded {len(df)} rows from cache {cache_path}")
+            return df
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache {cache_path}: {str(e)}")
+
+    df = parse_kdd_csv(path, columns)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache_path)
+        logger.info(f"Cached parsed data to {cache_path}")
+    except Exception as e:
+        logger.warning(f"Failed to write cache {cache_path}: {str(e)}")
+    return df
+
+
+def iter_kdd(
+    path: Union[str, Path],
+    columns: Optional[Sequence[str]] = None,
+    chunk_rows: int = 100000,
+) -> Iterator[pd.DataFrame]:
+    """
+    Read a KDD capture in chunks of ``chunk_rows`` rows with compact dtypes.
+
+    Only one chunk is held in memory at a time, whatever the file size.
+
+    Args:
+        path: CSV file in the KDD layout
+        columns (optional): Columns to read, defaults to the selected features
+            and the label
+        chunk_rows (int): Rows per chunk
+
+    Yields:
+        pd.DataFrame: The requested columns of one chunk
+    """
+    columns = list(columns or SELECTED_FEATURES + [TARGET_COLUMN])
+    unknown = [name for name in columns if name not in KDD_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown KDD columns: {unknown}")
+
+    with pd.read_csv(
+        path,
+        header=None,
+        names=KDD_COLUMNS,
+        usecols=columns,
+        dtype={name: kdd_dtypes()[name] for name in columns},
+        engine="c",
+        chunksize=chunk_rows,
+    ) as reader:
+        for chunk in reader:
+            yield chunk[columns]
+
+
+class KddChunks:
+    """
+    Re-iterable source of ``(X, y)`` chunks of a KDD capture.
+
+    Every iteration reads the file again, so training can make several passes
+    over data larger than memory. Labels are binary as in ``load_data``:
+    0 for normal traffic and 1 for any attack.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        chunk_rows: int = 100000,
+        transform: Optional[Callable[[pd.DataFrame], np.ndarray]] = None,
+    ):
+        """
+        Args:
+            path: CSV file in the KDD layout
+            chunk_rows (int): Rows per chunk
+            transform (callable, optional): Applied to the features of every
+                chunk, e.g. a fitted preprocessor's ``transform``
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Data file not found: {path}")
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.transform = transform
+
+    def __iter__(self) -> Iterator[Tuple[Union[pd.DataFrame, np.ndarray], np.ndarray]]:
+        for chunk in iter_kdd(self.path, chunk_rows=self.chunk_rows):
+            X = chunk[SELECTED_FEATURES]
+            y = (chunk[TARGET_COLUMN] != "normal").to_numpy(dtype=np.int8)
+            if self.transform is not None:
+                X = self.transform(X)
+            yield X, y
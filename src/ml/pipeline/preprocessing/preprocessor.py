@@ -3,6 +3,7 @@ from typing import List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
@@ -12,6 +13,115 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class ColumnPlan:
+    """
+    Precomputed output-column plan for a fitted ColumnTransformer.
+
+    Built once per fitted transformer, it records for every sub-transformer
+    which of its output columns are kept and where they land in the final
+    output. ``transform`` then runs each sub-transformer and gathers its kept
+    columns straight into one preallocated array, instead of stacking all
+    blocks and selecting columns from the stacked copy.
+
+    Transformers the plan cannot describe (positional column selection or a
+    non-dropped remainder) fall back to ``ColumnTransformer.transform``
+    followed by the same column selection.
+    """
+
+    def __init__(
+        self,
+        column_transformer: ColumnTransformer,
+        output_indices: Optional[np.ndarray] = None,
+    ):
+        """
+        Build the plan.
+
+        Args:
+            column_transformer: Fitted ColumnTransformer
+            output_indices (np.ndarray, optional): ColumnTransformer output
+                columns to keep, in order; None keeps all of them
+        """
+        self.column_transformer = column_transformer
+        self.output_indices = None
+        if output_indices is not None:
+            self.output_indices = np.asarray(output_indices, dtype=np.intp)
+            self.output_indices.flags.writeable = False
+        self.blocks = self._build_blocks()
+
+    def _build_blocks(self) -> Optional[Tuple[Tuple, ...]]:
+        """Map kept output columns to ``(transformer, columns, src, dst)`` blocks."""
+        slices = getattr(self.column_transformer, "output_indices_", None)
+        if slices is None:
+            return None
+        n_total = max((s.stop for s in slices.values()), default=0)
+        keep = (
+            np.arange(n_total, dtype=np.intp)
+            if self.output_indices is None
+            else self.output_indices
+        )
+        self.n_outputs = len(keep)
+
+        blocks = []
+        for name, transformer, features in self.column_transformer.transformers_:
+            if isinstance(transformer, str) and transformer == "drop":
+                continue
+            if len(features) == 0:
+                continue
+            if not all(isinstance(f, str) for f in features):
+                return None
+            block = slices[name]
+            dst = np.flatnonzero((keep >= block.start) & (keep < block.stop))
+            if dst.size == 0:
+                continue
+            src = keep[dst] - block.start
+            if np.array_equal(
+                src, np.arange(block.stop - block.start)
+            ) and np.array_equal(dst, np.arange(dst[0], dst[0] + dst.size)):
+                # The whole block lands contiguously: assign it as a slice
+                src, dst = None, slice(int(dst[0]), int(dst[0]) + dst.size)
+            else:
+                src.flags.writeable = False
+                dst.flags.writeable = False
+            blocks.append((transformer, list(features), src, dst))
+
+        self.columns = frozenset(f for _, features, _, _ in blocks for f in features)
+        return tuple(blocks)
+
+    def transform(self, X: pd.DataFrame) -> np.ndarray:
+        """
+        Transform data into the planned output columns.
+
+        Args:
+            X (pd.DataFrame): Input features to transform
+
+        Returns:
+            np.ndarray: Transformed features
+
+        Raises:
+            ValueError: If required columns are missing
+        """
+        if self.blocks is None:
+            X_transformed = self.column_transformer.transform(X)
+            if self.output_indices is not None:
+                X_transformed = X_transformed[:, self.output_indices]
+            return X_transformed
+
+        missing = self.columns.difference(X.columns)
+        if missing:
+            raise ValueError(f"columns are missing: {set(missing)}")
+
+        out = np.empty((len(X), self.n_outputs), dtype=np.float64)
+        for transformer, features, src, dst in self.blocks:
+            if isinstance(transformer, str) and transformer == "passthrough":
+                values = X[features].to_numpy()
+            else:
+                values = transformer.transform(X[features])
+            if sparse.issparse(values):
+                values = values.toarray()
+            out[:, dst] = values if src is None else values[:, src]
+        return out
+
+
 class ColumnTransformerWrapper:
     """
     Wrapper for saved ColumnTransformer objects to provide consistent interface.
@@ -33,6 +143,9 @@ class ColumnTransformerWrapper:
         for name, transformer, features in column_transformer.transformers_:
             self.selected_features.extend(features)
 
+        # Plan the output columns once, at load time
+        self.column_plan = ColumnPlan(column_transformer)
+
         logger.info(
             f"Initialized ColumnTransformerWrapper with features: {self.selected_features}"
         )
@@ -50,9 +163,12 @@ class ColumnTransformerWrapper:
         if self.preprocessor is None:
             raise ValueError("Preprocessor has not been initialized")
 
+        plan = getattr(self, "column_plan", None)
+        if plan is None or plan.column_transformer is not self.preprocessor:
+            plan = self.column_plan = ColumnPlan(self.preprocessor)
+
         # Transform the data
-        X_transformed = self.preprocessor.transform(X)
-        return X_transformed
+        return plan.transform(X)
 
     def get_feature_names(self) -> List[str]:
         """
@@ -101,6 +217,10 @@ class DataPreprocessor:
         """
         self.preprocessor = None
 
+        # State accumulated by partial_fit
+        self._scaler = None
+        self._categories = None
+
         # Define selected features
         self.selected_features = [
             "logged_in",
@@ -145,17 +265,114 @@ class DataPreprocessor:
         if missing_features:
             raise ValueError(f"Missing required features: {missing_features}")
 
+        self.preprocessor = self._build_column_transformer()
+        self._scaler = None
+        self._categories = None
+
+        # Fit preprocessor and plan its output columns once
+        self.preprocessor.fit(X)
+        self.get_column_plan()
+        logger.info("Successfully fitted preprocessor")
+
+        return self
+
+    def partial_fit(
+        self, X: pd.DataFrame, y: Optional[pd.Series] = None
+    ) -> "DataPreprocessor":
+        """
+        Update the preprocessor with one chunk of training data.
+
+        Scaler statistics are accumulated with ``StandardScaler.partial_fit``
+        and the categories seen so far are collected, so calling it on every
+        chunk of a dataset and then ``finalize`` gives the same transformer as
+        ``fit`` on the whole dataset without holding it in memory. Transforming
+        before ``finalize`` builds the transformer from the chunks seen so far.
+
+        Args:
+            X (pd.DataFrame): One chunk of input features
+            y (pd.Series, optional): Target variable (not used)
+
+        Returns:
+            self: The updated preprocessor
+
+        Raises:
+            ValueError: If required features are missing
+        """
+        missing_features = set(self.selected_features) - set(X.columns)
+        if missing_features:
+            raise ValueError(f"Missing required features: {missing_features}")
+
+        if getattr(self, "_scaler", None) is None:
+            self._scaler = StandardScaler()
+            self._categories = {feature: set() for feature in self.categorical_features}
+        self._scaler.partial_fit(X[self.numerical_features])
+        for feature in self.categorical_features:
+            self._categories[feature].update(X[feature].dropna().unique())
+
+        # The transformer is rebuilt from the accumulated state when needed
+        self.preprocessor = None
+
+        return self
+
+    def finalize(self) -> "DataPreprocessor":
+        """
+        Build the fitted ColumnTransformer from the state of ``partial_fit``.
+
+        Returns:
+            self: The fitted preprocessor
+
+        Raises:
+            ValueError: If partial_fit has not been called, or a categorical
+                feature had no values
+        """
+        if getattr(self, "_scaler", None) is None:
+            raise ValueError("partial_fit has not been called")
+
+        # OneHotEncoder orders categories by sorting them, as fit does
+        categories = []
+        for feature in self.categorical_features:
+            if not self._categories[feature]:
+                raise ValueError(f"No values seen for categorical feature: {feature}")
+            categories.append(sorted(self._categories[feature]))
+        self.preprocessor = self._build_column_transformer(categories)
+
+        # Fit on a single row to set up the transformer, then install the
+        # accumulated scaler in place of the one fitted on that row
+        prototype = pd.DataFrame([self._scaler.mean_], columns=self.numerical_features)
+        for feature, values in zip(self.categorical_features, categories):
+            prototype[feature] = values[:1]
+        self.preprocessor.fit(prototype)
+        self.preprocessor.named_transformers_["num"].set_params(scaler=self._scaler)
+        self.get_column_plan()
+        logger.info("Successfully fitted preprocessor from accumulated chunks")
+
+        return self
+
+    def _ensure_built(self):
+        """Build the transformer from ``partial_fit`` state if it is pending."""
+        if self.preprocessor is None and getattr(self, "_scaler", None) is not None:
+            self.finalize()
+
+    def _build_column_transformer(self, categories="auto") -> ColumnTransformer:
+        """Build the unfitted ColumnTransformer, with fixed one-hot categories."""
         # Create preprocessing pipelines
         numeric_transformer = Pipeline(steps=[("scaler", StandardScaler())])
 
         categorical_transformer = Pipeline(
             steps=[
-                ("onehot", OneHotEncoder(handle_unknown="ignore", sparse_output=False))
+                (
+                    "onehot",
+                    OneHotEncoder(
+                        categories=categories,
+                        handle_unknown="ignore",
+                        sparse_output=False,
+                    ),
+                )
             ]
         )
 
         # Combine transformers
-        self.preprocessor = ColumnTransformer(
+        return ColumnTransformer(
             transformers=[
                 ("num", numeric_transformer, self.numerical_features),
                 ("cat", categorical_transformer, self.categorical_features),
@@ -163,12 +380,6 @@ class DataPreprocessor:
             remainder="drop",  # Drop any columns not specified in transformers
         )
 
-        # Fit preprocessor
-        self.preprocessor.fit(X)
-        logger.info("Successfully fitted preprocessor")
-
-        return self
-
     def transform(self, X: pd.DataFrame) -> np.ndarray:
         """
         Transform data using fitted preprocessor.
@@ -182,27 +393,55 @@ class DataPreprocessor:
         Raises:
             ValueError: If preprocessor is not fitted
         """
+        return self.get_column_plan().transform(X)
+
+    def get_column_plan(self) -> ColumnPlan:
+        """
+        Get the output-column plan of the fitted ColumnTransformer.
+
+        The plan is built once per fitted transformer, including transformers
+        assigned to ``preprocessor`` after loading, and reused by ``transform``.
+
+        Returns:
+            ColumnPlan: The plan
+
+        Raises:
+            ValueError: If preprocessor is not fitted
+        """
+        self._ensure_built()
         if self.preprocessor is None:
             raise ValueError("Preprocessor has not been fitted yet")
 
-        # Transform the data
-        X_transformed = self.preprocessor.transform(X)
-
-        # For the flag feature, we only need one column (since it's binary)
-        # If we have both S0 and SF columns, we'll keep only one
-        if "flag_SF" in self.get_feature_names():
-            # Get the index of the flag_SF column
-            feature_names = self.get_feature_names()
-            sf_idx = feature_names.index("flag_SF")
-            # Keep only the flag_SF column and all numerical features
-            X_transformed = np.hstack(
-                [
-                    X_transformed[:, : len(self.numerical_features)],
-                    X_transformed[:, sf_idx : sf_idx + 1],
-                ]
-            )
-
-        return X_transformed
+        plan = getattr(self, "_column_plan", None)
+        if plan is None or plan.column_transformer is not self.preprocessor:
+            plan = ColumnPlan(self.preprocessor, self._select_output_indices())
+            self._column_plan = plan
+        return plan
+
+    def get_output_indices(self) -> Optional[np.ndarray]:
+        """
+        Get the ColumnTransformer output columns kept by ``transform``.
+
+        Returns:
+            np.ndarray or None: Column indices, or None if all columns are kept
+
+        Raises:
+            ValueError: If preprocessor is not fitted
+        """
+        return self.get_column_plan().output_indices
+
+    def _select_output_indices(self) -> Optional[np.ndarray]:
+        """
+        For the flag feature, we only need one column (since it's binary).
+        If we have both S0 and SF columns, we'll keep only one.
+        """
+        feature_names = self.get_feature_names()
+        if "flag_SF" not in feature_names:
+            return None
+
+        # Keep only the flag_SF column and all numerical features
+        sf_idx = feature_names.index("flag_SF")
+        return np.append(np.arange(len(self.numerical_features)), sf_idx)
 
     def fit_transform(
         self, X: pd.DataFrame, y: Optional[pd.Series] = None
@@ -227,6 +466,7 @@ class DataPreprocessor:
         Raises:
             ValueError: If preprocessor is not fitted
         """
+        self._ensure_built()
         if self.preprocessor is None:
             raise ValueError("Preprocessor has not been fitted yet")
 
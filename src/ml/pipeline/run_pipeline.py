@@ -1,4 +1,5 @@
 import argparse
+import inspect
 import logging
 import os
 from pathlib import Path
@@ -9,9 +10,19 @@ import mlflow
 import mlflow.sklearn
 import numpy as np
 import pandas as pd
+import sklearn
 from evaluation.evaluator import ModelEvaluator
+from preprocessing.cache import StageCache
+from preprocessing.loader import (
+    CACHE_VERSION,
+    SELECTED_FEATURES,
+    TARGET_COLUMN,
+    KddChunks,
+    read_kdd,
+)
 from preprocessing.preprocessor import DataPreprocessor
 from sklearn.model_selection import train_test_split
+from training.incremental import IncrementalTrainer
 from training.trainer import ModelTrainer
 
 # Configure logging
@@ -24,13 +35,20 @@ logger = logging.getLogger(__name__)
 mlflow.set_tracking_uri("http://localhost:5000")
 
 
-def load_data(data_path: str) -> Tuple[pd.DataFrame, pd.Series]:
+def load_data(
+    data_path: str, cache_dir: Optional[str] = None
+) -> Tuple[pd.DataFrame, pd.Series]:
     """
     Load and prepare the dataset using only the selected features.
     Convert target variable to binary (0 for normal, 1 for any attack).
 
+    Only the selected features and the label are parsed, with compact dtypes;
+    with ``cache_dir`` the parsed columns are cached as Parquet keyed by the
+    file content.
+
     Args:
         data_path (str): Path to the dataset
+        cache_dir (str, optional): Directory for the parsed-data cache
 
     Returns:
         tuple: Features (X) and target variable (y)
@@ -44,77 +62,17 @@ def load_data(data_path: str) -> Tuple[pd.DataFrame, pd.Series]:
 
     logger.info(f"Loading data from {data_path}")
     try:
-        # Define KDD column names
-        columns = [
-            "duration",
-            "protocol_type",
-            "service",
-            "flag",
-            "src_bytes",
-            "dst_bytes",
-            "land",
-            "wrong_fragment",
-            "urgent",
-            "hot",
-            "num_failed_logins",
-            "logged_in",
-            "num_compromised",
-            "root_shell",
-            "su_attempted",
-            "num_root",
-            "num_file_creations",
-            "num_shells",
-            "num_access_files",
-            "num_outbound_cmds",
-            "is_host_login",
-            "is_guest_login",
-            "count",
-            "srv_count",
-            "serror_rate",
-            "srv_serror_rate",
-            "rerror_rate",
-            "srv_rerror_rate",
-            "same_srv_rate",
-            "diff_srv_rate",
-            "srv_diff_host_rate",
-            "dst_host_count",
-            "dst_host_srv_count",
-            "dst_host_same_srv_rate",
-            "dst_host_diff_srv_rate",
-            "dst_host_same_src_port_rate",
-            "dst_host_srv_diff_host_rate",
-            "dst_host_serror_rate",
-            "dst_host_srv_serror_rate",
-            "dst_host_rerror_rate",
-            "dst_host_srv_rerror_rate",
-            "kind_of_activity",
-            "level",
-        ]
-
-        # Load data without header and assign column names
-        df = pd.read_csv(data_path, header=None, names=columns)
+        df = read_kdd(
+            data_path, SELECTED_FEATURES + [TARGET_COLUMN], cache_dir=cache_dir
+        )
         if df.empty:
             raise ValueError("Data file is empty")
 
-        # Define selected features (matching DataPreprocessor)
-        selected_features = [
-            "logged_in",
-            "count",
-            "serror_rate",
-            "srv_serror_rate",
-            "same_srv_rate",
-            "dst_host_srv_count",
-            "dst_host_same_srv_rate",
-            "dst_host_serror_rate",
-            "dst_host_srv_serror_rate",
-            "flag",
-        ]
-
         # Select only the required features
-        X = df[selected_features]
+        X = df[SELECTED_FEATURES]
 
         # Convert target to binary (0 for normal, 1 for any attack)
-        y = (df["kind_of_activity"] != "normal").astype(int)
+        y = (df[TARGET_COLUMN] != "normal").astype(int)
 
         logger.info(
             f"Loaded data with {len(X)} samples and {len(X.columns)} selected features"
@@ -131,15 +89,32 @@ def run_pipeline(
     test_data_path: str,
     n_features_to_select: int = 10,
     random_state: int = 42,
+    cache_dir: Optional[str] = None,
+    n_jobs: int = 1,
+    max_p99_latency_us: Optional[float] = None,
+    max_model_bytes: Optional[int] = None,
+    tune: bool = False,
+    n_candidates: int = 200,
 ) -> Dict[str, Dict[str, float]]:
     """
     Run the complete machine learning pipeline.
 
+    With ``cache_dir``, loading, preprocessor fitting and the transformed
+    matrices are cached as stages keyed by the input files' content and the
+    stage configuration, so a run that only changes the models skips them.
+    Which stages hit and the time saved are logged.
+
     Args:
         train_data_path (str): Path to the training dataset
         test_data_path (str): Path to the test dataset
         n_features_to_select (int): Number of features to select
         random_state (int): Random state for reproducibility
+        cache_dir (str, optional): Directory for the stage cache
+        n_jobs (int): Worker processes for model training, -1 for all cores
+        max_p99_latency_us (float, optional): Single-row p99 latency budget
+        max_model_bytes (int, optional): Serialized model size budget
+        tune (bool): Search each model's hyperparameters before training
+        n_candidates (int): Configurations sampled per model when tuning
 
     Returns:
         dict: Dictionary containing evaluation metrics for all models
@@ -152,37 +127,82 @@ def run_pipeline(
         artifacts_dir = Path("artifacts")
         artifacts_dir.mkdir(exist_ok=True)
 
-        # Load training data
-        X_train, y_train = load_data(train_data_path)
-
-        # Load test data
-        X_test, y_test = load_data(test_data_path)
-
-        logger.info(f"Loaded training data: {len(X_train)} samples")
-        logger.info(f"Loaded test data: {len(X_test)} samples")
+        stages = StageCache(Path(cache_dir) / "stages" if cache_dir else None)
+        columns = SELECTED_FEATURES + [TARGET_COLUMN]
+        train_key = stages.key("load", CACHE_VERSION, *columns, files=[train_data_path])
+        test_key = stages.key("load", CACHE_VERSION, *columns, files=[test_data_path])
+
+        def load_train():
+            return stages.run(
+                "load", train_key, lambda: load_data(train_data_path), "load train"
+            )
+
+        def load_test():
+            return stages.run(
+                "load", test_key, lambda: load_data(test_data_path), "load test"
+            )
+
+        # Fit the preprocessor on the training data
+        preprocessor_config = DataPreprocessor()
+        preprocess_key = stages.key(
+            "preprocess",
+            train_key,
+            sklearn.__version__,
+            *preprocessor_config.selected_features,
+            *preprocessor_config.categorical_features,
+            files=[inspect.getsourcefile(DataPreprocessor)],
+        )
 
-        # Initialize preprocessor
-        preprocessor = DataPreprocessor()
+        def fit_preprocessor():
+            logger.info("Preprocessing training data...")
+            return DataPreprocessor().fit(*load_train())
 
-        # Fit and transform training data
-        logger.info("Preprocessing training data...")
-        X_train_processed = preprocessor.fit_transform(X_train, y_train)
+        preprocessor = stages.run("preprocess", preprocess_key, fit_preprocessor)
 
         # Save only the fitted ColumnTransformer with a custom name
         preprocessor_path = artifacts_dir / "preprocessor.joblib"
         joblib.dump(preprocessor.preprocessor, preprocessor_path, protocol=4)
         logger.info(f"Saved fitted ColumnTransformer to {preprocessor_path}")
 
-        # Transform test data
-        logger.info("Preprocessing test data...")
-        X_test_processed = preprocessor.transform(X_test)
+        # Transform training and test data
+        def transform():
+            X_train, y_train = load_train()
+            X_test, y_test = load_test()
+            logger.info(f"Loaded training data: {len(X_train)} samples")
+            logger.info(f"Loaded test data: {len(X_test)} samples")
+            logger.info("Transforming training and test data...")
+            return (
+                preprocessor.transform(X_train),
+                preprocessor.transform(X_test),
+                y_train.to_numpy(),
+                y_test.to_numpy(),
+            )
+
+        X_train_processed, X_test_processed, y_train, y_test = stages.run(
+            "transform", stages.key("transform", preprocess_key, test_key), transform
+        )
+        stages.report()
 
         # Get selected feature names
         selected_features = preprocessor.get_feature_names()
         logger.info(f"Selected {len(selected_features)} features: {selected_features}")
 
         # Initialize and run model trainer
-        trainer = ModelTrainer(random_state=random_state)
+        trainer = ModelTrainer(
+            random_state=random_state,
+            n_jobs=n_jobs,
+            max_p99_latency_us=max_p99_latency_us,
+            max_model_bytes=max_model_bytes,
+        )
+
+        if tune:
+            logger.info("Tuning model hyperparameters...")
+            trainer.tune(
+                X_train_processed,
+                y_train,
+                n_candidates=n_candidates,
+                experiment_name="Intrusion Detection",
+            )
 
         # Train and evaluate models
         logger.info("Training and evaluating models...")
@@ -201,6 +221,73 @@ def run_pipeline(
         raise
 
 
+def run_streaming_pipeline(
+    train_data_path: str,
+    test_data_path: str,
+    chunk_rows: int = 100000,
+    random_state: int = 42,
+    epochs: int = 1,
+    max_p99_latency_us: Optional[float] = None,
+    max_model_bytes: Optional[int] = None,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Run the pipeline over datasets larger than memory, chunk by chunk.
+
+    The preprocessor is fitted incrementally over the training chunks, then
+    incremental-capable models are trained and evaluated by IncrementalTrainer.
+    Peak memory is bounded by ``chunk_rows`` rather than the dataset size.
+
+    Args:
+        train_data_path (str): Path to the training dataset
+        test_data_path (str): Path to the test dataset
+        chunk_rows (int): Rows read per chunk
+        random_state (int): Random state for reproducibility
+        epochs (int): Passes of the SGD model over the training data
+        max_p99_latency_us (float, optional): Single-row p99 latency budget
+        max_model_bytes (int, optional): Serialized model size budget
+
+    Returns:
+        dict: Dictionary containing evaluation metrics for all models
+    """
+    try:
+        artifacts_dir = Path("artifacts")
+        artifacts_dir.mkdir(exist_ok=True)
+
+        # Fit the preprocessor over the training chunks
+        logger.info("Fitting preprocessor over training chunks...")
+        preprocessor = DataPreprocessor()
+        n_rows = 0
+        for X_chunk, _ in KddChunks(train_data_path, chunk_rows):
+            preprocessor.partial_fit(X_chunk)
+            n_rows += len(X_chunk)
+        if n_rows == 0:
+            raise ValueError("Data file is empty")
+        preprocessor.finalize()
+        logger.info(f"Fitted preprocessor on {n_rows} training samples")
+
+        preprocessor_path = artifacts_dir / "preprocessor.joblib"
+        joblib.dump(preprocessor.preprocessor, preprocessor_path, protocol=4)
+        logger.info(f"Saved fitted ColumnTransformer to {preprocessor_path}")
+
+        trainer = IncrementalTrainer(
+            random_state=random_state,
+            epochs=epochs,
+            max_p99_latency_us=max_p99_latency_us,
+            max_model_bytes=max_model_bytes,
+        )
+
+        logger.info("Training and evaluating models over chunks...")
+        return trainer.train_and_evaluate(
+            KddChunks(train_data_path, chunk_rows, preprocessor.transform),
+            KddChunks(test_data_path, chunk_rows, preprocessor.transform),
+            experiment_name="Intrusion Detection",
+        )
+
+    except Exception as e:
+        logger.error(f"Error running streaming pipeline: {str(e)}", exc_info=True)
+        raise
+
+
 def main():
     """Main function to run the pipeline with command line arguments."""
     parser = argparse.ArgumentParser(description="Run intrusion detection pipeline")
@@ -219,16 +306,88 @@ def main():
     parser.add_argument(
         "--random_state", type=int, default=42, help="Random state for reproducibility"
     )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default="data/cache",
+        help="Directory for the pipeline stage cache, empty to disable",
+    )
+    parser.add_argument(
+        "--n_jobs",
+        type=int,
+        default=-1,
+        help="Worker processes for model training, -1 for all cores",
+    )
+    parser.add_argument(
+        "--max_p99_latency_us",
+        type=float,
+        default=None,
+        help="Only select models whose single-row p99 latency is within this",
+    )
+    parser.add_argument(
+        "--max_model_mb",
+        type=float,
+        default=None,
+        help="Only select models whose serialized size is within this",
+    )
+    parser.add_argument(
+        "--tune",
+        action="store_true",
+        help="Search model hyperparameters with successive halving first",
+    )
+    parser.add_argument(
+        "--n_candidates",
+        type=int,
+        default=200,
+        help="Configurations sampled per model when tuning",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Train chunk by chunk on data larger than memory",
+    )
+    parser.add_argument(
+        "--chunk_rows",
+        type=int,
+        default=100000,
+        help="Rows read per chunk in streaming mode",
+    )
+    parser.add_argument(
+        "--epochs",
+        type=int,
+        default=1,
+        help="Passes of the SGD model over the data in streaming mode",
+    )
 
     args = parser.parse_args()
 
     try:
-        results = run_pipeline(
-            train_data_path=args.train_data_path,
-            test_data_path=args.test_data_path,
-            n_features_to_select=args.n_features,
-            random_state=args.random_state,
+        max_model_bytes = (
+            int(args.max_model_mb * 1024 * 1024) if args.max_model_mb else None
         )
+        if args.streaming:
+            results = run_streaming_pipeline(
+                train_data_path=args.train_data_path,
+                test_data_path=args.test_data_path,
+                chunk_rows=args.chunk_rows,
+                random_state=args.random_state,
+                epochs=args.epochs,
+                max_p99_latency_us=args.max_p99_latency_us,
+                max_model_bytes=max_model_bytes,
+            )
+        else:
+            results = run_pipeline(
+                train_data_path=args.train_data_path,
+                test_data_path=args.test_data_path,
+                n_features_to_select=args.n_features,
+                random_state=args.random_state,
+                cache_dir=args.cache_dir or None,
+                n_jobs=args.n_jobs,
+                max_p99_latency_us=args.max_p99_latency_us,
+                max_model_bytes=max_model_bytes,
+                tune=args.tune,
+                n_candidates=args.n_candidates,
+            )
 
         # Print final results
         logger.info("\nFinal Results:")
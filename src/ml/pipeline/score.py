@@ -0,0 +1,306 @@
+import argparse
+import logging
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+if str(project_root) not in sys.path:
+    sys.path.append(str(project_root))
+
+from src.api.schemas import TRAFFIC_FEATURES
+from src.ml.inference.arrow import CLASSIFICATION_LABELS, table_to_frame
+from src.ml.inference.batch import BatchScore, BatchScorer
+from src.ml.inference.manager import ModelManager
+from src.ml.inference.stream import CsvChunkReader
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# A chunk is either raw CSV lines or an already decoded frame
+Chunk = Union[bytes, pd.DataFrame]
+
+# Per-process state of a scoring worker, set by _init_worker
+_worker_scorer: Optional[BatchScorer] = None
+_worker_reader: Optional[CsvChunkReader] = None
+
+
+def is_parquet_path(path: Path) -> bool:
+    return path.suffix.lower() in (".parquet", ".pq")
+
+
+def iter_chunks(
+    input_path: Path, chunk_rows: int, skip_header: bool = False
+) -> Iterator[Chunk]:
+    """
+    Read a KDD-format CSV or a Parquet file in chunks of ``chunk_rows`` rows.
+
+    CSV chunks are returned as raw lines so that parsing happens in the
+    workers; Parquet row batches are decoded here, reading only the features.
+
+    Args:
+        input_path (Path): CSV or Parquet file
+        chunk_rows (int): Rows per chunk
+        skip_header (bool): Whether to skip the first line of CSV input
+
+    Yields:
+        bytes or pd.DataFrame: One chunk of rows
+    """
+    if is_parquet_path(input_path):
+        parquet_file = pq.ParquetFile(input_path)
+        columns = [
+            name for name in TRAFFIC_FEATURES if name in parquet_file.schema_arrow.names
+        ]
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield table_to_frame(pa.Table.from_batches([batch]), TRAFFIC_FEATURES)
+        return
+
+    with open(input_path, "rb") as f:
+        if skip_header:
+            f.readline()
+        while True:
+            lines = [line for _, line in zip(range(chunk_rows), f)]
+            if not lines:
+                return
+            yield b"".join(lines)
+
+
+def score_chunk(
+    scorer: BatchScorer, reader: CsvChunkReader, chunk: Chunk
+) -> BatchScore:
+    """
+    Parse, validate and score one chunk with a single vectorized call.
+
+    Rows are validated against the inputs the model's preprocessor was fitted
+    on rather than the API's request schema, so every category seen in
+    training is scored.
+
+    Args:
+        scorer (BatchScorer): Scorer of the loaded model
+        reader (CsvChunkReader): Parser of CSV chunks
+        chunk: Raw CSV lines or a decoded frame
+
+    Returns:
+        BatchScore: Predictions aligned with the chunk's rows and per-row errors
+    """
+    if isinstance(chunk, bytes):
+        frame, errors = reader.parse(chunk)
+    else:
+        frame, errors = chunk, {}
+    return scorer.score_valid_rows(frame, errors=errors)
+
+
+def _init_worker(model: Any, preprocessor: Any, reader: CsvChunkReader):
+    """Build the scorer once per worker process."""
+    global _worker_scorer, _worker_reader
+    _worker_scorer = BatchScorer(model, preprocessor)
+    _worker_reader = reader
+
+
+def _score_in_worker(chunk: Chunk) -> BatchScore:
+    return score_chunk(_worker_scorer, _worker_reader, chunk)
+
+
+class PredictionWriter:
+    """
+    Append scored chunks to a CSV or Parquet file as they complete.
+
+    Every input row becomes one output row with its position in the input,
+    the predicted label (-1 on error), the classification result and the error.
+    """
+
+    schema = pa.schema(
+        [
+            ("row", pa.int64()),
+            ("prediction", pa.int8()),
+            ("classification_result", pa.string()),
+            ("error", pa.string()),
+        ]
+    )
+
+    def __init__(self, output_path: Path):
+        self.output_path = Path(output_path)
+        self.rows = 0
+        if is_parquet_path(self.output_path):
+            self._writer = pq.ParquetWriter(self.output_path, self.schema)
+        else:
+            self._writer = pa_csv.CSVWriter(self.output_path, self.schema)
+
+    def write(self, batch_score: BatchScore):
+        """Append the rows of one scored chunk."""
+        predictions = batch_score.predictions
+        # Failed rows hold -1, which picks the trailing None
+        labels = np.array(CLASSIFICATION_LABELS + [None], dtype=object)
+        errors = np.full(len(predictions), None, dtype=object)
+        for i, error in batch_score.errors.items():
+            errors[i] = error
+
+        table = pa.table(
+            [
+                pa.array(np.arange(self.rows, self.rows + len(predictions))),
+                pa.array(predictions, type=pa.int8()),
+                pa.array(labels[predictions], type=pa.string()),
+                pa.array(errors, type=pa.string()),
+            ],
+            schema=self.schema,
+        )
+        self._writer.write_table(table)
+        self.rows += len(predictions)
+
+    def close(self):
+        self._writer.close()
+
+
+def score_file(
+    input_path: str,
+    output_path: str,
+    artifacts_dir: str = "artifacts",
+    chunk_rows: int = 100000,
+    n_workers: int = 1,
+    header: bool = False,
+    tracking_uri: Optional[str] = None,
+) -> Dict[str, float]:
+    """
+    Score a capture file of any size and write one prediction per row.
+
+    The model and preprocessor are loaded as the API loads them. Chunks are
+    scored in ``n_workers`` processes, each holding its own scorer, with at
+    most two chunks per worker in flight; results are written in input order.
+
+    Args:
+        input_path (str): KDD-format CSV or Parquet file
+        output_path (str): CSV or Parquet file to write, chosen by suffix
+        artifacts_dir (str): Directory holding the model artifacts
+        chunk_rows (int): Rows per chunk
+        n_workers (int): Worker processes, 1 scores in this process
+        header (bool): Whether the CSV input starts with column names
+        tracking_uri (str, optional): MLflow tracking URI, local artifacts if None
+
+    Returns:
+        dict: Rows, errors, elapsed seconds and rows per second
+
+    Raises:
+        FileNotFoundError: If the input file doesn't exist
+    """
+    input_path = Path(input_path)
+    if not input_path.exists():
+        raise FileNotFoundError(f"Data file not found: {input_path}")
+
+    version = ModelManager(Path(artifacts_dir), tracking_uri=tracking_uri).load()
+    reader = CsvChunkReader(TRAFFIC_FEATURES, chunk_rows=chunk_rows)
+    csv_header = header and not is_parquet_path(input_path)
+    if csv_header:
+        with open(input_path, "rb") as f:
+            reader.read_header(f.readline())
+    chunks = iter_chunks(input_path, chunk_rows, skip_header=csv_header)
+    writer = PredictionWriter(Path(output_path))
+    errors = 0
+
+    logger.info(
+        f"Scoring {input_path} with model version '{version.version}' "
+        f"in chunks of {chunk_rows} rows on {n_workers} worker(s)"
+    )
+    started = time.perf_counter()
+    try:
+        if n_workers <= 1:
+            for chunk in chunks:
+                batch_score = score_chunk(version.scorer, reader, chunk)
+                writer.write(batch_score)
+                errors += len(batch_score.errors)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_init_worker,
+                initargs=(version.model, version.preprocessor, reader),
+            ) as pool:
+                in_flight = deque()
+                for chunk in chunks:
+                    in_flight.append(pool.submit(_score_in_worker, chunk))
+                    if len(in_flight) >= 2 * n_workers:
+                        batch_score = in_flight.popleft().result()
+                        writer.write(batch_score)
+                        errors += len(batch_score.errors)
+                while in_flight:
+                    batch_score = in_flight.popleft().result()
+                    writer.write(batch_score)
+                    errors += len(batch_score.errors)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": writer.rows,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "rows_per_s": writer.rows / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    """Main function to score a capture file with command line arguments."""
+    parser = argparse.ArgumentParser(description="Score a capture file offline")
+    parser.add_argument(
+        "--input_path", type=str, required=True, help="KDD-format CSV or Parquet file"
+    )
+    parser.add_argument(
+        "--output_path", type=str, required=True, help="CSV or Parquet file to write"
+    )
+    parser.add_argument(
+        "--artifacts_dir",
+        type=str,
+        default="artifacts",
+        help="Directory holding the model artifacts",
+    )
+    parser.add_argument(
+        "--chunk_rows", type=int, default=100000, help="Rows read per chunk"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Worker processes scoring chunks"
+    )
+    parser.add_argument(
+        "--header", action="store_true", help="CSV input starts with column names"
+    )
+    parser.add_argument(
+        "--tracking_uri",
+        type=str,
+        default=None,
+        help="MLflow tracking URI, local artifacts are used if omitted",
+    )
+
+    args = parser.parse_args()
+
+    try:
+        summary = score_file(
+            input_path=args.input_path,
+            output_path=args.output_path,
+            artifacts_dir=args.artifacts_dir,
+            chunk_rows=args.chunk_rows,
+            n_workers=args.workers,
+            header=args.header,
+            tracking_uri=args.tracking_uri,
+        )
+        logger.info(
+            f"Scored {summary['rows']} rows ({summary['errors']} errors) "
+            f"in {summary['elapsed_s']:.2f}s: {summary['rows_per_s']:.0f} rows/sec"
+        )
+
+    except Exception as e:
+        logger.error(f"Scoring failed: {str(e)}")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import mlflow
+import numpy as np
+import xgboost as xgb
+from sklearn.linear_model import SGDClassifier
+from xgboost import XGBClassifier
+
+from .trainer import BENCHMARK_BATCH_ROWS, ModelTrainer
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# A re-iterable source of (features, labels) chunks, read anew on every pass
+Chunks = Iterable[Tuple[np.ndarray, np.ndarray]]
+
+CLASSES = np.array([0, 1])
+
+
+class StreamingMetrics:
+    """
+    Binary classification metrics accumulated chunk by chunk.
+
+    Memory does not grow with the number of rows: predictions are kept as a
+    confusion matrix and scores as per-class histograms, from which ROC AUC is
+    computed to within the histogram's resolution.
+    """
+
+    def __init__(self, bins: int = 1000):
+        """
+        Args:
+            bins (int): Histogram bins over [0, 1] used for ROC AUC
+        """
+        self.bins = bins
+        self.confusion = np.zeros(4, dtype=np.int64)
+        self.positive_hist = np.zeros(bins, dtype=np.int64)
+        self.negative_hist = np.zeros(bins, dtype=np.int64)
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray, y_prob: np.ndarray):
+        """Add one chunk of labels, predictions and positive-class scores."""
+        y_true = np.asarray(y_true, dtype=np.int64)
+        self.confusion += np.bincount(
+            2 * y_true + np.asarray(y_pred, dtype=np.int64), minlength=4
+        )
+        bins = np.clip(
+            (np.asarray(y_prob) * self.bins).astype(np.int64), 0, self.bins - 1
+        )
+        self.positive_hist += np.bincount(bins[y_true == 1], minlength=self.bins)
+        self.negative_hist += np.bincount(bins[y_true == 0], minlength=self.bins)
+
+    def result(self) -> Dict[str, float]:
+        """
+        Compute the metrics ``ModelTrainer`` reports.
+
+        Returns:
+            dict: Accuracy, precision, recall, F1 and ROC AUC
+        """
+        tn, fp, fn, tp = self.confusion
+        total = self.confusion.sum()
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = (
+            2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        )
+
+        # Each positive outranks the negatives in lower bins, ties count half
+        positives, negatives = self.positive_hist.sum(), self.negative_hist.sum()
+        if positives and negatives:
+            negatives_below = np.cumsum(self.negative_hist) - self.negative_hist
+            roc_auc = (
+                self.positive_hist * (negatives_below + 0.5 * self.negative_hist)
+            ).sum() / (positives * negatives)
+        else:
+            roc_auc = float("nan")
+
+        return {
+            "accuracy": float((tp + tn) / total) if total else 0.0,
+            "precision": float(precision),
+            "recall": float(recall),
+            "f1": float(f1),
+            "roc_auc": float(roc_auc),
+        }
+
+
+class _ChunkIter(xgb.DataIter):
+    """Feed chunks to XGBoost, which pages them to an on-disk cache."""
+
+    def __init__(self, chunks: Chunks, cache_prefix: str):
+        self.chunks = chunks
+        self._iter = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        if self._iter is None:
+            self._iter = iter(self.chunks)
+        try:
+            X, y = next(self._iter)
+        except StopIteration:
+            return False
+        input_data(data=X, label=y)
+        return True
+
+    def reset(self):
+        self._iter = None
+
+
+class IncrementalTrainer(ModelTrainer):
+    """
+    Train on chunked data that need not fit in memory.
+
+    The SGD linear model is fitted with ``partial_fit`` chunk by chunk, and
+    XGBoost trains from an external-memory DMatrix that pages the chunks to
+    disk. Evaluation streams the test set, so peak memory is bounded by the
+    chunk size. Logging, selection and registration are as in ModelTrainer.
+    """
+
+    def __init__(
+        self,
+        random_state: int = 42,
+        epochs: int = 1,
+        cache_dir: Optional[str] = None,
+        max_p99_latency_us: Optional[float] = None,
+        max_model_bytes: Optional[int] = None,
+    ):
+        """
+        Initialize the IncrementalTrainer with model configurations.
+
+        Args:
+            random_state (int): Random seed for reproducibility
+            epochs (int): Passes of the SGD model over the training chunks
+            cache_dir (str, optional): Directory for XGBoost's external-memory
+                cache, the system temporary directory if None
+            max_p99_latency_us (float, optional): Highest single-row p99
+                latency a model may have to be selected, unbounded if None
+            max_model_bytes (int, optional): Largest serialized size a model
+                may have to be selected, unbounded if None
+        """
+        self.epochs = epochs
+        self.cache_dir = cache_dir
+        super().__init__(
+            random_state=random_state,
+            max_p99_latency_us=max_p99_latency_us,
+            max_model_bytes=max_model_bytes,
+        )
+
+    def build_models(self) -> Dict[str, Any]:
+        """
+        Build the unfitted incremental-capable candidate models.
+
+        Returns:
+            dict: Candidate models keyed by name
+        """
+        return {
+            "sgd": SGDClassifier(loss="log_loss", random_state=self.random_state),
+            "xgboost": XGBClassifier(
+                random_state=self.random_state,
+                tree_method="hist",
+                eval_metric="logloss",
+            ),
+        }
+
+    def train_and_evaluate(
+        self,
+        train_chunks: Chunks,
+        test_chunks: Chunks,
+        experiment_name: str = "Intrusion Detection",
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Train and evaluate the models over chunks, tracking results with MLflow.
+
+        Args:
+            train_chunks: Re-iterable of preprocessed training chunks
+            test_chunks: Re-iterable of preprocessed test chunks
+            experiment_name (str): Name of the MLflow experiment
+
+        Returns:
+            dict: Dictionary containing evaluation metrics for all models
+
+        Raises:
+            ValueError: If the training data is empty or no model could be trained
+        """
+        # Set MLflow tracking URI if specified
+        if os.getenv("MLFLOW_TRACKING_URI"):
+            mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
+
+        mlflow.set_experiment(experiment_name)
+
+        X_example, y_example = next(iter(train_chunks), (None, None))
+        if X_example is None:
+            raise ValueError("Training data is empty")
+
+        fitters = {"sgd": self._fit_sgd, "xgboost": self._fit_xgboost}
+        fitted = {}
+        for model_name, model in self.models.items():
+            logger.info(f"Training {model_name} incrementally...")
+            started = time.perf_counter()
+            try:
+                fitted[model_name] = fitters[model_name](model, train_chunks)
+            except Exception as e:
+                logger.error(f"Error training {model_name}: {str(e)}", exc_info=True)
+            self.train_times[model_name] = time.perf_counter() - started
+
+        metrics, X_sample = self._evaluate(fitted, test_chunks)
+
+        results = {}
+        run_ids = {}
+        for model_name, model in fitted.items():
+            try:
+                run_ids[model_name] = self.log_candidate(
+                    model_name, model, metrics[model_name], X_sample
+                )
+                results[model_name] = metrics[model_name]
+            except Exception as e:
+                logger.error(f"Error logging {model_name}: {str(e)}", exc_info=True)
+
+        if not results:
+            raise ValueError("No models were successfully trained")
+
+        self.register_best_model(run_ids, X_example, y_example)
+        return results
+
+    def _fit_sgd(self, model: SGDClassifier, train_chunks: Chunks) -> SGDClassifier:
+        """Fit the SGD model with one ``partial_fit`` per chunk and epoch."""
+        for _ in range(self.epochs):
+            for X, y in train_chunks:
+                model.partial_fit(X, y, classes=CLASSES)
+        return model
+
+    def _fit_xgboost(self, model: XGBClassifier, train_chunks: Chunks) -> XGBClassifier:
+        """Train XGBoost from an external-memory DMatrix built over the chunks."""
+        with tempfile.TemporaryDirectory(dir=self.cache_dir) as cache_dir:
+            dtrain = xgb.DMatrix(
+                _ChunkIter(train_chunks, os.path.join(cache_dir, "train"))
+            )
+            params = {
+                key: value
+                for key, value in model.get_xgb_params().items()
+                if value is not None
+            }
+            booster = xgb.train(
+                params,
+                dtrain,
+                num_boost_round=model.n_estimators or 100,
+            )
+            del dtrain
+        # Load the booster into the sklearn wrapper the API and MLflow expect
+        model.load_model(bytearray(booster.save_raw("json")))
+        return model
+
+    def _evaluate(
+        self, models: Dict[str, Any], test_chunks: Chunks
+    ) -> Tuple[Dict[str, Dict[str, float]], np.ndarray]:
+        """
+        Evaluate all models in one pass over the test chunks.
+
+        Returns:
+            tuple: Metrics per model, and the leading test rows kept as the
+                latency benchmark sample
+        """
+        accumulators = {model_name: StreamingMetrics() for model_name in models}
+        X_sample = None
+        for X, y in test_chunks:
+            if X_sample is None:
+                X_sample = X[:BENCHMARK_BATCH_ROWS]
+            for model_name, model in models.items():
+                accumulators[model_name].update(
+                    y, model.predict(X), model.predict_proba(X)[:, 1]
+                )
+
+        if X_sample is None:
+            raise ValueError("Test data is empty")
+        return {
+            model_name: accumulator.result()
+            for model_name, accumulator in accumulators.items()
+        }, X_sample
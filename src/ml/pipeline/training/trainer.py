@@ -1,10 +1,17 @@
+import io
 import logging
 import os
-from typing import Any, Dict, Optional
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
+import joblib
 import mlflow
 import mlflow.sklearn
 import numpy as np
+from joblib import Parallel, delayed, parallel_backend
+from scipy.stats import loguniform, randint, uniform
+from sklearn.base import clone
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import (
     accuracy_score,
@@ -13,7 +20,7 @@ from sklearn.metrics import (
     recall_score,
     roc_auc_score,
 )
-from sklearn.model_selection import cross_val_score
+from sklearn.model_selection import HalvingRandomSearchCV, check_cv
 from sklearn.tree import DecisionTreeClassifier
 from xgboost import XGBClassifier
 
@@ -23,38 +30,190 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Folds of the cross-validation run for every candidate
+CV_FOLDS = 5
+
+# Distributions sampled by ``ModelTrainer.tune`` for each candidate model
+SEARCH_SPACES = {
+    "logistic": {
+        "C": loguniform(1e-3, 1e2),
+        "solver": ["lbfgs", "liblinear"],
+    },
+    "decision_tree": {
+        "max_depth": [None, 4, 6, 8, 12, 16, 24],
+        "min_samples_leaf": randint(1, 50),
+        "min_samples_split": randint(2, 50),
+        "criterion": ["gini", "entropy"],
+    },
+    "xgboost": {
+        "n_estimators": randint(50, 400),
+        "max_depth": randint(2, 10),
+        "learning_rate": loguniform(0.01, 0.3),
+        "subsample": uniform(0.5, 0.5),
+        "colsample_bytree": uniform(0.5, 0.5),
+        "min_child_weight": loguniform(0.5, 10),
+    },
+}
+
+# Held-out rows predicted one at a time, and in one call, when benchmarking
+BENCHMARK_SINGLE_ROWS = 200
+BENCHMARK_BATCH_ROWS = 1000
+
+
+def _timed(func: Callable, *args) -> Tuple[Any, Optional[str], float]:
+    """Run one training task, returning its result, error and duration."""
+    started = time.perf_counter()
+    try:
+        result, error = func(*args), None
+    except Exception as e:
+        result, error = None, str(e)
+    return result, error, time.perf_counter() - started
+
+
+def _fit_candidate(
+    model: Any,
+    X_train: np.ndarray,
+    y_train: np.ndarray,
+    X_test: np.ndarray,
+    y_test: np.ndarray,
+) -> Tuple[Any, Dict[str, float]]:
+    """Fit a candidate on the full training set and score it on the test set."""
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    y_pred_proba = model.predict_proba(X_test)[:, 1]
+    metrics = {
+        "accuracy": accuracy_score(y_test, y_pred),
+        "precision": precision_score(y_test, y_pred),
+        "recall": recall_score(y_test, y_pred),
+        "f1": f1_score(y_test, y_pred),
+        "roc_auc": roc_auc_score(y_test, y_pred_proba),
+    }
+    return model, metrics
+
+
+def _score_fold(
+    model: Any,
+    X_train: np.ndarray,
+    y_train: np.ndarray,
+    train_idx: np.ndarray,
+    val_idx: np.ndarray,
+) -> float:
+    """F1 of a fresh copy of a candidate on one cross-validation fold."""
+    fold_model = clone(model).fit(X_train[train_idx], y_train[train_idx])
+    return f1_score(y_train[val_idx], fold_model.predict(X_train[val_idx]))
+
+
+def benchmark_model(
+    model: Any,
+    X: np.ndarray,
+    single_rows: int = BENCHMARK_SINGLE_ROWS,
+    batch_rows: int = BENCHMARK_BATCH_ROWS,
+    repeats: int = 5,
+) -> Dict[str, float]:
+    """
+    Measure a fitted model's inference latency and serialized size.
+
+    Single-row latency is timed over the first ``single_rows`` rows, one
+    ``predict`` call each, as the API scores a single record. Batch latency is
+    the best of ``repeats`` calls on the first ``batch_rows`` rows.
+
+    Args:
+        model: Fitted model exposing ``predict``
+        X (np.ndarray): Held-out features
+        single_rows (int): Rows timed one at a time
+        batch_rows (int): Rows in the timed batch
+        repeats (int): Timed batch calls
+
+    Returns:
+        dict: Single-row p50/p99 latency and batch latency per row in
+            microseconds, and the joblib-serialized size in bytes
+    """
+    # Warm up lazily built state such as XGBoost's predictor
+    model.predict(X[:1])
+
+    single = X[:single_rows]
+    timings = np.empty(single.shape[0])
+    for i in range(single.shape[0]):
+        started = time.perf_counter_ns()
+        model.predict(single[i : i + 1])
+        timings[i] = time.perf_counter_ns() - started
+
+    batch = X[:batch_rows]
+    batch_timings = []
+    for _ in range(repeats):
+        started = time.perf_counter_ns()
+        model.predict(batch)
+        batch_timings.append(time.perf_counter_ns() - started)
+
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+
+    return {
+        "latency_p50_us": float(np.percentile(timings, 50)) / 1000,
+        "latency_p99_us": float(np.percentile(timings, 99)) / 1000,
+        "batch_latency_us_per_row": min(batch_timings) / batch.shape[0] / 1000,
+        "model_size_bytes": float(buffer.tell()),
+    }
+
 
 class ModelTrainer:
-    def __init__(self, random_state: int = 42):
+    def __init__(
+        self,
+        random_state: int = 42,
+        n_jobs: Optional[int] = 1,
+        max_p99_latency_us: Optional[float] = None,
+        max_model_bytes: Optional[int] = None,
+    ):
         """
         Initialize the ModelTrainer with model configurations.
 
         Args:
             random_state (int): Random seed for reproducibility
+            n_jobs (int, optional): Worker processes fitting candidates and CV
+                folds, -1 uses all cores and 1 trains serially in this process
+            max_p99_latency_us (float, optional): Highest single-row p99
+                latency a model may have to be selected, unbounded if None
+            max_model_bytes (int, optional): Largest serialized size a model
+                may have to be selected, unbounded if None
         """
         self.random_state = random_state
-        self.models = {
+        self.n_jobs = n_jobs
+        self.max_p99_latency_us = max_p99_latency_us
+        self.max_model_bytes = max_model_bytes
+        self.train_times = {}
+        self.timing = {}
+        self.benchmarks = {}
+        self.models = self.build_models()
+        self.best_model = None
+        self.best_model_name = None
+        self.best_score = -np.inf
+
+        # Log model configurations
+        logger.info("Initialized models with configurations:")
+        for name, model in self.models.items():
+            logger.info(f"{name}: {model.get_params()}")
+
+    def build_models(self) -> Dict[str, Any]:
+        """
+        Build the unfitted candidate models.
+
+        Returns:
+            dict: Candidate models keyed by name
+        """
+        return {
             "logistic": LogisticRegression(
-                random_state=random_state, max_iter=1000, class_weight="balanced"
+                random_state=self.random_state, max_iter=1000, class_weight="balanced"
             ),
             "decision_tree": DecisionTreeClassifier(
-                random_state=random_state, class_weight="balanced"
+                random_state=self.random_state, class_weight="balanced"
             ),
             "xgboost": XGBClassifier(
-                random_state=random_state,
+                random_state=self.random_state,
                 scale_pos_weight=1,
                 use_label_encoder=False,
                 eval_metric="logloss",
             ),
         }
-        self.best_model = None
-        self.best_model_name = None
-        self.best_score = -np.inf
-
-        # Log model configurations
-        logger.info("Initialized models with configurations:")
-        for name, model in self.models.items():
-            logger.info(f"{name}: {model.get_params()}")
 
     def train_and_evaluate(
         self,
@@ -67,6 +226,10 @@ class ModelTrainer:
         """
         Train and evaluate multiple models, tracking results with MLflow.
 
+        Each model's latency and size are benchmarked on the test set. The best
+        model is the one with the highest test F1 among those within the
+        latency/size budget, and only it is registered as intrusion_detector.
+
         Args:
             X_train (np.ndarray): Training features
             X_test (np.ndarray): Test features
@@ -101,71 +264,28 @@ class ModelTrainer:
         mlflow.set_experiment(experiment_name)
         results = {}
 
-        for model_name, model in self.models.items():
-            logger.info(f"Training {model_name}...")
+        # Fit every candidate and every CV fold up front, in parallel when
+        # n_jobs allows; MLflow runs are only opened afterwards, one at a time
+        fitted, cv_scores = self._fit_all(X_train, X_test, y_train, y_test)
+
+        run_ids = {}
+
+        for model_name in self.models:
+            logger.info(f"Logging {model_name}...")
+
+            if model_name not in fitted:
+                continue
 
             try:
-                with mlflow.start_run(run_name=model_name):
-                    # Train the model
-                    model.fit(X_train, y_train)
-
-                    # Make predictions
-                    y_pred = model.predict(X_test)
-                    y_pred_proba = model.predict_proba(X_test)[:, 1]
-
-                    # Calculate metrics
-                    metrics = {
-                        "accuracy": accuracy_score(y_test, y_pred),
-                        "precision": precision_score(y_test, y_pred),
-                        "recall": recall_score(y_test, y_pred),
-                        "f1": f1_score(y_test, y_pred),
-                        "roc_auc": roc_auc_score(y_test, y_pred_proba),
-                    }
-
-                    # Perform cross-validation
-                    cv_scores = cross_val_score(
-                        model, X_train, y_train, cv=5, scoring="f1"
-                    )
-                    metrics["cv_f1_mean"] = cv_scores.mean()
-                    metrics["cv_f1_std"] = cv_scores.std()
-
-                    # Log metrics to MLflow
-                    mlflow.log_metrics(metrics)
-
-                    # Log model parameters
-                    mlflow.log_params(model.get_params())
-
-                    # Save model
-                    mlflow.sklearn.log_model(model, model_name)
-
-                    results[model_name] = metrics
-
-                    # Update best model if current model has better F1 score
-                    if metrics["f1"] > self.best_score:
-                        self.best_score = metrics["f1"]
-                        self.best_model = model
-                        self.best_model_name = model_name
-
-                        # Register the best model in MLflow Model Registry
-                        try:
-                            mlflow.sklearn.log_model(
-                                model,
-                                "best_model",
-                                registered_model_name="intrusion_detector",
-                                input_example=X_train[:1],  # Log first training example
-                                signature=mlflow.models.infer_signature(
-                                    X_train, y_train
-                                ),
-                            )
-                            logger.info(
-                                f"Registered best model ({model_name}) in MLflow Model Registry"
-                            )
-                        except Exception as e:
-                            logger.error(
-                                f"Failed to register model in MLflow Model Registry: {str(e)}"
-                            )
-
-                    logger.info(f"{model_name} metrics: {metrics}")
+                model, metrics = fitted[model_name]
+                self.models[model_name] = model
+                metrics["cv_f1_mean"] = np.mean(cv_scores[model_name])
+                metrics["cv_f1_std"] = np.std(cv_scores[model_name])
+
+                run_ids[model_name] = self.log_candidate(
+                    model_name, model, metrics, X_test
+                )
+                results[model_name] = metrics
 
             except Exception as e:
                 logger.error(f"Error training {model_name}: {str(e)}", exc_info=True)
@@ -174,9 +294,314 @@ class ModelTrainer:
         if not results:
             raise ValueError("No models were successfully trained")
 
-        logger.info(f"Best model: {self.best_model_name} (F1: {self.best_score:.4f})")
+        self.register_best_model(run_ids, X_train, y_train)
         return results
 
+    def log_candidate(
+        self,
+        model_name: str,
+        model: Any,
+        metrics: Dict[str, float],
+        X_sample: np.ndarray,
+    ) -> str:
+        """
+        Benchmark a fitted candidate, log its MLflow run and track the best.
+
+        The benchmark is added to ``metrics``. Runs are opened one at a time,
+        and only candidates within the latency/size budget can become best.
+
+        Args:
+            model_name (str): Name of the candidate
+            model: Fitted candidate
+            metrics (dict): Its evaluation metrics
+            X_sample (np.ndarray): Held-out features to benchmark on
+
+        Returns:
+            str: ID of the candidate's MLflow run
+        """
+        # Benchmark here rather than in the pool, one model at a time
+        self.benchmarks[model_name] = benchmark_model(model, X_sample)
+        metrics.update(self.benchmarks[model_name])
+        within_budget = self.within_budget(self.benchmarks[model_name])
+
+        with mlflow.start_run(run_name=model_name) as run:
+            # Log metrics to MLflow
+            mlflow.log_metrics(metrics)
+            mlflow.log_metric("train_time_s", self.train_times[model_name])
+            mlflow.set_tag("within_budget", str(within_budget))
+
+            # Log model parameters
+            mlflow.log_params(model.get_params())
+
+            # Save model
+            mlflow.sklearn.log_model(model, model_name)
+
+        logger.info(f"{model_name} metrics: {metrics}")
+
+        if not within_budget:
+            logger.warning(
+                f"{model_name} exceeds the latency/size budget "
+                f"(p99 {metrics['latency_p99_us']:.1f}us, "
+                f"{metrics['model_size_bytes']:.0f} bytes)"
+            )
+        # Update best model if current model has better F1 score
+        elif metrics["f1"] > self.best_score:
+            self.best_score = metrics["f1"]
+            self.best_model = model
+            self.best_model_name = model_name
+
+        return run.info.run_id
+
+    def register_best_model(
+        self, run_ids: Dict[str, str], X_example: np.ndarray, y_example: np.ndarray
+    ):
+        """
+        Register the best model as intrusion_detector, under its own run.
+
+        Args:
+            run_ids (dict): MLflow run ID of every logged candidate
+            X_example (np.ndarray): Training features for the model signature
+            y_example (np.ndarray): Training labels for the model signature
+        """
+        if self.best_model is None:
+            logger.warning("No model fits the latency/size budget, none registered")
+            return
+
+        # Register the best model in MLflow Model Registry
+        try:
+            with mlflow.start_run(run_id=run_ids[self.best_model_name]):
+                mlflow.sklearn.log_model(
+                    self.best_model,
+                    "best_model",
+                    registered_model_name="intrusion_detector",
+                    input_example=X_example[:1],  # Log first training example
+                    signature=mlflow.models.infer_signature(X_example, y_example),
+                )
+            logger.info(
+                f"Registered best model ({self.best_model_name}) in MLflow Model Registry"
+            )
+        except Exception as e:
+            logger.error(f"Failed to register model in MLflow Model Registry: {str(e)}")
+
+        logger.info(f"Best model: {self.best_model_name} (F1: {self.best_score:.4f})")
+
+    def tune(
+        self,
+        X_train: np.ndarray,
+        y_train: np.ndarray,
+        n_candidates: int = 200,
+        factor: int = 3,
+        model_names: Optional[Sequence[str]] = None,
+        experiment_name: str = "Intrusion Detection",
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Search each model's hyperparameters with successive halving.
+
+        ``n_candidates`` configurations are sampled from SEARCH_SPACES and
+        cross-validated on a small subset of the training rows; each round
+        keeps the best ``1 / factor`` of them and grows the subset by
+        ``factor``, so poor configurations are pruned before they cost a full
+        fit. Trials run in ``n_jobs`` worker processes. Once a search ends,
+        it is logged as an MLflow run with one nested run per trial, and the
+        model is set to its best configuration for ``train_and_evaluate``.
+
+        Args:
+            X_train (np.ndarray): Training features
+            y_train (np.ndarray): Training labels
+            n_candidates (int): Configurations sampled per model
+            factor (int): Pruning factor between rounds
+            model_names (optional): Models to tune, defaults to all with a
+                search space
+            experiment_name (str): Name of the MLflow experiment
+
+        Returns:
+            dict: Best configuration per tuned model
+        """
+        # Set MLflow tracking URI if specified
+        if os.getenv("MLFLOW_TRACKING_URI"):
+            mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
+
+        mlflow.set_experiment(experiment_name)
+        y_train = np.asarray(y_train)
+        best_params = {}
+
+        for model_name in model_names or list(self.models):
+            if model_name not in SEARCH_SPACES:
+                logger.info(
+                    f"No search space for {model_name}, keeping its configuration"
+                )
+                continue
+
+            logger.info(f"Tuning {model_name} over {n_candidates} configurations...")
+            search = HalvingRandomSearchCV(
+                clone(self.models[model_name]),
+                SEARCH_SPACES[model_name],
+                n_candidates=n_candidates,
+                factor=factor,
+                resource="n_samples",
+                cv=CV_FOLDS,
+                scoring="f1",
+                refit=False,
+                error_score=np.nan,
+                random_state=self.random_state,
+                n_jobs=self.n_jobs,
+            )
+            started = time.perf_counter()
+            try:
+                with parallel_backend("loky", inner_max_num_threads=1):
+                    search.fit(X_train, y_train)
+            except Exception as e:
+                logger.error(f"Error tuning {model_name}: {str(e)}", exc_info=True)
+                continue
+            elapsed = time.perf_counter() - started
+
+            self._log_search(model_name, search, elapsed)
+            self.models[model_name].set_params(**search.best_params_)
+            best_params[model_name] = search.best_params_
+            logger.info(
+                f"Best {model_name} configuration (CV F1 {search.best_score_:.4f}, "
+                f"{elapsed:.1f}s): {search.best_params_}"
+            )
+
+        return best_params
+
+    def _log_search(
+        self, model_name: str, search: HalvingRandomSearchCV, elapsed: float
+    ):
+        """Log a finished search as a parent run with a nested run per trial."""
+        results = search.cv_results_
+        last_iteration = search.n_iterations_ - 1
+
+        # A trial is one configuration across the rounds it survived
+        trials: Dict[str, List[int]] = {}
+        for i, params in enumerate(results["params"]):
+            trials.setdefault(repr(sorted(params.items())), []).append(i)
+
+        with mlflow.start_run(run_name=f"{model_name}_search"):
+            mlflow.log_params(
+                {
+                    "n_candidates": search.n_candidates_[0],
+                    "factor": search.factor,
+                    "min_resources": search.min_resources_,
+                    "max_resources": search.max_resources_,
+                }
+            )
+            mlflow.log_params({f"best_{k}": v for k, v in search.best_params_.items()})
+            mlflow.log_metrics(
+                {
+                    "best_cv_f1": search.best_score_,
+                    "n_iterations": search.n_iterations_,
+                    "search_time_s": elapsed,
+                }
+            )
+
+            for trial, rows in enumerate(trials.values()):
+                with mlflow.start_run(
+                    run_name=f"{model_name}_trial_{trial}", nested=True
+                ):
+                    mlflow.log_params(results["params"][rows[0]])
+                    for row in rows:
+                        step = int(results["iter"][row])
+                        mlflow.log_metric(
+                            "cv_f1_mean", results["mean_test_score"][row], step=step
+                        )
+                        mlflow.log_metric(
+                            "n_resources", results["n_resources"][row], step=step
+                        )
+                    mlflow.set_tag(
+                        "pruned", str(int(results["iter"][rows[-1]]) < last_iteration)
+                    )
+
+    def within_budget(self, benchmark: Dict[str, float]) -> bool:
+        """Whether a benchmarked model fits the latency and size budget."""
+        if (
+            self.max_p99_latency_us is not None
+            and benchmark["latency_p99_us"] > self.max_p99_latency_us
+        ):
+            return False
+        if (
+            self.max_model_bytes is not None
+            and benchmark["model_size_bytes"] > self.max_model_bytes
+        ):
+            return False
+        return True
+
+    def _fit_all(
+        self,
+        X_train: np.ndarray,
+        X_test: np.ndarray,
+        y_train: np.ndarray,
+        y_test: np.ndarray,
+    ) -> Tuple[Dict[str, Tuple[Any, Dict[str, float]]], Dict[str, list]]:
+        """
+        Fit all candidates and their CV folds as independent tasks.
+
+        Tasks run in a pool of ``n_jobs`` processes with one thread each, so
+        XGBoost does not oversubscribe the cores. The summed task time is what
+        the serial path would take; ``self.timing`` records it along with the
+        wall-clock time and the resulting speed-up.
+
+        Returns:
+            tuple: Fitted model and test metrics per candidate, and CV F1
+                scores per candidate; candidates with a failed task are left out
+        """
+        y_train = np.asarray(y_train)
+        folds = list(
+            check_cv(CV_FOLDS, y_train, classifier=True).split(X_train, y_train)
+        )
+        tasks = []
+        for model_name, model in self.models.items():
+            tasks.append(
+                (
+                    model_name,
+                    delayed(_timed)(
+                        _fit_candidate, model, X_train, y_train, X_test, y_test
+                    ),
+                )
+            )
+            for train_idx, val_idx in folds:
+                tasks.append(
+                    (
+                        model_name,
+                        delayed(_timed)(
+                            _score_fold, model, X_train, y_train, train_idx, val_idx
+                        ),
+                    )
+                )
+
+        logger.info(
+            f"Fitting {len(self.models)} models with {CV_FOLDS}-fold CV "
+            f"as {len(tasks)} tasks on n_jobs={self.n_jobs}"
+        )
+        started = time.perf_counter()
+        with parallel_backend("loky", inner_max_num_threads=1):
+            outputs = Parallel(n_jobs=self.n_jobs)(task for _, task in tasks)
+        wall = time.perf_counter() - started
+
+        outputs_by_model = {model_name: [] for model_name in self.models}
+        for (model_name, _), output in zip(tasks, outputs):
+            outputs_by_model[model_name].append(output)
+
+        fitted, cv_scores = {}, {}
+        for model_name, (fit, *fold_outputs) in outputs_by_model.items():
+            self.train_times[model_name] = sum(
+                elapsed for _, _, elapsed in [fit, *fold_outputs]
+            )
+            errors = [error for _, error, _ in [fit, *fold_outputs] if error]
+            if errors:
+                logger.error(f"Error training {model_name}: {errors[0]}")
+                continue
+            fitted[model_name] = fit[0]
+            cv_scores[model_name] = [score for score, _, _ in fold_outputs]
+
+        serial = sum(self.train_times.values())
+        self.timing = {"wall_s": wall, "serial_s": serial, "speedup": serial / wall}
+        logger.info(
+            f"Training took {wall:.2f}s wall-clock against {serial:.2f}s "
+            f"of serial work: {self.timing['speedup']:.2f}x speed-up"
+        )
+        return fitted, cv_scores
+
     def predict(self, X: np.ndarray) -> np.ndarray:
         """
         Make predictions using the best model.
@@ -0,0 +1,67 @@
+import bisect
+import threading
+from typing import Any, Dict, List, Sequence
+
+# Default bucket upper bounds for latency histograms, in milliseconds
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Histogram:
+    """Thread-safe histogram over fixed, non-cumulative buckets."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets: List[float] = sorted(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear all observations."""
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._count = 0
+            self._sum = 0.0
+            self._max = 0.0
+
+    def observe(self, value: float):
+        """Record one observation."""
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._count += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket containing it."""
+        with self._lock:
+            counts, total, largest = list(self._counts), self._count, self._max
+        if total == 0:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for idx, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[idx] if idx < len(self.buckets) else largest
+        return largest
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get counts per bucket plus summary statistics."""
+        with self._lock:
+            counts, total, total_sum, largest = (
+                list(self._counts),
+                self._count,
+                self._sum,
+                self._max,
+            )
+        labels = [f"le_{b:g}" for b in self.buckets] + ["le_inf"]
+        return {
+            "buckets": dict(zip(labels, counts)),
+            "count": total,
+            "sum": total_sum,
+            "mean": total_sum / total if total else 0.0,
+            "max": largest,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
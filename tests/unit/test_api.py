@@ -2,12 +2,44 @@
 Unit tests for FastAPI application endpoints.
 """
 
-from unittest.mock import Mock, patch
+import asyncio
+import json
+from unittest.mock import AsyncMock, Mock, patch
 
+import pandas as pd
+import pyarrow as pa
 import pytest
 from fastapi.testclient import TestClient
+from sklearn.linear_model import LogisticRegression
 
-from src.api.main import app
+from src.api.main import app, get_decisions
+from src.api.routes.auth import get_current_user_id
+from src.api.routes.decisions import (
+    get_model_manager,
+    predict_single,
+    score_batch_frame,
+    score_batch_records,
+    set_model_and_preprocessor,
+)
+from src.ml.inference.batch import BatchScorer
+from src.ml.inference.executor import InferenceExecutor
+from src.ml.inference.manager import ModelVersion
+from src.ml.inference.shadow import ShadowScorer
+from src.ml.inference.stream import KDD_COLUMNS
+from src.ml.pipeline.preprocessing.preprocessor import DataPreprocessor
+
+VALID_FEATURES = {
+    "logged_in": True,
+    "count": 45,
+    "serror_rate": 0.05,
+    "srv_serror_rate": 0.04,
+    "same_srv_rate": 0.88,
+    "dst_host_srv_count": 110,
+    "dst_host_same_srv_rate": 0.99,
+    "dst_host_serror_rate": 0.02,
+    "dst_host_srv_serror_rate": 0.01,
+    "flag": "S0",
+}
 
 
 class TestAPIEndpoints:
@@ -35,14 +67,14 @@ class TestAPIEndpoints:
         assert "message" in data
         assert "version" in data
     
-    @patch('src.api.routes.decisions.get_supabase_client')
+    @patch('src.api.routes.decisions.get_async_supabase_client')
     def test_get_decisions_history_unauthorized(self, mock_supabase):
         """Test getting decisions history without authentication."""
         response = self.client.get("/decisions")
         # Accept both 401 and 403 for unauthorized access
         assert response.status_code in [401, 403]  # Unauthorized/Forbidden
     
-    @patch('src.api.routes.decisions.get_supabase_client')
+    @patch('src.api.routes.decisions.get_async_supabase_client')
     def test_get_decisions_history_authorized(self, mock_supabase):
         """Test getting decisions history with authentication."""
         # Mock Supabase client
@@ -74,6 +106,28 @@ class TestAPIEndpoints:
         # The test token is invalid, so we expect 401
         assert response.status_code in [401, 403]  # Accept both unauthorized status codes
 
+    @patch('src.api.main.get_async_supabase_client')
+    def test_get_decisions_scoped_to_current_user(self, mock_supabase):
+        """Decision history is always filtered by the authenticated user."""
+        mock_client = Mock()
+        mock_client.query_decisions = AsyncMock(return_value=[])
+        mock_supabase.return_value = mock_client
+
+        decisions = asyncio.run(
+            get_decisions(
+                source_type=None,
+                classification_result=None,
+                limit=10,
+                offset=0,
+                sort="timestamp desc",
+                current_user_id="test-user-id",
+            )
+        )
+
+        assert decisions == []
+        assert mock_client.query_decisions.await_args.kwargs["user_id"] == "test-user-id"
+
+
 class TestAuthEndpoints:
     """Test suite for authentication endpoints."""
     
@@ -81,11 +135,11 @@ class TestAuthEndpoints:
         """Setup test environment."""
         self.client = TestClient(app)
     
-    @patch('src.api.routes.auth.get_supabase_client')
+    @patch('src.api.routes.auth.get_async_supabase_client')
     def test_register_user_success(self, mock_supabase):
         """Test successful user registration."""
         # Mock Supabase client
-        mock_client = Mock()
+        mock_client = AsyncMock()
         mock_supabase.return_value = mock_client
         
         # Mock successful registration - fix the mock structure
@@ -113,7 +167,7 @@ class TestAuthEndpoints:
         assert data["email"] == "test@example.com"
         assert "access_token" in data
     
-    @patch('src.api.routes.auth.get_supabase_client')
+    @patch('src.api.routes.auth.get_async_supabase_client')
     def test_register_user_password_mismatch(self, mock_supabase):
         """Test registration with password mismatch."""
         user_data = {
@@ -128,11 +182,11 @@ class TestAuthEndpoints:
         response_data = response.json()
         assert "Passwords do not match" in response_data.get("detail", "")
     
-    @patch('src.api.routes.auth.get_supabase_client')
+    @patch('src.api.routes.auth.get_async_supabase_client')
     def test_login_user_success(self, mock_supabase):
         """Test successful user login."""
         # Mock Supabase client
-        mock_client = Mock()
+        mock_client = AsyncMock()
         mock_supabase.return_value = mock_client
         
         # Mock successful login - fix the mock structure
@@ -159,11 +213,11 @@ class TestAuthEndpoints:
         assert data["email"] == "test@example.com"
         assert "access_token" in data
     
-    @patch('src.api.routes.auth.get_supabase_client')
+    @patch('src.api.routes.auth.get_async_supabase_client')
     def test_login_user_invalid_credentials(self, mock_supabase):
         """Test login with invalid credentials."""
         # Mock Supabase client
-        mock_client = Mock()
+        mock_client = AsyncMock()
         mock_supabase.return_value = mock_client
         
         # Mock failed login
@@ -188,7 +242,7 @@ class TestDecisionsEndpoints:
         """Setup test environment."""
         self.client = TestClient(app)
     
-    @patch('src.api.routes.decisions.get_supabase_client')
+    @patch('src.api.routes.decisions.get_async_supabase_client')
     def test_analyze_traffic_success(self, mock_supabase):
         """Test successful traffic analysis."""
         # Mock Supabase client
@@ -266,5 +320,243 @@ class TestDecisionsEndpoints:
         # Accept both 422 and 403 for validation errors
         assert response.status_code in [422, 403]  # Validation error or Forbidden
 
+class TestBatchDecisionsRoute:
+    """Test suite for the authenticated batch decisions route."""
+
+    def setup_method(self):
+        """Setup test environment with a fitted model and bypassed auth."""
+        data = pd.DataFrame([VALID_FEATURES, {**VALID_FEATURES, "flag": "SF"}])
+        preprocessor = DataPreprocessor()
+        X = preprocessor.fit_transform(data)
+        model = LogisticRegression().fit(X, [1, 0])
+        self.model, self.preprocessor = model, preprocessor
+
+        set_model_and_preprocessor(model, preprocessor)
+        app.dependency_overrides[get_current_user_id] = lambda: "test-user-id"
+        self.client = TestClient(app)
+
+    def teardown_method(self):
+        """Restore global state."""
+        app.dependency_overrides.clear()
+        set_model_and_preprocessor(None, None)
+
+    @patch('src.api.routes.decisions.get_decision_queue')
+    def test_batch_traffic_list(self, mock_queue):
+        """Test that the batch route scores every item of traffic_list."""
+        queue = mock_queue.return_value = AsyncMock()
+        request = {
+            "traffic_list": [VALID_FEATURES, {**VALID_FEATURES, "flag": "SF"}],
+            "correlation_id": "batch-1",
+        }
+
+        response = self.client.post("/decisions/batch", json=request)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["summary"] == {"processed": 2, "errors": 0, "successful": 2}
+        assert [r["correlation_id"] for r in data["report"]] == ["batch-1_0", "batch-1_1"]
+        # The batch is queued for the write-behind flusher in one put
+        assert queue.put.await_count == 1
+        assert len(queue.put.call_args.args[0]) == 2
+
+    @patch('src.api.routes.decisions.get_redis_client')
+    @patch('src.api.routes.decisions.get_async_supabase_client')
+    def test_single_goes_through_batcher(self, mock_supabase, mock_redis):
+        """Test that the single route is scored by the micro-batcher."""
+        mock_redis.return_value.get_cached_response.return_value = None
+        request = {"features": VALID_FEATURES, "correlation_id": "single-1"}
+
+        response = self.client.post("/decisions/single", json=request)
+
+        assert response.status_code == 200
+        assert response.json()["classification_result"] in ["NORMAL", "MALICIOUS"]
+        stats = self.client.get("/decisions/batcher/stats").json()["batcher_stats"]
+        assert stats["batch_size"]["count"] >= 1
+
+    def test_active_model_version(self):
+        """Test that the active model version and warmup latency are reported."""
+        response = self.client.get("/models/active")
+
+        assert response.status_code == 200
+        active = response.json()["model_stats"]["active"]
+        assert active["version"] == "injected"
+        assert active["warmup_ms"] > 0
+        assert self.client.get("/health").json()["model_version"] == "injected"
+
+    @patch('src.api.routes.decisions.get_decision_queue')
+    def test_batch_routed_by_model_version(self, mock_queue):
+        """Test that unknown versions fall back to the active one and are counted."""
+        queue = mock_queue.return_value = AsyncMock()
+        request = {
+            "traffic_list": [VALID_FEATURES],
+            "correlation_id": "batch-2",
+            "model_version": "does-not-exist",
+        }
+
+        with patch.object(get_model_manager(), "tracking_uri", "local"):
+            response = self.client.post("/decisions/batch", json=request)
+
+        assert response.status_code == 200
+        saved = queue.put.call_args.args[0]
+        assert saved[0]["model_version"] == "injected"
+        stats = self.client.get("/models/versions").json()["registry_stats"]
+        assert stats["active"]["rows"] == 1
+        assert stats["fallbacks"] >= 1
+
+    def test_shadow_skips_pinned_versions(self):
+        """Test that only requests scored by the active version are shadowed."""
+        pinned = ModelVersion(
+            self.model,
+            self.preprocessor,
+            BatchScorer(self.model, self.preprocessor),
+            "pinned",
+            "local",
+        )
+        shadow = ShadowScorer(pinned, sample_rate=1.0)
+
+        with patch('src.api.routes.decisions.shadow_scorer', shadow):
+            asyncio.run(predict_single(VALID_FEATURES, pinned))
+            asyncio.run(score_batch_records([VALID_FEATURES], pinned))
+            asyncio.run(score_batch_frame(pd.DataFrame([VALID_FEATURES]), pinned))
+            assert shadow.get_stats()["totals"]["offered"] == 0
+
+            asyncio.run(score_batch_records([VALID_FEATURES]))
+            assert shadow.get_stats()["totals"]["offered"] == 1
+
+    def test_stream_kdd_csv(self):
+        """Test that a chunked KDD CSV upload streams one NDJSON line per row."""
+        row = dict.fromkeys(KDD_COLUMNS, 0)
+        row.update({**VALID_FEATURES, "logged_in": 1, "kind_of_activity": "normal"})
+        lines = [",".join(str(row[c]) for c in KDD_COLUMNS)] * 5
+        lines[2] = lines[2].replace(",S0,", ",REJ,")
+        body = ("\n".join(lines) + "\n").encode()
+
+        def upload():
+            for start in range(0, len(body), 50):
+                yield body[start:start + 50]
+
+        response = self.client.post(
+            "/decisions/stream",
+            params={"correlation_id": "stream-1", "chunk_rows": 2},
+            content=upload(),
+            headers={"Content-Type": "text/csv"},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["correlation_id"] for r in results[:-1]] == [
+            f"stream-1_{i}" for i in range(5)
+        ]
+        assert "flag" in results[2]["error"]
+        assert results[0]["classification_result"] in ["NORMAL", "MALICIOUS"]
+        assert results[-1]["summary"] == {"processed": 5, "errors": 1, "successful": 4}
+        assert results[-1]["model_version"] == "injected"
+
+    @patch('src.api.routes.decisions.get_decision_queue')
+    def test_columnar_batch(self, mock_queue):
+        """Test that a columnar batch reports invalid rows by index."""
+        queue = mock_queue.return_value = AsyncMock()
+        features = {name: [value] * 4 for name, value in VALID_FEATURES.items()}
+        features["flag"][1] = "REJ"
+        features["same_srv_rate"][3] = 1.5
+        request = {"features": features, "correlation_id": "columnar-1"}
+
+        response = self.client.post("/decisions/batch/columnar", json=request)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["summary"] == {"processed": 4, "errors": 2, "successful": 2}
+        errors = {r["correlation_id"]: r["error"] for r in data["report"] if "error" in r}
+        assert list(errors) == ["columnar-1_1", "columnar-1_3"]
+        assert "flag" in errors["columnar-1_1"]
+        assert "same_srv_rate" in errors["columnar-1_3"]
+        saved = queue.put.call_args.args[0]
+        assert [row["flag"] for row in saved] == ["S0", "S0"]
+
+    def test_columnar_batch_rejects_ragged_columns(self):
+        """Test that columns of different lengths are rejected up front."""
+        features = {name: [value] * 2 for name, value in VALID_FEATURES.items()}
+        features["count"].append(1)
+        request = {"features": features, "correlation_id": "columnar-2"}
+
+        response = self.client.post("/decisions/batch/columnar", json=request)
+
+        assert response.status_code == 422
+
+    def test_arrow_batch_returns_arrow(self):
+        """Test that an Arrow stream body is scored and answered as Arrow."""
+        data = pd.DataFrame([VALID_FEATURES] * 3)
+        data.loc[1, "serror_rate"] = 2.0
+        sink = pa.BufferOutputStream()
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+
+        response = self.client.post(
+            "/decisions/batch/arrow",
+            params={"correlation_id": "arrow-1"},
+            content=sink.getvalue().to_pybytes(),
+            headers={
+                "Content-Type": "application/vnd.apache.arrow.stream",
+                "Accept": "application/vnd.apache.arrow.stream",
+            },
+        )
+
+        assert response.status_code == 200
+        result = pa.ipc.open_stream(response.content).read_all()
+        assert result.column("prediction").to_pylist()[1] == -1
+        assert "serror_rate" in result.column("error").to_pylist()[1]
+        assert result.column("error").null_count == 2
+        assert result.schema.metadata[b"errors"] == b"1"
+        assert result.schema.metadata[b"correlation_id"] == b"arrow-1"
+
+    def test_parquet_batch_returns_json(self):
+        """Test that a Parquet body is answered with a BatchDecisionResponse."""
+        buffer = pa.BufferOutputStream()
+        data = pd.DataFrame([VALID_FEATURES, {**VALID_FEATURES, "flag": "SF"}])
+        data.to_parquet(buffer)
+
+        response = self.client.post(
+            "/decisions/batch/arrow",
+            params={"correlation_id": "parquet-1"},
+            content=buffer.getvalue().to_pybytes(),
+            headers={"Content-Type": "application/vnd.apache.parquet"},
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["summary"] == {"processed": 2, "errors": 0, "successful": 2}
+        assert data["report"][1]["correlation_id"] == "parquet-1_1"
+
+    def test_arrow_batch_rejects_other_media_types(self):
+        """Test that the Arrow route rejects bodies it cannot decode."""
+        response = self.client.post(
+            "/decisions/batch/arrow",
+            params={"correlation_id": "arrow-2"},
+            content=b"{}",
+            headers={"Content-Type": "application/json"},
+        )
+
+        assert response.status_code == 415
+
+
+class TestBatchDecisionsRouteInProcesses(TestBatchDecisionsRoute):
+    """Run the batch route tests with a process executor."""
+
+    def setup_method(self):
+        """Setup test environment with inference in a worker process."""
+        super().setup_method()
+        self.executor = InferenceExecutor(kind="process", max_workers=1)
+        self.patcher = patch("src.api.routes.decisions.executor", self.executor)
+        self.patcher.start()
+
+    def teardown_method(self):
+        """Stop the worker process and restore the executor."""
+        self.patcher.stop()
+        self.executor.shutdown()
+        super().teardown_method()
+
+
 if __name__ == "__main__":
     pytest.main([__file__]) 
\ No newline at end of file
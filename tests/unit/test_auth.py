@@ -1,9 +1,27 @@
-from unittest.mock import Mock, patch
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, Mock, patch
 
+import jwt
 import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
 
+from src.api.auth import verify_credentials
+from src.core.config.supabaseconfig import SupabaseSettings
+from src.core.supabaseclient import get_current_user
+from src.core.tokenverifier import (
+    SigningKeyUnavailableError,
+    TokenVerificationError,
+    TokenVerifier,
+    VerifiedTokenCache,
+)
 from src.ui.unified_app import UnifiedApp
 
+SECRET = 'test-jwt-secret-with-at-least-32-characters'
+
 
 class TestUnifiedApp:
     """Unit tests for UnifiedApp class"""
@@ -121,5 +139,188 @@ class TestAuthAPI:
         assert "Błąd podczas logowania" in error_msg
         assert auth_data is None
 
+class TestTokenVerifier:
+    """Unit tests for local access token verification"""
+
+    @staticmethod
+    def claims(**overrides):
+        claims = {'sub': 'user-1', 'aud': 'authenticated', 'exp': int(time.time()) + 3600}
+        claims.update(overrides)
+        return claims
+
+    def test_verifies_hmac_token(self):
+        verifier = TokenVerifier(jwt_secret=SECRET)
+        token = jwt.encode(self.claims(), SECRET, algorithm='HS256')
+
+        assert verifier.verify(token)['sub'] == 'user-1'
+        assert verifier.stats()['verified'] == 1
+
+    @pytest.mark.parametrize('claims, key', [
+        ({'exp': int(time.time()) - 60}, SECRET),
+        ({'aud': 'anon'}, SECRET),
+        ({}, 'another-secret-with-at-least-32-characters'),
+    ])
+    def test_rejects_invalid_tokens(self, claims, key):
+        verifier = TokenVerifier(jwt_secret=SECRET)
+        token = jwt.encode(self.claims(**claims), key, algorithm='HS256')
+
+        with pytest.raises(TokenVerificationError):
+            verifier.verify(token)
+        assert verifier.stats()['rejected'] == 1
+
+    def test_requires_subject(self):
+        claims = self.claims()
+        del claims['sub']
+        token = jwt.encode(claims, SECRET, algorithm='HS256')
+
+        with pytest.raises(TokenVerificationError):
+            TokenVerifier(jwt_secret=SECRET).verify(token)
+
+    def test_verifies_token_signed_with_jwks_key(self):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+        jwk.update({'kid': 'key-1', 'alg': 'RS256', 'use': 'sig'})
+        verifier = TokenVerifier()
+
+        assert verifier.load_jwks({'keys': [jwk]}) == 1
+        token = jwt.encode(
+            self.claims(), private_key, algorithm='RS256', headers={'kid': 'key-1'}
+        )
+        assert verifier.verify(token)['sub'] == 'user-1'
+
+        unknown = jwt.encode(
+            self.claims(), private_key, algorithm='RS256', headers={'kid': 'key-2'}
+        )
+        with pytest.raises(SigningKeyUnavailableError):
+            verifier.verify(unknown)
+
+    def test_unknown_key_falls_back_to_supabase_when_enabled(self):
+        token = jwt.encode(self.claims(), SECRET, algorithm='HS256')
+        introspected = {'sub': 'user-1', 'email': 'test@example.com'}
+
+        verifier = TokenVerifier(remote_fallback=True)
+        with patch.object(verifier, 'introspect', AsyncMock(return_value=introspected)):
+            assert asyncio.run(verifier.authenticate(token)) == introspected
+
+        verifier = TokenVerifier()
+        with patch.object(verifier, 'introspect', AsyncMock()) as introspect:
+            with pytest.raises(SigningKeyUnavailableError):
+                asyncio.run(verifier.authenticate(token))
+            introspect.assert_not_called()
+
+    def test_hmac_tokens_are_rejected_without_a_secret(self, caplog):
+        # The local development stack's secret is public
+        public_secret = 'super-secret-jwt-token-with-at-least-32-characters-long'
+        token = jwt.encode(self.claims(), public_secret, algorithm='HS256')
+        verifier = TokenVerifier(jwt_secret=SupabaseSettings().SUPABASE_JWT_SECRET)
+
+        with pytest.raises(SigningKeyUnavailableError):
+            asyncio.run(verifier.authenticate(token))
+        verifier.start()
+        assert 'every access token will be rejected' in caplog.text
+
+    def test_invalid_token_is_not_introspected(self):
+        verifier = TokenVerifier(jwt_secret=SECRET, remote_fallback=True)
+        token = jwt.encode(self.claims(aud='anon'), SECRET, algorithm='HS256')
+
+        with patch.object(verifier, 'introspect', AsyncMock()) as introspect:
+            with pytest.raises(TokenVerificationError):
+                asyncio.run(verifier.authenticate(token))
+            introspect.assert_not_called()
+
+    def test_verify_credentials(self):
+        verifier = TokenVerifier(jwt_secret=SECRET)
+        valid = jwt.encode(self.claims(), SECRET, algorithm='HS256')
+
+        with patch('src.api.auth.get_token_verifier', return_value=verifier):
+            credentials = HTTPAuthorizationCredentials(scheme='Bearer', credentials=valid)
+            assert asyncio.run(verify_credentials(credentials)) == 'user-1'
+
+            credentials = HTTPAuthorizationCredentials(scheme='Bearer', credentials='not-a-jwt')
+            with pytest.raises(HTTPException) as exc_info:
+                asyncio.run(verify_credentials(credentials))
+        assert exc_info.value.status_code == 401
+        assert exc_info.value.headers == {'WWW-Authenticate': 'Bearer'}
+
+
+class TestVerifiedTokenCache:
+    """Unit tests for the cache of verified tokens"""
+
+    def test_entries_expire_at_exp(self):
+        cache = VerifiedTokenCache()
+        cache.put('fresh', {'sub': 'user-1'}, time.time() + 60)
+        cache.put('stale', {'sub': 'user-2'}, time.time() + 60)
+
+        with patch('src.core.tokenverifier.time.time', return_value=time.time() + 61):
+            assert cache.get('stale') is None
+        assert cache.get('fresh') == {'sub': 'user-1'}
+        assert cache.stats()['entries'] == 1
+
+    def test_evicts_least_recently_used(self):
+        cache = VerifiedTokenCache(max_entries=2)
+        expires_at = time.time() + 60
+        cache.put('a', {'sub': 'a'}, expires_at)
+        cache.put('b', {'sub': 'b'}, expires_at)
+        cache.get('a')
+        cache.put('c', {'sub': 'c'}, expires_at)
+
+        assert cache.get('b') is None
+        assert cache.get('a') == {'sub': 'a'}
+        assert cache.stats()['evictions'] == 1
+
+    def test_keys_are_token_digests(self):
+        cache = VerifiedTokenCache()
+        cache.put('secret-token', {'sub': 'user-1'}, time.time() + 60)
+
+        assert 'secret-token' not in cache._entries
+        assert VerifiedTokenCache.digest('secret-token') in cache._entries
+
+    def test_repeated_token_skips_decoding(self):
+        verifier = TokenVerifier(jwt_secret=SECRET)
+        token = jwt.encode(TestTokenVerifier.claims(), SECRET, algorithm='HS256')
+        verifier.verify(token)
+
+        with patch('src.core.tokenverifier.jwt.decode') as decode:
+            assert verifier.verify(token)['sub'] == 'user-1'
+            decode.assert_not_called()
+        assert verifier.stats()['cache']['hits'] == 1
+
+    def test_introspected_token_is_cached(self):
+        verifier = TokenVerifier(remote_fallback=True)
+        token = jwt.encode(TestTokenVerifier.claims(), SECRET, algorithm='HS256')
+
+        with patch.object(verifier, 'introspect', AsyncMock(return_value={'sub': 'user-1'})) as introspect:
+            asyncio.run(verifier.authenticate(token))
+            asyncio.run(verifier.authenticate(token))
+        assert introspect.await_count == 1
+
+    def test_disabled_cache(self):
+        verifier = TokenVerifier(jwt_secret=SECRET, cache_size=0)
+        token = jwt.encode(TestTokenVerifier.claims(), SECRET, algorithm='HS256')
+        verifier.verify(token)
+        verifier.verify(token)
+
+        assert verifier.stats()['verified'] == 2
+        assert verifier.stats()['cache']['entries'] == 0
+
+    def test_auth_dependencies_share_the_verifier(self):
+        verifier = TokenVerifier(jwt_secret=SECRET)
+        token = jwt.encode(
+            TestTokenVerifier.claims(email='test@example.com'), SECRET, algorithm='HS256'
+        )
+        credentials = HTTPAuthorizationCredentials(scheme='Bearer', credentials=token)
+
+        with patch('src.api.auth.get_token_verifier', return_value=verifier), \
+                patch('src.core.supabaseclient.get_token_verifier', return_value=verifier), \
+                patch('src.core.supabaseclient.SupabaseClient') as client_class:
+            assert asyncio.run(verify_credentials(credentials)) == 'user-1'
+            user = asyncio.run(get_current_user(credentials))
+            client_class.assert_not_called()
+
+        assert user == {'user': {'id': 'user-1', 'email': 'test@example.com'}}
+        assert verifier.stats()['verified'] == 1
+        assert verifier.stats()['cache']['hits'] == 1
+
+
 if __name__ == "__main__":
     pytest.main([__file__]) 
\ No newline at end of file
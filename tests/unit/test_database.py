@@ -2,12 +2,126 @@
 Unit tests for database operations and Supabase integration.
 """
 
+import asyncio
 from datetime import datetime
 from unittest.mock import Mock, patch
 
+import httpx
 import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
 
+from src.core.decisionqueue import DecisionQueue, DecisionQueueFullError
 from src.core.supabaseclient import get_supabase_client
+from src.core.supabasehttp import (
+    AsyncSupabaseClient,
+    BulkInsertResult,
+    build_decision_record,
+)
+from src.core.tokenverifier import TokenVerificationError, TokenVerifier
+
+TRAFFIC = {
+    "logged_in": True,
+    "count": 45,
+    "serror_rate": 0.05,
+    "srv_serror_rate": 0.04,
+    "same_srv_rate": 0.88,
+    "dst_host_srv_count": 110,
+    "dst_host_same_srv_rate": 0.99,
+    "dst_host_serror_rate": 0.02,
+    "dst_host_srv_serror_rate": 0.01,
+    "flag": "S0",
+}
+
+
+def make_stub_supabase():
+    """Stub GoTrue and PostgREST server keeping its tables in memory."""
+    stub = FastAPI()
+    stub.state.tables = {"decisions": [], "profiles": [{"id": "user-1", "role": "admin"}]}
+    stub.state.users = {"test@example.com": "password123"}
+    stub.state.requests = []
+
+    @stub.middleware("http")
+    async def record(request: Request, call_next):
+        stub.state.requests.append((request.method, request.url.path, dict(request.headers)))
+        return await call_next(request)
+
+    @stub.post("/auth/v1/signup")
+    async def signup(body: dict):
+        if body["email"] in stub.state.users:
+            return JSONResponse({"msg": "User already registered"}, status_code=422)
+        stub.state.users[body["email"]] = body["password"]
+        return {"id": "user-2", "email": body["email"]}
+
+    @stub.post("/auth/v1/token")
+    async def token(grant_type: str, body: dict):
+        if stub.state.users.get(body["email"]) != body["password"]:
+            return JSONResponse({"error_description": "Invalid login credentials"}, status_code=400)
+        return {"access_token": "token-1", "user": {"id": "user-1", "email": body["email"]}}
+
+    @stub.get("/auth/v1/user")
+    async def user(request: Request):
+        if request.headers["authorization"] != "Bearer token-1":
+            return JSONResponse({"msg": "invalid JWT"}, status_code=401)
+        return {"id": "user-1", "email": "test@example.com", "created_at": "2024-01-01T00:00:00Z"}
+
+    def matches(row, params):
+        return all(
+            str(row.get(column)) == value[3:]
+            for column, value in params.items()
+            if value.startswith("eq.")
+        )
+
+    @stub.get("/rest/v1/{table}")
+    async def select(table: str, request: Request):
+        params = dict(request.query_params)
+        rows = [row for row in stub.state.tables[table] if matches(row, params)]
+        if "order" in params:
+            column, direction = params["order"].split(".")
+            rows.sort(key=lambda row: row[column], reverse=direction == "desc")
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", len(rows)))
+        rows = rows[offset:offset + limit]
+        if request.headers.get("accept") == "application/vnd.pgrst.object+json":
+            if len(rows) != 1:
+                return JSONResponse({"message": "JSON object requested, multiple (or no) rows returned"}, status_code=406)
+            return rows[0]
+        return rows
+
+    @stub.post("/rest/v1/{table}")
+    async def insert(table: str, request: Request):
+        body = await request.json()
+        rows = body if isinstance(body, list) else [body]
+        for row in rows:
+            if row.get("flag") == "BAD":
+                return JSONResponse({"message": "invalid input value for flag"}, status_code=400)
+        table_rows = stub.state.tables[table]
+        for row in rows:
+            table_rows.append({"id": len(table_rows) + 1, "timestamp": len(table_rows), **row})
+        return JSONResponse(table_rows[-len(rows):], status_code=201)
+
+    @stub.patch("/rest/v1/{table}")
+    async def update(table: str, request: Request):
+        params = dict(request.query_params)
+        body = await request.json()
+        rows = [row for row in stub.state.tables[table] if matches(row, params)]
+        for row in rows:
+            row.update(body)
+        return rows
+
+    return stub
+
+
+@pytest.fixture
+def stub_supabase():
+    stub = make_stub_supabase()
+    client = AsyncSupabaseClient(
+        "http://supabase.test",
+        anon_key="anon-key",
+        service_key="service-key",
+        transport=httpx.ASGITransport(app=stub),
+    )
+    return stub, client
 
 
 class TestSupabaseClient:
@@ -105,6 +219,278 @@ class TestSupabaseClient:
         with pytest.raises(Exception, match="Database error"):
             self.mock_client.table("decisions").insert({}).execute()
 
+class TestAsyncSupabaseClient:
+    """Test suite for the async Supabase client against a stub server."""
+
+    def test_sign_up_and_sign_in(self, stub_supabase):
+        stub, client = stub_supabase
+
+        async def scenario():
+            registered = await client.sign_up("new@example.com", "password456")
+            session = await client.sign_in("test@example.com", "password123")
+            with pytest.raises(HTTPException) as exc_info:
+                await client.sign_in("test@example.com", "wrong")
+            return registered, session, exc_info.value
+
+        registered, session, error = asyncio.run(scenario())
+
+        assert registered == {"user": {"id": "user-2", "email": "new@example.com"}, "session": {"access_token": None}}
+        assert session["session"]["access_token"] == "token-1"
+        assert error.status_code == 401
+        # Auth requests are sent with the anon key
+        assert all(headers["apikey"] == "anon-key" for _, _, headers in stub.state.requests)
+
+    def test_record_and_query_decisions(self, stub_supabase):
+        stub, client = stub_supabase
+
+        async def scenario():
+            await client.record_ml_decision("user-1", TRAFFIC, "normal", model_version="v1")
+            await client.record_ml_decision("user-1", {**TRAFFIC, "flag": "SF"}, "malicious")
+            await client.record_ml_decision("user-2", TRAFFIC, "normal", source_type="batch")
+            return (
+                await client.query_decisions(user_id="user-1"),
+                await client.query_decisions(classification_result="NORMAL", descending=False, limit=1),
+            )
+
+        history, normal = asyncio.run(scenario())
+
+        assert [row["flag"] for row in history] == ["SF", "S0"]
+        assert history[1]["model_version"] == "v1"
+        assert len(normal) == 1 and normal[0]["user_id"] == "user-1"
+        assert stub.state.requests[0][2]["authorization"] == "Bearer service-key"
+        assert stub.state.requests[0][2]["prefer"] == "return=representation"
+
+    def test_bulk_insert_in_chunks(self, stub_supabase):
+        stub, client = stub_supabase
+        records = [build_decision_record("user-1", TRAFFIC, "normal", source_type="batch") for _ in range(5)]
+        records[2]["flag"] = "BAD"
+
+        outcome = asyncio.run(client.record_ml_decisions(records, chunk_rows=2))
+
+        # One request per chunk, and the failing chunk does not stop the others
+        assert len(stub.state.requests) == 3
+        assert outcome.summary() == {"inserted": 3, "failed": 2, "chunks": 3, "failed_chunks": 1}
+        assert outcome.failures == [
+            {"chunk": 1, "start": 2, "stop": 4, "rows": 2, "error": "invalid input value for flag"}
+        ]
+        saved = stub.state.tables["decisions"]
+        assert {row["correlation_id"] for row in saved} == {
+            records[i]["correlation_id"] for i in (0, 1, 4)
+        }
+        headers = stub.state.requests[0][2]
+        assert headers["prefer"] == "return=minimal,missing=default"
+
+    def test_bulk_insert_uses_default_chunk_size(self, stub_supabase):
+        stub, client = stub_supabase
+        client.insert_chunk_rows = 1000
+        records = [build_decision_record("user-1", TRAFFIC, "normal") for _ in range(2500)]
+
+        outcome = asyncio.run(client.record_ml_decisions(records))
+
+        assert [chunk["rows"] for chunk in outcome.chunks] == [1000, 1000, 500]
+        assert len(stub.state.tables["decisions"]) == 2500
+
+    def test_profiles(self, stub_supabase):
+        stub, client = stub_supabase
+
+        async def scenario():
+            await client.update_user_profile("user-1", {"role": "user"}, "token-1")
+            profile = await client.get_user_profile("user-1", "token-1")
+            with pytest.raises(HTTPException) as exc_info:
+                await client.get_user_profile("missing", "token-1")
+            return profile, exc_info.value
+
+        profile, error = asyncio.run(scenario())
+
+        assert profile == {"id": "user-1", "role": "user"}
+        assert error.status_code == 400
+        assert "no) rows" in error.detail
+        # Profiles go through row-level security as the caller, never the service role
+        for _, _, headers in stub.state.requests:
+            assert headers["apikey"] == "anon-key"
+            assert headers["authorization"] == "Bearer token-1"
+
+    def test_requests_share_one_pool(self, stub_supabase):
+        _, client = stub_supabase
+
+        async def scenario():
+            await client.get_user("token-1")
+            pool = client._http()
+            await asyncio.gather(*(client.query_decisions() for _ in range(5)))
+            same_pool = client._http() is pool
+            await client.close()
+            return same_pool, pool.is_closed
+
+        same_pool, closed = asyncio.run(scenario())
+
+        assert same_pool and closed
+        assert client.stats()["requests"] == 6
+
+    def test_unreachable_server(self):
+        client = AsyncSupabaseClient(
+            "http://127.0.0.1:9", anon_key="anon-key", service_key="service-key", connect_timeout_s=1.0
+        )
+
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(client.get_user_decisions("user-1"))
+        assert exc_info.value.status_code == 503
+
+    def test_token_introspection(self, stub_supabase):
+        _, client = stub_supabase
+        verifier = TokenVerifier(remote_fallback=True, supabase=client)
+
+        assert asyncio.run(verifier.introspect("token-1")) == {"sub": "user-1", "email": "test@example.com"}
+        with pytest.raises(TokenVerificationError):
+            asyncio.run(verifier.introspect("token-2"))
+
+class RecordingWriter:
+    """Bulk writer recording its batches, optionally failing or held back"""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+        self.release = None
+
+    async def __call__(self, records):
+        if self.release is not None:
+            await self.release.wait()
+        self.batches.append(list(records))
+        error = "database unavailable" if self.fail else None
+        return BulkInsertResult([{"chunk": 0, "start": 0, "stop": len(records), "rows": len(records), "error": error}])
+
+    @property
+    def written(self):
+        return [record["i"] for batch in self.batches for record in batch]
+
+
+def rows(*indices):
+    return [{"i": i} for i in indices]
+
+
+class TestDecisionQueue:
+    """Test suite for the write-behind decision queue."""
+
+    def test_flushes_by_size_then_on_stop(self):
+        writer = RecordingWriter()
+        queue = DecisionQueue(writer, batch_size=3, flush_interval_s=60)
+
+        async def scenario():
+            await queue.put(rows(*range(7)))
+            await asyncio.sleep(0.05)
+            flushed_by_size = list(writer.written)
+            await queue.stop()
+            return flushed_by_size
+
+        flushed_by_size = asyncio.run(scenario())
+
+        assert flushed_by_size == list(range(6))
+        assert [len(batch) for batch in writer.batches] == [3, 3, 1]
+        stats = queue.get_stats()
+        assert stats["depth"] == 0 and stats["written"] == 7
+        assert stats["flush_latency_ms"]["count"] == 3
+
+    def test_flushes_by_interval(self):
+        writer = RecordingWriter()
+        queue = DecisionQueue(writer, batch_size=100, flush_interval_s=0.02)
+
+        async def scenario():
+            await queue.put(rows(0))
+            await asyncio.sleep(0.2)
+            written = list(writer.written)
+            await queue.stop()
+            return written
+
+        assert asyncio.run(scenario()) == [0]
+
+    def test_drop_oldest(self):
+        writer = RecordingWriter()
+        queue = DecisionQueue(writer, max_queue_depth=3, batch_size=100, flush_interval_s=60, overflow="drop_oldest")
+
+        async def scenario():
+            await queue.put(rows(*range(5)))
+            await queue.stop()
+
+        asyncio.run(scenario())
+
+        assert writer.written == [2, 3, 4]
+        assert queue.get_stats()["dropped"] == 2
+
+    def test_block_waits_for_room_then_times_out(self):
+        writer = RecordingWriter()
+        queue = DecisionQueue(writer, max_queue_depth=2, batch_size=100, flush_interval_s=60, put_timeout_s=0.05)
+
+        async def scenario():
+            writer.release = asyncio.Event()
+            await queue.put(rows(0, 1))
+            # Waits until the flusher takes the queued records
+            await queue.put(rows(2))
+            await queue.put(rows(3))
+            with pytest.raises(DecisionQueueFullError):
+                await queue.put(rows(4))
+            writer.release.set()
+            await queue.stop()
+
+        asyncio.run(scenario())
+
+        assert writer.written == [0, 1, 2, 3]
+        assert queue.get_stats()["dropped"] == 1
+        assert queue.get_stats()["max_depth_seen"] == 2
+
+    def test_spill_survives_restart(self, tmp_path):
+        spill_path = tmp_path / "decisions.jsonl"
+        writer = RecordingWriter()
+        queue = DecisionQueue(writer, max_queue_depth=2, batch_size=100, flush_interval_s=60, overflow="spill", spill_path=str(spill_path))
+
+        async def first_run():
+            await queue.put(rows(*range(5)))
+            await queue.stop()
+
+        asyncio.run(first_run())
+        assert writer.written == [0, 1]
+        assert queue.get_stats()["spilled"] == 3
+        assert len(spill_path.read_text().splitlines()) == 3
+
+        restarted = DecisionQueue(
+            writer, max_queue_depth=2, batch_size=100, flush_interval_s=0.02, overflow="spill",
+            spill_path=str(spill_path), replay_interval_s=0.0,
+        )
+
+        async def second_run():
+            await restarted.start()
+            await asyncio.sleep(0.2)
+            await restarted.stop()
+
+        asyncio.run(second_run())
+
+        assert sorted(writer.written) == list(range(5))
+        assert restarted.get_stats()["replayed"] == 3
+        assert restarted.get_stats()["spill_bytes"] == 0
+
+    def test_failed_writes_are_retried_then_given_up(self, tmp_path):
+        writer = RecordingWriter(fail=True)
+        queue = DecisionQueue(
+            writer, batch_size=100, flush_interval_s=0.01, spill_path=str(tmp_path / "spill.jsonl"),
+            max_attempts=3, replay_interval_s=0.0,
+        )
+
+        async def scenario():
+            await queue.put(rows(0, 1))
+            await asyncio.sleep(0.3)
+            await queue.stop()
+
+        asyncio.run(scenario())
+
+        assert writer.written == [0, 1] * 3
+        stats = queue.get_stats()
+        assert stats["failed"] == 2 and stats["written"] == 0
+        assert stats["spill_bytes"] == 0
+
+    def test_rejects_invalid_configuration(self):
+        with pytest.raises(ValueError):
+            DecisionQueue(RecordingWriter(), overflow="discard")
+        with pytest.raises(ValueError):
+            DecisionQueue(RecordingWriter(), overflow="spill")
+
 class TestRedisClient:
     """Test suite for Redis cache operations."""
     
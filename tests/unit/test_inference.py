@@ -0,0 +1,1191 @@
+"""
+Unit tests for the inference engine.
+"""
+
+import asyncio
+import pickle
+import threading
+import time
+from unittest.mock import patch
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from src.api.schemas import (
+    TRAFFIC_FEATURES,
+    NetworkTrafficFeatures,
+    validate_traffic_frame,
+)
+from src.ml.inference.arrow import (
+    ARROW_STREAM_MEDIA_TYPE,
+    predictions_to_arrow,
+    read_table,
+    table_to_frame,
+)
+from src.ml.inference.batch import BatchScorer, score_batch
+from src.ml.inference.compiled import compile_model
+from src.ml.inference.encoder import FeatureVectorEncoder
+from src.ml.inference.executor import (
+    InferenceExecutor,
+    InferenceOverloadedError,
+    InferenceTimeoutError,
+)
+from src.ml.inference.manager import (
+    ModelManager,
+    ModelVersion,
+    ModelVersionNotFoundError,
+    ReloadInProgressError,
+)
+from src.ml.inference.microbatch import MicroBatcher
+from src.ml.inference.registry import ModelRegistry
+from src.ml.inference.shadow import ShadowScorer
+from src.ml.inference.sharded import (
+    ScorerClosedError,
+    ScoringWorkerPool,
+    ShardedScorer,
+)
+from src.ml.inference.stream import KDD_COLUMNS, CsvChunkReader
+from src.ml.pipeline.preprocessing.preprocessor import (
+    ColumnTransformerWrapper,
+    DataPreprocessor,
+)
+from src.ml.pipeline.score import score_file
+
+
+def make_traffic_data(n_rows: int = 40, seed: int = 0) -> pd.DataFrame:
+    """Build a random but valid traffic DataFrame."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "logged_in": rng.integers(0, 2, n_rows).astype(bool),
+            "count": rng.integers(0, 500, n_rows),
+            "serror_rate": rng.random(n_rows),
+            "srv_serror_rate": rng.random(n_rows),
+            "same_srv_rate": rng.random(n_rows),
+            "dst_host_srv_count": rng.integers(0, 255, n_rows),
+            "dst_host_same_srv_rate": rng.random(n_rows),
+            "dst_host_serror_rate": rng.random(n_rows),
+            "dst_host_srv_serror_rate": rng.random(n_rows),
+            "flag": rng.choice(["S0", "SF"], n_rows),
+        }
+    )
+
+
+@pytest.fixture
+def fitted_pipeline():
+    """Provide a fitted preprocessor and logistic regression model."""
+    data = make_traffic_data()
+    labels = (data["flag"] == "S0").astype(int).to_numpy()
+
+    preprocessor = DataPreprocessor()
+    X = preprocessor.fit_transform(data)
+    model = LogisticRegression(max_iter=1000).fit(X, labels)
+    return model, preprocessor, data
+
+
+class TestBatchScorer:
+    """Unit tests for vectorized batch scoring."""
+
+    def test_matches_row_by_row_predictions(self, fitted_pipeline):
+        """Test that one-pass scoring matches per-row scoring"""
+        model, preprocessor, data = fitted_pipeline
+        records = data.to_dict(orient="records")
+
+        batch_score = score_batch(model, preprocessor, records)
+
+        expected = [
+            model.predict(preprocessor.transform(pd.DataFrame([r])))[0] for r in records
+        ]
+        np.testing.assert_array_equal(batch_score.predictions, expected)
+        assert batch_score.errors == {}
+        assert batch_score.successful == len(records)
+
+    def test_single_transform_and_predict_call(self, fitted_pipeline):
+        """Test that a clean batch is transformed and predicted once"""
+        model, preprocessor, data = fitted_pipeline
+        scorer = BatchScorer(model, preprocessor, use_compiled=False)
+
+        calls = []
+        original_transform = preprocessor.transform
+
+        def counting_transform(X):
+            calls.append(len(X))
+            return original_transform(X)
+
+        preprocessor.transform = counting_transform
+        scorer.score(data.to_dict(orient="records"))
+
+        assert calls == [len(data)]
+
+    def test_item_level_errors(self, fitted_pipeline):
+        """Test that a bad record is reported without failing the batch"""
+        model, preprocessor, data = fitted_pipeline
+        records = data.head(5).to_dict(orient="records")
+        del records[2]["count"]
+
+        batch_score = score_batch(model, preprocessor, records)
+
+        assert list(batch_score.errors) == [2]
+        assert batch_score.predictions[2] == -1
+        assert batch_score.successful == 4
+        assert np.all(np.isin(np.delete(batch_score.predictions, 2), [0, 1]))
+
+    def test_empty_batch(self, fitted_pipeline):
+        """Test scoring an empty batch"""
+        model, preprocessor, _ = fitted_pipeline
+
+        batch_score = score_batch(model, preprocessor, [])
+
+        assert len(batch_score) == 0
+        assert batch_score.errors == {}
+
+    def test_score_frame_matches_records(self, fitted_pipeline):
+        """Test that scoring a DataFrame matches scoring its records"""
+        model, preprocessor, data = fitted_pipeline
+        scorer = BatchScorer(model, preprocessor)
+
+        batch_score = scorer.score_frame(data)
+
+        np.testing.assert_array_equal(
+            batch_score.predictions,
+            scorer.score(data.to_dict(orient="records")).predictions,
+        )
+        assert batch_score.errors == {}
+
+
+class TestCompiledLinearModel:
+    """Unit tests for the fused linear inference kernel."""
+
+    def test_matches_sklearn_data_preprocessor(self, fitted_pipeline):
+        """Test that the compiled kernel matches the sklearn path"""
+        model, preprocessor, _ = fitted_pipeline
+        data = make_traffic_data(n_rows=500, seed=1)
+
+        compiled = compile_model(model, preprocessor)
+
+        assert compiled is not None
+        expected = model.decision_function(preprocessor.transform(data))
+        np.testing.assert_allclose(
+            compiled.decision_function(compiled.encoder.encode_frame(data)),
+            expected,
+            rtol=1e-9,
+            atol=1e-9,
+        )
+        np.testing.assert_array_equal(
+            compiled.predict(data), model.predict(preprocessor.transform(data))
+        )
+
+    def test_matches_sklearn_column_transformer_wrapper(self):
+        """Test folding of the exported artifact layout (drop='first' encoder)"""
+        data = make_traffic_data(n_rows=200, seed=2)
+        numerical = [f for f in data.columns if f not in ("logged_in", "flag")]
+        column_transformer = ColumnTransformer(
+            [
+                ("num", StandardScaler(), numerical),
+                (
+                    "cat",
+                    OneHotEncoder(drop="first", sparse_output=False),
+                    ["logged_in", "flag"],
+                ),
+            ]
+        ).fit(data)
+        preprocessor = ColumnTransformerWrapper(column_transformer)
+        labels = (data["serror_rate"] > 0.5).astype(int)
+        model = LogisticRegression().fit(preprocessor.transform(data), labels)
+
+        compiled = compile_model(model, preprocessor)
+
+        assert compiled is not None
+        np.testing.assert_allclose(
+            compiled.decision_function(compiled.encoder.encode_frame(data)),
+            model.decision_function(preprocessor.transform(data)),
+            rtol=1e-9,
+            atol=1e-9,
+        )
+
+    def test_unsupported_model_falls_back(self, fitted_pipeline):
+        """Test that non-linear models are left to the sklearn path"""
+        _, preprocessor, data = fitted_pipeline
+        X = preprocessor.transform(data)
+        tree = DecisionTreeClassifier().fit(X, (data["flag"] == "S0").astype(int))
+
+        assert compile_model(tree, preprocessor) is None
+        scorer = BatchScorer(tree, preprocessor)
+        assert scorer.compiled is None
+        np.testing.assert_array_equal(scorer.predict_frame(data), tree.predict(X))
+
+    def test_unknown_category_rejected(self):
+        """Test that handle_unknown='error' is preserved by the kernel"""
+        data = make_traffic_data(seed=3)
+        column_transformer = ColumnTransformer(
+            [
+                ("num", StandardScaler(), ["count"]),
+                ("cat", OneHotEncoder(sparse_output=False), ["flag"]),
+            ]
+        ).fit(data)
+        preprocessor = ColumnTransformerWrapper(column_transformer)
+        model = LogisticRegression().fit(
+            preprocessor.transform(data), (data["flag"] == "S0").astype(int)
+        )
+        compiled = compile_model(model, preprocessor)
+
+        with pytest.raises(ValueError):
+            compiled.encoder.encode_frame(data.assign(flag="REJ"))
+
+
+class TestFeatureVectorEncoder:
+    """Unit tests for the pandas-free feature encoder."""
+
+    def test_encodes_validated_features(self, fitted_pipeline):
+        """Test that a pydantic record encodes like its DataFrame row"""
+        _, preprocessor, data = fitted_pipeline
+        encoder = FeatureVectorEncoder.from_preprocessor(preprocessor)
+        record = data.iloc[0].to_dict()
+
+        row = encoder.encode(NetworkTrafficFeatures(**record))
+
+        assert row.shape == (1, encoder.n_columns)
+        assert row.dtype == np.float64
+        assert row.flags["C_CONTIGUOUS"]
+        np.testing.assert_array_equal(row, encoder.encode_frame(data.iloc[:1]))
+
+    def test_fixed_column_order(self, fitted_pipeline):
+        """Test that columns follow selected_features and fitted categories"""
+        _, preprocessor, _ = fitted_pipeline
+        encoder = FeatureVectorEncoder.from_preprocessor(preprocessor)
+
+        assert encoder.columns == preprocessor.numerical_features + [
+            "flag=S0",
+            "flag=SF",
+        ]
+
+    def test_float32_rows(self, fitted_pipeline):
+        """Test encoding into single precision rows"""
+        _, preprocessor, data = fitted_pipeline
+        encoder = FeatureVectorEncoder.from_preprocessor(preprocessor, dtype=np.float32)
+
+        rows = encoder.encode_records(data.to_dict(orient="records"))
+
+        assert rows.dtype == np.float32
+        assert rows.shape == (len(data), encoder.n_columns)
+
+    def test_transform_matches_preprocessor(self, fitted_pipeline):
+        """Test that replaying the preprocessor matches sklearn exactly"""
+        _, preprocessor, data = fitted_pipeline
+        encoder = FeatureVectorEncoder.from_preprocessor(preprocessor)
+
+        replayed = encoder.transform_encoded(
+            encoder.encode_records(data.to_dict(orient="records"))
+        )
+
+        np.testing.assert_array_equal(replayed, preprocessor.transform(data))
+
+    def test_scorer_paths_agree(self, fitted_pipeline):
+        """Test that the encoded path agrees with the DataFrame reference"""
+        model, preprocessor, data = fitted_pipeline
+        tree = DecisionTreeClassifier(random_state=0).fit(
+            preprocessor.transform(data), (data["serror_rate"] > 0.5).astype(int)
+        )
+        records = make_traffic_data(n_rows=200, seed=4).to_dict(orient="records")
+
+        for estimator in (model, tree):
+            scorer = BatchScorer(estimator, preprocessor)
+            np.testing.assert_array_equal(
+                scorer.predict_records(records),
+                scorer.predict_frame(pd.DataFrame(records)),
+            )
+            assert (
+                scorer.predict_one(records[0]) == scorer.predict_records(records[:1])[0]
+            )
+
+
+class TestMicroBatcher:
+    """Unit tests for the asyncio micro-batcher."""
+
+    def test_concurrent_requests_share_a_batch(self, fitted_pipeline):
+        """Test that concurrent submissions are scored as one matrix"""
+        model, preprocessor, data = fitted_pipeline
+        scorer = BatchScorer(model, preprocessor)
+        batch_sizes = []
+
+        def score_fn(records):
+            batch_sizes.append(len(records))
+            return scorer.score(records)
+
+        batcher = MicroBatcher(score_fn, max_batch_size=8, max_wait_ms=50)
+        records = data.head(20).to_dict(orient="records")
+
+        async def run():
+            # Prime the adaptive window with one request
+            await batcher.submit(records[0])
+            labels = await asyncio.gather(*(batcher.submit(r) for r in records))
+            await batcher.stop()
+            return labels
+
+        labels = asyncio.run(run())
+
+        np.testing.assert_array_equal(labels, scorer.predict_records(records))
+        assert max(batch_sizes) == 8
+        assert sum(batch_sizes) == 21
+        stats = batcher.get_stats()
+        assert stats["batch_size"]["count"] == len(batch_sizes)
+        assert stats["queue_wait_ms"]["count"] == 21
+        assert not stats["running"]
+
+    def test_item_errors_resolve_separately(self, fitted_pipeline):
+        """Test that one bad record fails only its own caller"""
+        model, preprocessor, data = fitted_pipeline
+        scorer = BatchScorer(model, preprocessor)
+        batcher = MicroBatcher(scorer.score, max_batch_size=4, max_wait_ms=50)
+        records = data.head(3).to_dict(orient="records")
+        del records[1]["count"]
+
+        async def run():
+            results = await asyncio.gather(
+                *(batcher.submit(r) for r in records), return_exceptions=True
+            )
+            await batcher.stop()
+            return results
+
+        results = asyncio.run(run())
+
+        assert isinstance(results[1], ValueError)
+        assert results[0] in (0, 1) and results[2] in (0, 1)
+
+
+class TestInferenceExecutor:
+    """Unit tests for the bounded inference executor."""
+
+    def test_runs_off_the_event_loop(self, fitted_pipeline):
+        """Test that scoring runs in a worker thread"""
+        model, preprocessor, data = fitted_pipeline
+        scorer = BatchScorer(model, preprocessor)
+        executor = InferenceExecutor(max_workers=2)
+        records = data.to_dict(orient="records")
+
+        async def run():
+            loop_thread = threading.get_ident()
+            worker_thread = await executor.run(threading.get_ident)
+            batch_score = await executor.run(scorer.score, records)
+            return loop_thread, worker_thread, batch_score
+
+        loop_thread, worker_thread, batch_score = asyncio.run(run())
+        executor.shutdown()
+
+        assert loop_thread != worker_thread
+        np.testing.assert_array_equal(
+            batch_score.predictions, scorer.predict_records(records)
+        )
+        assert executor.get_stats()["latency_ms"]["count"] == 2
+
+    def test_rejects_when_queue_full(self):
+        """Test that calls beyond the queue depth are rejected"""
+        executor = InferenceExecutor(max_workers=1, max_queue_depth=2)
+
+        async def run():
+            return await asyncio.gather(
+                *(executor.run(time.sleep, 0.05) for _ in range(3)),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(run())
+        executor.shutdown()
+
+        assert sum(isinstance(r, InferenceOverloadedError) for r in results) == 1
+        assert executor.get_stats()["rejected"] == 1
+        assert executor.depth == 0
+
+    def test_deadline(self):
+        """Test that a slow call times out for the awaiting caller"""
+        executor = InferenceExecutor(max_workers=1, timeout_s=0.01)
+
+        with pytest.raises(InferenceTimeoutError):
+            asyncio.run(executor.run(time.sleep, 0.2))
+        executor.shutdown()
+
+        assert executor.get_stats()["timed_out"] == 1
+
+    def test_process_pool(self):
+        """Test the process pool variant"""
+        executor = InferenceExecutor(kind="process", max_workers=1)
+
+        assert asyncio.run(executor.run(sum, [1, 2, 3])) == 6
+        executor.shutdown()
+
+
+class TestShardedScorer:
+    """Unit tests for scoring shards in worker processes."""
+
+    def test_compiled_model_shards(self, fitted_pipeline):
+        """Test that a compiled model scored across workers matches in-process"""
+        model, preprocessor, _ = fitted_pipeline
+        data = make_traffic_data(n_rows=400, seed=3)
+        records = data.to_dict(orient="records")
+        scorer = ShardedScorer(model, preprocessor, n_workers=2, min_shard_rows=100)
+        try:
+            batch_score = scorer.score(records)
+            stats = scorer.get_stats()
+        finally:
+            scorer.close()
+
+        np.testing.assert_array_equal(
+            batch_score.predictions,
+            BatchScorer(model, preprocessor).predict_records(records),
+        )
+        assert stats["sharded_batches"] == 1
+        assert stats["shards"] == 2
+        assert not scorer.running
+
+    def test_memory_mapped_model_shards(self, fitted_pipeline):
+        """Test that models which cannot be compiled are loaded by the workers"""
+        _, preprocessor, data = fitted_pipeline
+        labels = (data["count"] > 250).astype(int)
+        tree = DecisionTreeClassifier(random_state=0).fit(
+            preprocessor.transform(data), labels
+        )
+        records = make_traffic_data(n_rows=300, seed=4).to_dict(orient="records")
+        scorer = ShardedScorer(tree, preprocessor, n_workers=2, min_shard_rows=100)
+        assert scorer.compiled is None
+        try:
+            predictions = scorer.predict_records(records)
+        finally:
+            scorer.close()
+
+        np.testing.assert_array_equal(
+            predictions, BatchScorer(tree, preprocessor).predict_records(records)
+        )
+
+    def test_small_batch_scored_in_process(self, fitted_pipeline):
+        """Test that batches below the shard size do not start workers"""
+        model, preprocessor, data = fitted_pipeline
+        scorer = ShardedScorer(model, preprocessor, n_workers=2, min_shard_rows=100)
+
+        batch_score = scorer.score(data.to_dict(orient="records"))
+
+        assert batch_score.successful == len(data)
+        assert not scorer.running
+        assert scorer.get_stats()["sharded_batches"] == 0
+
+    def test_versions_share_one_pool(self, fitted_pipeline):
+        """Test that scorers of different versions share workers and shard frames"""
+        model, preprocessor, data = fitted_pipeline
+        labels = (data["count"] > 250).astype(int)
+        tree = DecisionTreeClassifier(random_state=0).fit(
+            preprocessor.transform(data), labels
+        )
+        frame = make_traffic_data(n_rows=300, seed=5)
+        pool = ScoringWorkerPool(n_workers=2)
+        scorers = [
+            ShardedScorer(m, preprocessor, min_shard_rows=100, pool=pool)
+            for m in (model, tree)
+        ]
+        try:
+            for scorer, m in zip(scorers, (model, tree)):
+                batch_score = scorer.score_frame(frame)
+                np.testing.assert_array_equal(
+                    batch_score.predictions,
+                    BatchScorer(m, preprocessor).predict_frame(frame),
+                )
+                assert scorer.get_stats()["sharded_batches"] == 1
+            assert pool.get_stats()["scorers"] == 2
+            scorers[0].close()
+            assert pool.running
+        finally:
+            scorers[1].close()
+        assert not pool.running
+
+    def test_closed_scorer_does_not_restart(self, fitted_pipeline):
+        """Test that a retired scorer raises instead of respawning workers"""
+        model, preprocessor, _ = fitted_pipeline
+        records = make_traffic_data(n_rows=300, seed=6).to_dict(orient="records")
+        pool = ScoringWorkerPool(n_workers=2)
+        scorer = ShardedScorer(model, preprocessor, min_shard_rows=100, pool=pool)
+        scorer.close()
+
+        with pytest.raises(ScorerClosedError):
+            scorer.predict_records(records)
+        with pytest.raises(ScorerClosedError):
+            scorer.score(records)
+        assert not pool.running
+
+    def test_pickled_copy_scores_in_process(self, fitted_pipeline):
+        """Test that a copy sent to a process executor does not shard"""
+        model, preprocessor, _ = fitted_pipeline
+        records = make_traffic_data(n_rows=300, seed=7).to_dict(orient="records")
+        scorer = ShardedScorer(model, preprocessor, n_workers=2, min_shard_rows=100)
+
+        copy = pickle.loads(pickle.dumps(scorer))
+
+        np.testing.assert_array_equal(
+            copy.predict_records(records),
+            BatchScorer(model, preprocessor).predict_records(records),
+        )
+        assert not scorer.running and not copy.running
+
+
+class TestModelManager:
+    """Unit tests for loading and hot-swapping model versions."""
+
+    def setup_method(self):
+        """Setup test data and a column transformer like the shipped artifact."""
+        self.data = make_traffic_data(n_rows=60, seed=5)
+        numerical = [c for c in self.data.columns if c not in ("logged_in", "flag")]
+        self.column_transformer = ColumnTransformer(
+            [
+                ("num", StandardScaler(), numerical),
+                (
+                    "cat",
+                    OneHotEncoder(drop="first", sparse_output=False),
+                    ["logged_in", "flag"],
+                ),
+            ]
+        ).fit(self.data)
+        self.X = self.column_transformer.transform(self.data)
+        self.swaps = []
+
+    def write_artifacts(self, artifacts_dir, labels):
+        """Dump a freshly fitted model and the column transformer."""
+        model = LogisticRegression().fit(self.X, labels)
+        joblib.dump(model, artifacts_dir / "model.joblib")
+        joblib.dump(self.column_transformer, artifacts_dir / "preprocessor.joblib")
+        return model
+
+    def make_manager(self, artifacts_dir):
+        return ModelManager(
+            artifacts_dir, tracking_uri="local", on_swap=self.swaps.append
+        )
+
+    def test_load_local_artifacts(self, tmp_path):
+        """Test that load warms up and activates the local artifacts"""
+        self.write_artifacts(tmp_path, (self.data["flag"] == "S0").astype(int))
+        manager = self.make_manager(tmp_path)
+
+        version = manager.load()
+
+        assert manager.active is version
+        assert self.swaps == [version]
+        assert version.source == "local"
+        assert version.version.startswith("local-")
+        assert version.warmup_ms > 0
+        assert manager.get_stats()["active"]["compiled"] is True
+        assert not manager.check_for_update()
+
+    def test_reload_swaps_atomically(self, tmp_path):
+        """Test that a new artifact is detected and swapped in"""
+        self.write_artifacts(tmp_path, (self.data["flag"] == "S0").astype(int))
+        manager = self.make_manager(tmp_path)
+        old = manager.load()
+        records = self.data.to_dict(orient="records")
+
+        self.write_artifacts(tmp_path, (self.data["count"] > 250).astype(int))
+        assert manager.check_for_update()
+        new = manager.load()
+
+        assert manager.active is new
+        assert new.version != old.version
+        assert manager.get_stats()["reloads"] == 2
+        # A request still holding the old scorer finishes on the old version
+        np.testing.assert_array_equal(
+            old.scorer.predict_records(records),
+            (self.data["flag"] == "S0").astype(int).to_numpy(),
+        )
+
+    def test_failed_reload_keeps_active_version(self, tmp_path):
+        """Test that a broken artifact does not replace the active version"""
+        self.write_artifacts(tmp_path, (self.data["flag"] == "S0").astype(int))
+        manager = self.make_manager(tmp_path)
+        active = manager.load()
+
+        (tmp_path / "model.joblib").write_bytes(b"not a model")
+        with pytest.raises(ValueError):
+            manager.load()
+
+        assert manager.active is active
+        assert manager.get_stats()["failed_reloads"] == 1
+
+    def test_concurrent_reload_rejected(self, tmp_path):
+        """Test that only one reload runs at a time"""
+        manager = self.make_manager(tmp_path)
+
+        with manager._reload_lock:
+            with pytest.raises(ReloadInProgressError):
+                manager.load()
+
+    def test_activate_none_clears_version(self, tmp_path):
+        """Test that activating no model deactivates the current one"""
+        model = self.write_artifacts(tmp_path, (self.data["flag"] == "S0").astype(int))
+        manager = self.make_manager(tmp_path)
+        manager.activate(model, ColumnTransformerWrapper(self.column_transformer))
+
+        manager.activate(None, None)
+
+        assert manager.active is None
+        assert self.swaps[-1] is None
+
+
+class TestModelRegistry:
+    """Unit tests for serving several model versions side by side."""
+
+    def setup_method(self):
+        """Setup an active version and two pinned versions on disk."""
+        self.data = make_traffic_data(n_rows=60, seed=6)
+        self.records = self.data.to_dict(orient="records")
+        numerical = [c for c in self.data.columns if c not in ("logged_in", "flag")]
+        column_transformer = ColumnTransformer(
+            [
+                ("num", StandardScaler(), numerical),
+                (
+                    "cat",
+                    OneHotEncoder(drop="first", sparse_output=False),
+                    ["logged_in", "flag"],
+                ),
+            ]
+        ).fit(self.data)
+        X = column_transformer.transform(self.data)
+        self.labels = {
+            "active": (self.data["flag"] == "S0").astype(int).to_numpy(),
+            "1": (self.data["count"] > 250).astype(int).to_numpy(),
+            "2": (self.data["serror_rate"] > 0.5).astype(int).to_numpy(),
+        }
+        self.models = {
+            name: LogisticRegression(C=100).fit(X, y) for name, y in self.labels.items()
+        }
+        self.column_transformer = column_transformer
+
+    def make_registry(self, artifacts_dir, **kwargs):
+        """Write the artifacts and load the active version."""
+        for name, model in self.models.items():
+            target = (
+                artifacts_dir if name == "active" else artifacts_dir / "versions" / name
+            )
+            target.mkdir(parents=True, exist_ok=True)
+            joblib.dump(model, target / "model.joblib")
+        joblib.dump(self.column_transformer, artifacts_dir / "preprocessor.joblib")
+
+        manager = ModelManager(artifacts_dir, tracking_uri="local")
+        manager.load()
+        return ModelRegistry(manager, **kwargs)
+
+    def test_routes_by_version(self, tmp_path):
+        """Test that each request is scored by the version it asked for"""
+        registry = self.make_registry(tmp_path)
+
+        assert registry.get() is registry.manager.active
+        for name in ("1", "2"):
+            version = registry.get(name)
+            assert version.version == name
+            np.testing.assert_array_equal(
+                version.scorer.predict_records(self.records),
+                self.models[name].predict(self.column_transformer.transform(self.data)),
+            )
+
+        assert registry.get("1") is registry.get_loaded("1")
+        stats = registry.get_stats()
+        assert stats["misses"] == 2
+        assert stats["hits"] >= 2
+        assert set(stats["versions"]) == {"1", "2"}
+
+    def test_lru_eviction(self, tmp_path):
+        """Test that the least recently used version is evicted first"""
+        registry = self.make_registry(tmp_path, max_versions=1)
+
+        registry.get("1")
+        registry.get("2")
+
+        assert registry.get_loaded("1") is None
+        assert registry.get_loaded("2") is not None
+        assert registry.get_stats()["evictions"] == 1
+
+    def test_memory_budget(self, tmp_path):
+        """Test that versions beyond the byte budget are evicted"""
+        registry = self.make_registry(tmp_path, max_bytes=1)
+
+        registry.get("1")
+        registry.get("2")
+
+        assert list(registry.get_stats()["versions"]) == ["2"]
+        assert registry.loaded_bytes > 0
+
+    def test_unknown_version(self, tmp_path):
+        """Test strict and fallback handling of unknown versions"""
+        registry = self.make_registry(tmp_path)
+
+        with patch.object(
+            registry.manager, "load_version", wraps=registry.manager.load_version
+        ) as load_version:
+            assert registry.get("99") is registry.manager.active
+            # Answered from the version list, without a lookup
+            assert registry.get_loaded("99") is registry.manager.active
+            load_version.assert_not_called()
+        stats = registry.get_stats()
+        assert stats["misses"] == 0
+        assert stats["fallbacks"] == 2
+        assert stats["available_versions"] == 2
+
+        registry.strict = True
+        with pytest.raises(ModelVersionNotFoundError):
+            registry.get("99")
+        with pytest.raises(ModelVersionNotFoundError):
+            registry.get("../1")
+
+    def test_refresher_learns_new_versions(self, tmp_path):
+        """Test that versions are listed in the background and on demand"""
+        registry = self.make_registry(tmp_path, refresh_s=3600)
+
+        async def scenario():
+            registry.start_refreshing()
+            await asyncio.sleep(0.2)
+            assert registry.get_loaded("3") is registry.manager.active
+            (tmp_path / "versions" / "3").mkdir()
+            joblib.dump(self.models["1"], tmp_path / "versions" / "3" / "model.joblib")
+            # The unknown version woke the refresher up
+            await asyncio.sleep(0.2)
+            await registry.stop_refreshing()
+
+        with patch("src.ml.inference.registry.MIN_REFRESH_INTERVAL_S", 0.0):
+            asyncio.run(scenario())
+
+        assert registry.get_loaded("3") is None
+        assert registry.get("3").version == "3"
+
+    def test_per_version_counters(self, tmp_path):
+        """Test that request counters are kept per version"""
+        registry = self.make_registry(tmp_path)
+        version = registry.get("1")
+
+        version.record(10, 1.5)
+        version.record(5, 2.5, errors=1)
+
+        stats = registry.get_stats()["versions"]["1"]
+        assert stats["requests"] == 2
+        assert stats["rows"] == 15
+        assert stats["errors"] == 1
+        assert stats["latency_ms"]["count"] == 2
+        assert registry.get_stats()["active"]["requests"] == 0
+
+
+class TestShadowScorer:
+    """Unit tests for shadow scoring a candidate model."""
+
+    def setup_method(self):
+        """Setup a primary and a candidate model that partly disagree."""
+        self.data = make_traffic_data(n_rows=80, seed=7)
+        self.records = self.data.to_dict(orient="records")
+        preprocessor = DataPreprocessor()
+        X = preprocessor.fit_transform(self.data)
+        primary = LogisticRegression().fit(X, (self.data["flag"] == "S0").astype(int))
+        candidate = LogisticRegression().fit(X, (self.data["count"] > 250).astype(int))
+
+        self.primary = BatchScorer(primary, preprocessor)
+        self.candidate = ModelVersion(
+            candidate, preprocessor, BatchScorer(candidate, preprocessor), "2", "local"
+        )
+
+    def test_counts_disagreements(self):
+        """Test that mirrored samples are compared with the primary labels"""
+        flushed = []
+        shadow = ShadowScorer(self.candidate, sample_rate=1.0, sink=flushed.append)
+        primary = self.primary.score(self.records).predictions
+        expected = int(
+            (primary != self.candidate.scorer.predict_records(self.records)).sum()
+        )
+
+        shadow.start()
+        assert shadow.offer(self.records[:40], primary[:40])
+        assert shadow.offer(self.records[40:], primary[40:])
+        shadow.stop()
+
+        totals = shadow.get_stats()["totals"]
+        assert totals["mirrored"] == 2
+        assert totals["compared"] == 80
+        assert totals["disagreements"] == expected
+        assert totals["disagreement_rate"] == pytest.approx(expected / 80)
+        assert flushed[-1]["compared"] == 80
+        assert flushed[-1]["latency_ms"]["count"] == 2
+        assert self.candidate.rows == 80
+
+    def test_mirrors_frames(self):
+        """Test that a DataFrame sample is scored column by column"""
+        shadow = ShadowScorer(self.candidate, sample_rate=1.0)
+        primary = self.primary.score_frame(self.data).predictions
+
+        shadow.start()
+        assert shadow.offer(self.data, primary)
+        shadow.stop()
+
+        assert shadow.get_stats()["totals"]["compared"] == 80
+        assert self.candidate.rows == 80
+
+    def test_sampling(self):
+        """Test that only the sampled fraction of requests is mirrored"""
+        shadow = ShadowScorer(self.candidate, sample_rate=0.0)
+        primary = np.zeros(1, dtype=np.int8)
+
+        assert not any(shadow.offer(self.records[:1], primary) for _ in range(20))
+        assert shadow.get_stats()["totals"]["offered"] == 20
+        assert shadow.get_stats()["queued"] == 0
+
+    def test_full_queue_drops_samples(self):
+        """Test that offer drops samples instead of waiting for the candidate"""
+        shadow = ShadowScorer(self.candidate, sample_rate=1.0, max_queue_depth=1)
+        primary = np.zeros(1, dtype=np.int8)
+
+        assert shadow.offer(self.records[:1], primary)
+        started = time.perf_counter()
+        assert not shadow.offer(self.records[:1], primary)
+
+        assert time.perf_counter() - started < 0.05
+        assert shadow.get_stats()["totals"]["dropped"] == 1
+
+    def test_flush_resets_window(self):
+        """Test that flushing closes the window but keeps the totals"""
+        shadow = ShadowScorer(self.candidate, sample_rate=1.0)
+        primary = self.primary.score(self.records).predictions
+        shadow._score(self.records, primary)
+
+        report = shadow.flush()
+
+        assert report["rows"] == 80
+        assert shadow.get_stats()["window"]["rows"] == 0
+        assert shadow.get_stats()["totals"]["rows"] == 80
+        assert shadow.get_stats()["last_flush"] is report
+
+
+def to_kdd_csv(data: pd.DataFrame) -> bytes:
+    """Write traffic features as header-less CSV in the KDD layout."""
+    frame = pd.DataFrame(0, index=data.index, columns=KDD_COLUMNS)
+    frame["protocol_type"], frame["service"] = "tcp", "http"
+    frame["kind_of_activity"] = "normal"
+    for name in data.columns:
+        frame[name] = data[name].astype(int) if name == "logged_in" else data[name]
+    return frame.to_csv(header=False, index=False).encode()
+
+
+async def split_stream(data: bytes, size: int):
+    """Yield bytes in fixed-size pieces, like a chunked upload."""
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+class TestCsvChunkReader:
+    """Unit tests for chunked CSV parsing."""
+
+    def setup_method(self):
+        """Setup a KDD-layout capture"""
+        self.data = make_traffic_data(25)
+        self.csv = to_kdd_csv(self.data)
+
+    def read(self, reader, data, piece_size):
+        async def collect():
+            return [
+                chunk async for chunk in reader.chunks(split_stream(data, piece_size))
+            ]
+
+        return asyncio.run(collect())
+
+    def test_chunks_hold_whole_rows(self):
+        """Test that pieces split mid-line are regrouped into chunks of rows"""
+        reader = CsvChunkReader(TRAFFIC_FEATURES, chunk_rows=10)
+
+        chunks = self.read(reader, self.csv, piece_size=7)
+
+        assert [chunk.count(b"\n") for chunk in chunks] == [10, 10, 5]
+        assert b"".join(chunks) == self.csv
+
+    def test_last_line_without_newline(self):
+        """Test that a trailing row without a newline is not lost"""
+        reader = CsvChunkReader(TRAFFIC_FEATURES, chunk_rows=10)
+
+        chunks = self.read(reader, self.csv.rstrip(b"\n"), piece_size=64)
+
+        frame = pd.concat([reader.parse(chunk)[0] for chunk in chunks])
+        assert len(frame) == 25
+
+    def test_parse_kdd_layout(self):
+        """Test that a chunk parses into the selected features"""
+        reader = CsvChunkReader(TRAFFIC_FEATURES)
+
+        frame, errors = reader.parse(self.csv)
+
+        assert errors == {}
+        assert list(frame.columns) == TRAFFIC_FEATURES
+        np.testing.assert_allclose(frame["serror_rate"], self.data["serror_rate"])
+        assert frame["flag"].tolist() == self.data["flag"].tolist()
+
+    def test_header(self):
+        """Test that a header line names the columns"""
+        reader = CsvChunkReader(TRAFFIC_FEATURES, chunk_rows=10, header=True)
+        data = self.data[TRAFFIC_FEATURES[::-1]].to_csv(index=False).encode()
+
+        chunks = self.read(reader, data, piece_size=5)
+
+        frame = pd.concat([reader.parse(chunk)[0] for chunk in chunks])
+        assert len(frame) == 25
+        np.testing.assert_array_equal(frame["count"], self.data["count"])
+
+    def test_malformed_rows_keep_positions(self):
+        """Test that a malformed line is reported at its position"""
+        reader = CsvChunkReader(TRAFFIC_FEATURES)
+        lines = self.csv.splitlines(keepends=True)
+        lines[3] = lines[3].rstrip(b"\n") + b",extra,fields\n"
+
+        frame, errors = reader.parse(b"".join(lines))
+
+        assert len(frame) == 25
+        assert list(errors) == [3]
+        assert frame["count"].iloc[4] == self.data["count"].iloc[4]
+
+
+class TestValidateTrafficFrame:
+    """Unit tests for column-wise validation of traffic features."""
+
+    def test_valid_frame(self):
+        """Test that valid rows pass and dtypes are normalized"""
+        data = make_traffic_data(10)
+        data["logged_in"] = data["logged_in"].astype(int)
+
+        frame, valid, errors = validate_traffic_frame(data)
+
+        assert valid.all()
+        assert errors == {}
+        assert frame["logged_in"].dtype == bool
+
+    def test_invalid_rows_reported_by_position(self):
+        """Test that each invalid row is reported once with its first error"""
+        data = make_traffic_data(6)
+        data.loc[1, "serror_rate"] = 1.5
+        data.loc[2, "flag"] = "REJ"
+        data.loc[3, "count"] = -1
+        data.loc[3, "flag"] = "REJ"
+        data["dst_host_srv_count"] = data["dst_host_srv_count"].astype(object)
+        data.loc[4, "dst_host_srv_count"] = "many"
+
+        _, valid, errors = validate_traffic_frame(data)
+
+        assert valid.tolist() == [True, False, False, False, False, True]
+        assert "serror_rate" in errors[1]
+        assert "flag" in errors[2]
+        assert "count" in errors[3]
+        assert "dst_host_srv_count" in errors[4]
+
+    def test_matches_schema(self):
+        """Test that the vectorized checks agree with the pydantic schema"""
+        data = make_traffic_data(4)
+        data.loc[0, "count"] = 2.5
+        data.loc[1, "same_srv_rate"] = np.nan
+
+        _, valid, _ = validate_traffic_frame(data)
+
+        for i, record in enumerate(data.to_dict(orient="records")):
+            try:
+                NetworkTrafficFeatures(**record)
+                accepted = True
+            except Exception:
+                accepted = False
+            assert accepted == valid[i]
+
+
+class TestArrowIO:
+    """Unit tests for Arrow and Parquet batch bodies."""
+
+    def setup_method(self):
+        """Setup a table of traffic features"""
+        self.data = make_traffic_data(20)
+        self.table = pa.Table.from_pandas(self.data, preserve_index=False)
+
+    def to_stream(self, table):
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    def test_read_arrow_stream(self):
+        """Test that an Arrow stream is read and pruned to the features"""
+        table = self.table.append_column("extra", pa.array(range(20)))
+
+        result = read_table(
+            self.to_stream(table), ARROW_STREAM_MEDIA_TYPE, TRAFFIC_FEATURES
+        )
+
+        assert "extra" not in result.column_names
+        assert result.num_rows == 20
+
+    def test_read_parquet(self):
+        """Test that a Parquet file only decodes the wanted columns"""
+        sink = pa.BufferOutputStream()
+        self.data.assign(extra=1).to_parquet(sink)
+
+        result = read_table(
+            sink.getvalue().to_pybytes(), "application/x-parquet", TRAFFIC_FEATURES
+        )
+
+        assert sorted(result.column_names) == sorted(TRAFFIC_FEATURES)
+
+    def test_invalid_body(self):
+        """Test that an undecodable body raises ValueError"""
+        with pytest.raises(ValueError):
+            read_table(b"not arrow", ARROW_STREAM_MEDIA_TYPE)
+        with pytest.raises(ValueError):
+            read_table(b"", "text/csv")
+
+    def test_table_to_frame_zero_copy(self):
+        """Test that numeric columns are wrapped without copying"""
+        frame = table_to_frame(self.table, TRAFFIC_FEATURES)
+
+        column = self.table.column("serror_rate").chunk(0)
+        assert np.shares_memory(frame["serror_rate"].to_numpy(), column.to_numpy())
+        assert frame["flag"].tolist() == self.data["flag"].tolist()
+
+    def test_table_to_frame_dictionary_and_missing(self):
+        """Test that dictionary columns decode and missing features are left out"""
+        table = self.table.drop_columns(["count"])
+        index = table.schema.get_field_index("flag")
+        table = table.set_column(
+            index, "flag", table.column("flag").dictionary_encode()
+        )
+
+        frame = table_to_frame(table, TRAFFIC_FEATURES)
+
+        assert "count" not in frame.columns
+        assert len(frame) == 20
+        assert frame["flag"].tolist() == self.data["flag"].tolist()
+        _, valid, _ = validate_traffic_frame(frame)
+        assert not valid.any()
+
+    def test_predictions_to_arrow(self):
+        """Test that predictions round-trip with errors and metadata"""
+        predictions = np.array([1, -1, 0], dtype=np.int8)
+
+        data = predictions_to_arrow(predictions, {1: "bad row"}, {"errors": "1"})
+
+        table = pa.ipc.open_stream(data).read_all()
+        assert table.column("prediction").to_pylist() == [1, -1, 0]
+        assert table.column("classification_result").to_pylist() == [
+            "MALICIOUS",
+            None,
+            "NORMAL",
+        ]
+        assert table.column("error").to_pylist() == [None, "bad row", None]
+        assert table.schema.metadata == {b"errors": b"1"}
+
+
+class TestScoreFile:
+    """Unit tests for offline bulk scoring."""
+
+    @pytest.fixture(autouse=True)
+    def artifacts(self, tmp_path):
+        """Save a column transformer and model as local artifacts"""
+        train = make_traffic_data(60, seed=5)
+        numerical = [c for c in train.columns if c not in ("logged_in", "flag")]
+        column_transformer = ColumnTransformer(
+            [
+                ("num", StandardScaler(), numerical),
+                (
+                    "cat",
+                    OneHotEncoder(drop="first", sparse_output=False),
+                    ["logged_in", "flag"],
+                ),
+            ]
+        ).fit(train)
+        model = LogisticRegression().fit(
+            column_transformer.transform(train), (train["count"] > 250).astype(int)
+        )
+
+        self.tmp_path = tmp_path
+        self.artifacts_dir = tmp_path / "artifacts"
+        self.artifacts_dir.mkdir()
+        joblib.dump(model, self.artifacts_dir / "model.joblib")
+        joblib.dump(column_transformer, self.artifacts_dir / "preprocessor.joblib")
+
+        self.data = make_traffic_data(50, seed=3)
+        self.expected = model.predict(column_transformer.transform(self.data))
+
+    def test_csv_to_parquet(self):
+        """Test that a KDD CSV is scored chunk by chunk into Parquet"""
+        lines = to_kdd_csv(self.data).splitlines(keepends=True)
+        lines[7] = lines[7].replace(b",S0,", b",REJ,").replace(b",SF,", b",REJ,")
+        input_path = self.tmp_path / "capture.csv"
+        input_path.write_bytes(b"".join(lines))
+        output_path = self.tmp_path / "scores.parquet"
+
+        summary = score_file(
+            str(input_path), str(output_path), str(self.artifacts_dir), chunk_rows=16
+        )
+
+        result = pd.read_parquet(output_path)
+        assert summary["rows"] == 50
+        assert summary["errors"] == 1
+        assert summary["rows_per_s"] > 0
+        assert result["row"].tolist() == list(range(50))
+        assert result["prediction"].iloc[7] == -1
+        assert "flag" in result["error"].iloc[7]
+        valid = result["prediction"] >= 0
+        np.testing.assert_array_equal(
+            result["prediction"][valid], self.expected[valid.to_numpy()]
+        )
+
+    def test_scores_categories_seen_in_training(self):
+        """Test that offline rows are validated against the fitted categories"""
+        train = make_traffic_data(60, seed=5)
+        train.loc[::3, "flag"] = "REJ"
+        column_transformer = ColumnTransformer(
+            [
+                ("num", StandardScaler(), [c for c in train.columns if c != "flag"]),
+                ("cat", OneHotEncoder(sparse_output=False), ["flag"]),
+            ]
+        ).fit(train)
+        model = LogisticRegression().fit(
+            column_transformer.transform(train), (train["flag"] == "REJ").astype(int)
+        )
+        joblib.dump(model, self.artifacts_dir / "model.joblib")
+        joblib.dump(column_transformer, self.artifacts_dir / "preprocessor.joblib")
+
+        data = self.data.copy()
+        data.loc[[1, 2], "flag"] = ["REJ", "RSTO"]
+        data.loc[3, "count"] = np.nan
+        input_path = self.tmp_path / "capture.parquet"
+        data.to_parquet(input_path)
+        output_path = self.tmp_path / "scores.parquet"
+
+        summary = score_file(str(input_path), str(output_path), str(self.artifacts_dir))
+
+        result = pd.read_parquet(output_path)
+        assert summary["errors"] == 2
+        assert result["prediction"].iloc[1] == 1
+        assert "flag must be one of ['REJ', 'S0', 'SF']" == result["error"].iloc[2]
+        assert "count" in result["error"].iloc[3]
+        valid = result["prediction"] >= 0
+        np.testing.assert_array_equal(
+            result["prediction"][valid],
+            model.predict(column_transformer.transform(data[valid.to_numpy()])),
+        )
+
+    def test_parquet_with_workers(self):
+        """Test that worker processes keep the output in input order"""
+        input_path = self.tmp_path / "capture.parquet"
+        self.data.to_parquet(input_path)
+        output_path = self.tmp_path / "scores.csv"
+
+        summary = score_file(
+            str(input_path),
+            str(output_path),
+            str(self.artifacts_dir),
+            chunk_rows=8,
+            n_workers=2,
+        )
+
+        result = pd.read_csv(output_path)
+        assert summary == {**summary, "rows": 50, "errors": 0}
+        np.testing.assert_array_equal(result["prediction"], self.expected)
+        assert set(result["classification_result"]) <= {"NORMAL", "MALICIOUS"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
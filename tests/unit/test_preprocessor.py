@@ -3,8 +3,25 @@ from unittest.mock import Mock, patch
 import numpy as np
 import pandas as pd
 import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
 
-from src.ml.pipeline.preprocessing.preprocessor import DataPreprocessor
+from src.ml.pipeline.preprocessing import loader
+from src.ml.pipeline.preprocessing.cache import StageCache
+from src.ml.pipeline.preprocessing.loader import (
+    KDD_COLUMNS,
+    SELECTED_FEATURES,
+    TARGET_COLUMN,
+    KddChunks,
+    iter_kdd,
+    parse_kdd_csv,
+    read_kdd,
+)
+from src.ml.pipeline.preprocessing.preprocessor import (
+    ColumnPlan,
+    ColumnTransformerWrapper,
+    DataPreprocessor,
+)
 
 
 class TestDataPreprocessor:
@@ -156,6 +173,145 @@ class TestDataPreprocessor:
         assert self.preprocessor.preprocessor is not None
         assert hasattr(self.preprocessor.preprocessor, 'transform')
 
+    def test_column_plan_matches_column_transformer(self):
+        """Test that the planned transform equals transform-then-select"""
+        self.preprocessor.fit(self.sample_data)
+        ct = self.preprocessor.preprocessor
+        indices = self.preprocessor.get_output_indices()
+
+        expected = ct.transform(self.sample_data)[:, indices]
+        np.testing.assert_array_equal(
+            self.preprocessor.transform(self.sample_data), expected
+        )
+
+    def test_column_plan_cached(self):
+        """Test that feature names are not recomputed on every transform"""
+        self.preprocessor.fit(self.sample_data)
+        plan = self.preprocessor.get_column_plan()
+
+        with patch.object(
+            self.preprocessor, 'get_feature_names', side_effect=AssertionError
+        ):
+            self.preprocessor.transform(self.sample_data)
+            self.preprocessor.transform(self.sample_data)
+        assert self.preprocessor.get_column_plan() is plan
+
+    def test_column_plan_rebuilt_for_assigned_transformer(self):
+        """Test that assigning a loaded transformer replaces the plan"""
+        self.preprocessor.fit(self.sample_data)
+        plan = self.preprocessor.get_column_plan()
+
+        loaded = DataPreprocessor()
+        loaded.preprocessor = self.preprocessor.preprocessor
+        np.testing.assert_array_equal(
+            loaded.transform(self.sample_data),
+            self.preprocessor.transform(self.sample_data),
+        )
+
+        refitted = DataPreprocessor().fit(self.sample_data)
+        self.preprocessor.preprocessor = refitted.preprocessor
+        assert self.preprocessor.get_column_plan() is not plan
+        assert self.preprocessor.get_column_plan().column_transformer is (
+            refitted.preprocessor
+        )
+
+    def test_partial_fit_then_finalize_matches_fit(self):
+        """Test that chunks are only accumulated until finalize builds the transformer"""
+        chunks = [
+            self.sample_data.iloc[:1],
+            self.sample_data.iloc[1:].assign(flag=['SF', 'REJ']),
+        ]
+        data = pd.concat(chunks, ignore_index=True)
+        expected = DataPreprocessor().fit(data)
+
+        for chunk in chunks:
+            self.preprocessor.partial_fit(chunk)
+            assert self.preprocessor.preprocessor is None
+        self.preprocessor.finalize()
+
+        fitted = self.preprocessor.preprocessor
+        scaler = fitted.named_transformers_['num'].named_steps['scaler']
+        expected_scaler = expected.preprocessor.named_transformers_['num'].named_steps['scaler']
+        np.testing.assert_allclose(scaler.mean_, expected_scaler.mean_)
+        np.testing.assert_allclose(scaler.scale_, expected_scaler.scale_)
+        encoder = fitted.named_transformers_['cat'].named_steps['onehot']
+        assert encoder.categories_[0].tolist() == ['REJ', 'S0', 'SF']
+        assert self.preprocessor.get_feature_names() == expected.get_feature_names()
+        np.testing.assert_allclose(self.preprocessor.transform(data), expected.transform(data))
+        assert self.preprocessor.preprocessor is fitted
+
+    def test_finalize_requires_partial_fit(self):
+        """Test that finalize reports a preprocessor without accumulated chunks"""
+        with pytest.raises(ValueError, match='partial_fit'):
+            self.preprocessor.finalize()
+
+    def test_column_plan_missing_columns(self):
+        """Test that missing input columns are reported"""
+        self.preprocessor.fit(self.sample_data)
+
+        with pytest.raises(ValueError, match='missing'):
+            self.preprocessor.transform(self.sample_data.drop(columns=['count']))
+
+
+class TestColumnTransformerWrapper:
+    """Unit tests for ColumnTransformerWrapper over saved transformers"""
+
+    def setup_method(self):
+        """Setup a transformer laid out like the shipped artifact"""
+        rng = np.random.default_rng(0)
+        self.numerical = ['count', 'serror_rate', 'same_srv_rate']
+        self.data = pd.DataFrame({
+            'count': rng.integers(0, 500, 50),
+            'serror_rate': rng.random(50),
+            'same_srv_rate': rng.random(50),
+            'logged_in': rng.integers(0, 2, 50),
+            'flag': rng.choice(['S0', 'SF', 'REJ'], 50),
+        })
+        self.ct = ColumnTransformer([
+            ('num', StandardScaler(), self.numerical),
+            ('cat', OneHotEncoder(drop='first', sparse_output=False),
+             ['logged_in', 'flag']),
+        ]).fit(self.data)
+
+    def test_plan_built_at_load(self):
+        """Test that the plan is built when the transformer is wrapped"""
+        wrapper = ColumnTransformerWrapper(self.ct)
+
+        assert isinstance(wrapper.column_plan, ColumnPlan)
+        assert wrapper.column_plan.column_transformer is self.ct
+        assert wrapper.column_plan.blocks is not None
+
+    def test_transform_matches_column_transformer(self):
+        """Test that the planned transform equals ColumnTransformer.transform"""
+        wrapper = ColumnTransformerWrapper(self.ct)
+
+        np.testing.assert_array_equal(
+            wrapper.transform(self.data), self.ct.transform(self.data)
+        )
+
+    def test_plan_with_selected_columns(self):
+        """Test gathering a reordered, repeated subset of output columns"""
+        indices = np.array([4, 0, 2, 0])
+        plan = ColumnPlan(self.ct, indices)
+
+        np.testing.assert_array_equal(
+            plan.transform(self.data), self.ct.transform(self.data)[:, indices]
+        )
+
+    def test_positional_columns_fall_back(self):
+        """Test that transformers selecting columns by position still work"""
+        ct = ColumnTransformer(
+            [('num', StandardScaler(), [0, 1])], remainder='passthrough'
+        ).fit(self.data[self.numerical])
+        plan = ColumnPlan(ct)
+
+        assert plan.blocks is None
+        np.testing.assert_array_equal(
+            plan.transform(self.data[self.numerical]),
+            ct.transform(self.data[self.numerical]),
+        )
+
+
 class TestPreprocessorIntegration:
     """Integration tests for preprocessor with real data"""
     
@@ -185,4 +341,163 @@ class TestPreprocessorIntegration:
         assert not np.any(np.isinf(transformed))
 
 if __name__ == "__main__":
-    pytest.main([__file__]) 
\ No newline at end of file
+    pytest.main([__file__]) 
+
+
+class TestKddLoader:
+    """Unit tests for the typed, cached KDD loader"""
+
+    @pytest.fixture(autouse=True)
+    def capture(self, tmp_path):
+        """Write a small header-less capture in the KDD layout"""
+        rows = pd.DataFrame(0, index=range(6), columns=KDD_COLUMNS)
+        rows['protocol_type'], rows['service'] = 'tcp', 'http'
+        rows['flag'] = ['S0', 'SF', 'REJ', 'SF', 'S0', 'SF']
+        rows['logged_in'] = [1, 0, 1, 1, 0, 0]
+        rows['count'] = [1, 20, 300, 4, 50, 6]
+        rows['serror_rate'] = [0.0, 0.25, 1.0, 0.5, 0.75, 0.1]
+        rows['kind_of_activity'] = ['normal', 'neptune', 'normal', 'smurf', 'normal', 'normal']
+        self.rows = rows
+        self.path = tmp_path / 'capture.csv'
+        rows.to_csv(self.path, header=False, index=False)
+        self.cache_dir = tmp_path / 'cache'
+
+    def test_compact_dtypes_and_pruning(self):
+        """Test that only requested columns are read, with compact dtypes"""
+        df = read_kdd(self.path)
+
+        assert list(df.columns) == SELECTED_FEATURES + [TARGET_COLUMN]
+        assert df['flag'].dtype == 'category'
+        assert df['logged_in'].dtype == np.int8
+        assert df['count'].dtype == np.int32
+        assert df['serror_rate'].dtype == np.float32
+        assert df['flag'].tolist() == self.rows['flag'].tolist()
+        np.testing.assert_allclose(df['serror_rate'], self.rows['serror_rate'])
+
+    def test_pandas_fallback_matches(self):
+        """Test that the pandas parser yields the same frame as pyarrow"""
+        columns = ['flag', 'count', 'serror_rate']
+        expected = parse_kdd_csv(self.path, columns)
+
+        with patch.object(loader, 'pa_csv', None):
+            df = parse_kdd_csv(self.path, columns)
+
+        assert list(df.columns) == columns
+        pd.testing.assert_frame_equal(df, expected, check_categorical=False)
+
+    def test_parquet_cache(self):
+        """Test that repeat loads come from the cache until the file changes"""
+        first = read_kdd(self.path, cache_dir=self.cache_dir)
+        assert len(list(self.cache_dir.glob('*.parquet'))) == 1
+
+        with patch.object(loader, 'parse_kdd_csv', side_effect=AssertionError):
+            cached = read_kdd(self.path, cache_dir=self.cache_dir)
+        pd.testing.assert_frame_equal(cached, first)
+        assert cached['flag'].dtype == 'category'
+
+        self.rows.iloc[:3].to_csv(self.path, header=False, index=False)
+        assert len(read_kdd(self.path, cache_dir=self.cache_dir)) == 3
+        assert len(list(self.cache_dir.glob('*.parquet'))) == 2
+
+    def test_fits_preprocessor(self):
+        """Test that the compact frame trains like the default-typed one"""
+        df = read_kdd(self.path)
+        X = df[SELECTED_FEATURES]
+
+        X_transformed = DataPreprocessor().fit_transform(X)
+
+        assert X_transformed.shape[0] == 6
+        assert np.isfinite(X_transformed).all()
+
+    def test_iter_kdd_chunks(self):
+        """Test that chunked reads cover the file with the same dtypes"""
+        chunks = list(iter_kdd(self.path, chunk_rows=4))
+
+        assert [len(chunk) for chunk in chunks] == [4, 2]
+        assert chunks[0]['count'].dtype == np.int32
+        df = pd.concat(chunks, ignore_index=True)
+        assert df['flag'].astype(str).tolist() == self.rows['flag'].tolist()
+
+    def test_kdd_chunks_are_reiterable(self):
+        """Test that every pass yields binary labels and transformed features"""
+        chunks = KddChunks(self.path, chunk_rows=4, transform=lambda X: X.to_numpy())
+
+        for _ in range(2):
+            labels = np.concatenate([y for _, y in chunks])
+            np.testing.assert_array_equal(labels, [0, 1, 0, 1, 0, 0])
+        assert next(iter(chunks))[0].shape == (4, len(SELECTED_FEATURES))
+
+    def test_partial_fit_matches_fit(self):
+        """Test that fitting chunk by chunk equals fitting the whole file"""
+        X = read_kdd(self.path)[SELECTED_FEATURES]
+        expected = DataPreprocessor().fit(X)
+
+        preprocessor = DataPreprocessor()
+        for chunk in iter_kdd(self.path, chunk_rows=2):
+            preprocessor.partial_fit(chunk[SELECTED_FEATURES])
+
+        assert preprocessor.get_feature_names() == expected.get_feature_names()
+        np.testing.assert_allclose(preprocessor.transform(X), expected.transform(X))
+
+
+class TestStageCache:
+    """Unit tests for the content-addressed pipeline stage cache"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        self.input_path = tmp_path / 'input.csv'
+        self.input_path.write_text('1,2,3\n')
+        self.cache_dir = tmp_path / 'stages'
+
+    def test_miss_then_hit(self):
+        """Test that a stored result is loaded on the next run, memory-mapped"""
+        compute = Mock(return_value=(np.arange(5.0), {'scaler': 'fitted'}))
+
+        first = StageCache(self.cache_dir)
+        key = first.key('transform', 'config', files=[self.input_path])
+        first.run('transform', key, compute)
+
+        second = StageCache(self.cache_dir)
+        X, state = second.run('transform', second.key('transform', 'config', files=[self.input_path]), compute)
+
+        assert compute.call_count == 1
+        assert isinstance(X, np.memmap)
+        np.testing.assert_array_equal(X, np.arange(5.0))
+        assert state == {'scaler': 'fitted'}
+        assert [stat['hit'] for stat in first.stats + second.stats] == [False, True]
+        assert 'Stage cache: 1/1 hits' in second.report()
+
+    def test_key_follows_content_and_config(self):
+        """Test that changed input content or configuration changes the key"""
+        cache = StageCache(self.cache_dir)
+        key = cache.key('load', 'a', files=[self.input_path])
+
+        assert cache.key('load', 'a', files=[self.input_path]) == key
+        assert cache.key('load', 'b', files=[self.input_path]) != key
+        assert cache.key('preprocess', 'a', files=[self.input_path]) != key
+        self.input_path.write_text('4,5,6\n')
+        assert cache.key('load', 'a', files=[self.input_path]) != key
+
+    def test_disabled_cache_computes_once_per_run(self):
+        """Test that a disabled cache stores nothing but still reuses results"""
+        cache = StageCache(None)
+        compute = Mock(return_value=1)
+        key = cache.key('load', files=[self.input_path])
+
+        assert cache.run('load', key, compute) == cache.run('load', key, compute) == 1
+        assert compute.call_count == 1
+        assert not self.cache_dir.exists()
+
+    def test_unreadable_entry_is_recomputed(self):
+        """Test that a corrupt entry falls back to computing the stage"""
+        cache = StageCache(self.cache_dir)
+        key = cache.key('load', files=[self.input_path])
+        cache.run('load', key, lambda: np.ones(3))
+        for path in self.cache_dir.rglob('meta.json'):
+            path.write_text('not json')
+
+        result = StageCache(self.cache_dir).run('load', key, lambda: np.zeros(3))
+        cached = StageCache(self.cache_dir).run('load', key, Mock(side_effect=AssertionError))
+
+        np.testing.assert_array_equal(result, np.zeros(3))
+        np.testing.assert_array_equal(cached, np.zeros(3))
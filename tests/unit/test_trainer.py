@@ -0,0 +1,285 @@
+"""
+Unit tests for model training.
+"""
+
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.metrics import f1_score, roc_auc_score
+from sklearn.model_selection import cross_val_score
+from sklearn.tree import DecisionTreeClassifier
+
+from src.ml.pipeline.training.incremental import IncrementalTrainer, StreamingMetrics
+from src.ml.pipeline.training.trainer import ModelTrainer, benchmark_model
+
+QUALITY_METRICS = [
+    "accuracy",
+    "precision",
+    "recall",
+    "f1",
+    "roc_auc",
+    "cv_f1_mean",
+    "cv_f1_std",
+]
+
+
+@pytest.fixture
+def training_data():
+    """Small binary classification problem split into train and test."""
+    X, y = make_classification(n_samples=300, n_features=8, random_state=0)
+    return X[:240], X[240:], y[:240], y[240:]
+
+
+@pytest.fixture
+def mock_mlflow():
+    with (
+        patch("src.ml.pipeline.training.trainer.mlflow") as mock,
+        patch("src.ml.pipeline.training.incremental.mlflow", mock),
+    ):
+        yield mock
+
+
+class TestModelTrainer:
+    """Unit tests for ModelTrainer"""
+
+    def test_parallel_matches_serial(self, training_data, mock_mlflow):
+        serial = ModelTrainer(n_jobs=1).train_and_evaluate(*training_data)
+        parallel = ModelTrainer(n_jobs=2).train_and_evaluate(*training_data)
+
+        assert (
+            serial.keys() == parallel.keys() == {"logistic", "decision_tree", "xgboost"}
+        )
+        for model_name, metrics in serial.items():
+            for name in QUALITY_METRICS:
+                assert parallel[model_name][name] == pytest.approx(metrics[name])
+
+    def test_cv_scores_match_cross_val_score(self, training_data, mock_mlflow):
+        X_train, _, y_train, _ = training_data
+        results = ModelTrainer(n_jobs=2).train_and_evaluate(*training_data)
+
+        expected = cross_val_score(
+            DecisionTreeClassifier(random_state=42, class_weight="balanced"),
+            X_train,
+            y_train,
+            cv=5,
+            scoring="f1",
+        )
+        assert results["decision_tree"]["cv_f1_mean"] == pytest.approx(expected.mean())
+        assert results["decision_tree"]["cv_f1_std"] == pytest.approx(expected.std())
+
+    def test_runs_are_logged_one_at_a_time(self, training_data, mock_mlflow):
+        trainer = ModelTrainer(n_jobs=2)
+        trainer.train_and_evaluate(*training_data)
+
+        run_names = [
+            call.kwargs["run_name"]
+            for call in mock_mlflow.start_run.call_args_list
+            if "run_name" in call.kwargs
+        ]
+        assert run_names == ["logistic", "decision_tree", "xgboost"]
+        # Each run is closed before the next one opens, then the best is registered
+        assert mock_mlflow.start_run.call_count == 4
+        assert mock_mlflow.start_run.return_value.__exit__.call_count == 4
+        assert trainer.best_model is trainer.models[trainer.best_model_name]
+        assert trainer.predict(training_data[1]).shape == (60,)
+
+    def test_reports_speedup(self, training_data, mock_mlflow):
+        trainer = ModelTrainer(n_jobs=2)
+        trainer.train_and_evaluate(*training_data)
+
+        assert trainer.timing["serial_s"] == pytest.approx(
+            sum(trainer.train_times.values())
+        )
+        assert trainer.timing["speedup"] == pytest.approx(
+            trainer.timing["serial_s"] / trainer.timing["wall_s"]
+        )
+        mock_mlflow.log_metric.assert_any_call(
+            "train_time_s", trainer.train_times["xgboost"]
+        )
+
+    def test_failed_candidate_is_skipped(self, training_data, mock_mlflow):
+        trainer = ModelTrainer(n_jobs=1)
+        trainer.models["logistic"].set_params(max_iter=-1)
+
+        results = trainer.train_and_evaluate(*training_data)
+
+        assert set(results) == {"decision_tree", "xgboost"}
+
+    def test_rejects_mismatched_shapes(self, training_data):
+        X_train, X_test, y_train, y_test = training_data
+        with pytest.raises(ValueError, match="Feature dimension mismatch"):
+            ModelTrainer().train_and_evaluate(X_train, X_test[:, :4], y_train, y_test)
+
+
+class TestLatencyAwareSelection:
+    """Unit tests for latency/size-aware model selection"""
+
+    def test_benchmark_model(self, training_data):
+        X_train, X_test, y_train, _ = training_data
+        model = DecisionTreeClassifier(random_state=0).fit(X_train, y_train)
+
+        benchmark = benchmark_model(model, X_test, single_rows=20, batch_rows=50)
+
+        assert set(benchmark) == {
+            "latency_p50_us",
+            "latency_p99_us",
+            "batch_latency_us_per_row",
+            "model_size_bytes",
+        }
+        assert 0 < benchmark["latency_p50_us"] <= benchmark["latency_p99_us"]
+        assert benchmark["model_size_bytes"] > 0
+
+    def test_benchmarks_are_logged(self, training_data, mock_mlflow):
+        results = ModelTrainer().train_and_evaluate(*training_data)
+
+        for metrics in results.values():
+            assert metrics["latency_p99_us"] > 0
+            assert metrics["model_size_bytes"] > 0
+        logged = mock_mlflow.log_metrics.call_args_list[0].args[0]
+        assert "latency_p99_us" in logged
+
+    def test_selects_best_model_within_budget(self, training_data, mock_mlflow):
+        unbounded = ModelTrainer()
+        unbounded.train_and_evaluate(*training_data)
+        # XGBoost's ensemble is by far the largest candidate
+        budget = unbounded.benchmarks["xgboost"]["model_size_bytes"] - 1
+
+        trainer = ModelTrainer(max_model_bytes=budget)
+        results = trainer.train_and_evaluate(*training_data)
+
+        assert "xgboost" in results
+        assert trainer.best_model_name in ("logistic", "decision_tree")
+        assert trainer.best_score == max(
+            results["logistic"]["f1"], results["decision_tree"]["f1"]
+        )
+        mock_mlflow.set_tag.assert_any_call("within_budget", "False")
+
+    def test_registers_nothing_over_budget(self, training_data, mock_mlflow):
+        trainer = ModelTrainer(max_p99_latency_us=0.001)
+        results = trainer.train_and_evaluate(*training_data)
+
+        assert len(results) == 3
+        assert trainer.best_model is None
+        registered = [
+            call
+            for call in mock_mlflow.sklearn.log_model.call_args_list
+            if call.kwargs.get("registered_model_name") == "intrusion_detector"
+        ]
+        assert registered == []
+        with pytest.raises(ValueError):
+            trainer.predict(training_data[1])
+
+
+class TestHyperparameterSearch:
+    """Unit tests for successive-halving tuning"""
+
+    def test_tune_sets_best_configuration(self, training_data, mock_mlflow):
+        X_train, _, y_train, _ = training_data
+        trainer = ModelTrainer(n_jobs=2)
+
+        best = trainer.tune(
+            X_train, y_train, n_candidates=9, model_names=["decision_tree", "xgboost"]
+        )
+
+        assert set(best) == {"decision_tree", "xgboost"}
+        params = trainer.models["xgboost"].get_params()
+        for name, value in best["xgboost"].items():
+            assert params[name] == value
+        # Untuned models keep their configuration
+        assert trainer.models["logistic"].get_params()["C"] == 1.0
+
+    def test_trials_are_nested_runs(self, training_data, mock_mlflow):
+        X_train, _, y_train, _ = training_data
+
+        ModelTrainer().tune(
+            X_train, y_train, n_candidates=9, model_names=["decision_tree"]
+        )
+
+        calls = mock_mlflow.start_run.call_args_list
+        assert calls[0].kwargs == {"run_name": "decision_tree_search"}
+        trials = [call for call in calls[1:] if call.kwargs.get("nested")]
+        assert len(trials) == len(calls) - 1 == 9
+        pruned = [
+            call.args[1]
+            for call in mock_mlflow.set_tag.call_args_list
+            if call.args[0] == "pruned"
+        ]
+        assert pruned.count("False") < 9
+        assert "True" in pruned
+
+    def test_tuned_models_train(self, training_data, mock_mlflow):
+        X_train, _, y_train, _ = training_data
+        trainer = ModelTrainer()
+        trainer.tune(X_train, y_train, n_candidates=6, model_names=["logistic"])
+
+        results = trainer.train_and_evaluate(*training_data)
+
+        assert results["logistic"]["f1"] > 0.7
+
+
+class ArrayChunks:
+    """Re-iterable chunks of in-memory arrays, counting the passes made"""
+
+    def __init__(self, X, y, chunk_rows):
+        self.X, self.y, self.chunk_rows = X, y, chunk_rows
+        self.passes = 0
+
+    def __iter__(self):
+        self.passes += 1
+        for start in range(0, len(self.y), self.chunk_rows):
+            yield self.X[start : start + self.chunk_rows], self.y[
+                start : start + self.chunk_rows
+            ]
+
+
+class TestIncrementalTrainer:
+    """Unit tests for out-of-core training"""
+
+    def test_streaming_metrics_match_sklearn(self):
+        rng = np.random.default_rng(0)
+        y_true = rng.integers(0, 2, 1000)
+        y_prob = np.clip(0.3 * y_true + rng.uniform(0, 0.7, 1000), 0, 1)
+        y_pred = (y_prob >= 0.5).astype(int)
+
+        metrics = StreamingMetrics()
+        for start in range(0, 1000, 300):
+            stop = start + 300
+            metrics.update(y_true[start:stop], y_pred[start:stop], y_prob[start:stop])
+        result = metrics.result()
+
+        assert result["f1"] == pytest.approx(f1_score(y_true, y_pred))
+        assert result["accuracy"] == pytest.approx(np.mean(y_true == y_pred))
+        assert result["roc_auc"] == pytest.approx(
+            roc_auc_score(y_true, y_prob), abs=1e-3
+        )
+
+    def test_trains_and_evaluates_over_chunks(
+        self, training_data, mock_mlflow, tmp_path
+    ):
+        X_train, X_test, y_train, y_test = training_data
+        train_chunks = ArrayChunks(X_train, y_train, chunk_rows=50)
+        test_chunks = ArrayChunks(X_test, y_test, chunk_rows=25)
+
+        trainer = IncrementalTrainer(epochs=3, cache_dir=str(tmp_path))
+        results = trainer.train_and_evaluate(train_chunks, test_chunks)
+
+        assert set(results) == {"sgd", "xgboost"}
+        assert results["xgboost"]["f1"] > 0.7
+        assert results["sgd"]["f1"] > 0.7
+        # One pass over the test set for all models
+        assert test_chunks.passes == 1
+        # Both models predict like regular sklearn estimators
+        for model in trainer.models.values():
+            assert model.predict_proba(X_test).shape == (60, 2)
+        xgboost_f1 = f1_score(y_test, trainer.models["xgboost"].predict(X_test))
+        assert results["xgboost"]["f1"] == pytest.approx(xgboost_f1)
+        assert trainer.best_model_name in ("sgd", "xgboost")
+        # The external-memory cache is cleaned up
+        assert list(tmp_path.iterdir()) == []
+
+    def test_rejects_empty_training_data(self, mock_mlflow):
+        empty = ArrayChunks(np.empty((0, 4)), np.empty(0), chunk_rows=10)
+        with pytest.raises(ValueError, match="Training data is empty"):
+            IncrementalTrainer().train_and_evaluate(empty, empty)